@@ -34,6 +34,54 @@ controls.minDistance = 15;
 controls.maxDistance = 60;
 controls.maxPolarAngle = Math.PI / 2;
 
+// Frame-time and update-cost counters, exposed as window.chessPerf so the UI
+// can be profiled from the browser console
+const chessPerf = {
+    frames: 0,
+    lastFrameMs: 0,
+    avgFrameMs: 0,
+    maxFrameMs: 0,
+    updates: {}  // name -> { count, lastMs, avgMs, maxMs }
+};
+window.chessPerf = chessPerf;
+
+function recordUpdateCost(name, startTime) {
+    const elapsed = performance.now() - startTime;
+    const stat = chessPerf.updates[name] || (chessPerf.updates[name] = { count: 0, lastMs: 0, avgMs: 0, maxMs: 0 });
+    stat.count++;
+    stat.lastMs = elapsed;
+    stat.avgMs += (elapsed - stat.avgMs) / stat.count;
+    stat.maxMs = Math.max(stat.maxMs, elapsed);
+}
+
+// Render on demand - a frame is only drawn when the camera, the board or the
+// pieces change, so an idle tab costs nothing
+let renderRequested = false;
+
+function renderFrame() {
+    renderRequested = false;
+    const start = performance.now();
+    
+    // While damping is settling this fires 'change', which requests the next frame
+    controls.update();
+    renderer.render(scene, camera);
+    
+    const elapsed = performance.now() - start;
+    chessPerf.frames++;
+    chessPerf.lastFrameMs = elapsed;
+    chessPerf.avgFrameMs += (elapsed - chessPerf.avgFrameMs) / chessPerf.frames;
+    chessPerf.maxFrameMs = Math.max(chessPerf.maxFrameMs, elapsed);
+}
+
+function requestRender() {
+    if (!renderRequested) {
+    renderRequested = true;
+    requestAnimationFrame(renderFrame);
+    }
+}
+
+controls.addEventListener('change', requestRender);
+
 // Add ambient and directional light
 const ambientLight = new THREE.AmbientLight(0x404040, 0.4);
 scene.add(ambientLight);
@@ -237,6 +285,8 @@ async function initializeGameClient() {
     // Set up event handlers
     gameClient.on('move_made', handleMoveMade);
     gameClient.on('game_update', handleGameUpdate);
+    gameClient.on('position', handlePosition);
+    gameClient.on('premoves', handlePremoves);
     gameClient.on('error', handleGameError);
     gameClient.on('disconnect', handleDisconnect);
     
@@ -265,18 +315,73 @@ function updateConnectionStatus(connected) {
 // Handle move made
 function handleMoveMade(data) {
     console.log('Move made:', data);
+    clearSquareHighlights();
     
     // Update local chess state
     localChess.load(data.board);
     
-    // Update visual board
-    updatePiecesFromFEN(data.board);
+    // Update visual board, unless the player is looking back through the game
+    if (viewingPly === null) {
+    updatePiecesFromFEN(data.board, { from: data.from_square, to: data.to_square });
+    }
     
     // Update UI
     updateGameStatus(data);
     
     // Update move history
     updateMoveHistory(data.move_history);
+    updatePlySlider(data.move_history.length);
+}
+
+// Replay scrubbing - viewingPly is null while following the live game
+let viewingPly = null;
+let seekInFlight = false;
+let queuedSeekPly = null;
+
+function updatePlySlider(totalPlies) {
+    const slider = document.getElementById('plySlider');
+    slider.max = totalPlies;
+    if (viewingPly === null) {
+    slider.value = totalPlies;
+    }
+    document.getElementById('plyDisplay').textContent =
+    viewingPly === null ? 'Live' : `Ply ${viewingPly} / ${totalPlies}`;
+}
+
+// Only one seek is outstanding at a time; while dragging, the latest ply wins
+function requestSeek(ply) {
+    if (seekInFlight) {
+    queuedSeekPly = ply;
+    return;
+    }
+    seekInFlight = true;
+    gameClient.seek(ply).catch(error => {
+    seekInFlight = false;
+    console.error('Seek failed:', error);
+    });
+}
+
+function handlePosition(data) {
+    seekInFlight = false;
+    if (queuedSeekPly !== null) {
+    const ply = queuedSeekPly;
+    queuedSeekPly = null;
+    requestSeek(ply);
+    return;
+    }
+    if (viewingPly === null) return;  // returned to live meanwhile
+    
+    viewingPly = data.ply;
+    updatePiecesFromFEN(data.board);
+    updatePlySlider(data.total_plies);
+}
+
+function returnToLive() {
+    viewingPly = null;
+    queuedSeekPly = null;
+    document.getElementById('liveBtn').disabled = true;
+    updatePiecesFromFEN(localChess.fen());
+    updatePlySlider(parseInt(document.getElementById('plySlider').max));
 }
 
 // Handle game update
@@ -296,6 +401,10 @@ function handleGameUpdate(data) {
 // Handle game error
 function handleGameError(data) {
     console.error('Game error:', data);
+    if (data.retry_after) {
+    alert(`Game error: ${data.message} (try again in ${data.retry_after}s)`);
+    return;
+    }
     alert('Game error: ' + data.message);
 }
 
@@ -331,108 +440,236 @@ function updateGameStatus(gameState) {
     
     document.getElementById('gameStatus').textContent = statusText;
     
-    // Enable/disable move controls based on turn and game status
+    // Enable/disable move controls based on turn and game status. Off turn,
+    // moves are queued as premoves and played as soon as the opponent moves.
     const gameEnded = gameState.game_result && gameState.game_result !== '*';
     const isMyTurn = gameClient && gameClient.isMyTurn(gameState);
-    document.getElementById('makeMoveBtn').disabled = !isMyTurn || gameEnded;
-    document.getElementById('moveInput').disabled = !isMyTurn || gameEnded;
+    currentTurnIsMine = isMyTurn;
+    document.getElementById('makeMoveBtn').disabled = gameEnded;
+    document.getElementById('makeMoveBtn').textContent = isMyTurn ? 'Make Move' : 'Premove';
+    document.getElementById('moveInput').disabled = gameEnded;
     document.getElementById('resignBtn').disabled = gameEnded;
 }
 
-// Create chess pieces using simple geometry with symbols
-function createPiecesFromFEN(fen) {
-    // Clear existing pieces
-    if (currentPieceGroup) {
-    scene.remove(currentPieceGroup);
+let currentTurnIsMine = false;
+
+// Show the premoves waiting on the server
+function handlePremoves(data) {
+    const premoves = data.premoves || [];
+    document.getElementById('premoveDisplay').textContent = premoves.length
+    ? 'Premoves: ' + premoves.map(p => p.if ? `${p.move} (if ${p.if})` : p.move).join(', ')
+    : '';
+}
+
+// Highlight legal destination squares
+let highlightedSquares = [];
+
+function squareToBoardIndex(squareName) {
+    // squares[i][j]: i is the file (a-h), j counts ranks down from 8
+    return {
+    i: squareName.charCodeAt(0) - 'a'.charCodeAt(0),
+    j: 8 - parseInt(squareName[1])
+    };
+}
+
+function clearSquareHighlights() {
+    if (highlightedSquares.length === 0) return;
+    highlightedSquares.forEach(square => square.mesh.material.emissive.setHex(0x000000));
+    highlightedSquares = [];
+    requestRender();
+}
+
+function highlightLegalDestinations(fromSquare) {
+    clearSquareHighlights();
+    if (!gameClient || !/^[a-h][1-8]$/.test(fromSquare)) return;
+    
+    gameClient.getLegalDestinations(fromSquare).forEach(squareName => {
+    const { i, j } = squareToBoardIndex(squareName);
+    const square = squares[i][j];
+    square.mesh.material.emissive.setHex(0x2e7d32);
+    highlightedSquares.push(square);
+    });
+    requestRender();
+}
+
+// Shared piece resources - one geometry, one material per color and one
+// glyph texture per piece type and color, reused by every piece mesh
+const pieceBaseGeometry = new THREE.CylinderGeometry(0.4, 0.5, 0.8, 12);
+const pieceBaseMaterials = {
+    w: new THREE.MeshPhongMaterial({ color: 0xffffff }),
+    b: new THREE.MeshPhongMaterial({ color: 0x222222 })
+};
+const pieceSpriteMaterials = {};
+
+function getPieceSpriteMaterial(color, type) {
+    const key = color + type;
+    if (!pieceSpriteMaterials[key]) {
+    const canvas = document.createElement('canvas');
+    const context = canvas.getContext('2d');
+    canvas.width = 128;
+    canvas.height = 128;
+    context.font = 'Bold 80px Arial';
+    context.fillStyle = color === 'w' ? '#000000' : '#ffffff';
+    context.textAlign = 'center';
+    context.textBaseline = 'middle';
+    context.fillText(pieceSymbols[type] || type.toUpperCase(), 64, 64);
+    
+    const texture = new THREE.CanvasTexture(canvas);
+    pieceSpriteMaterials[key] = new THREE.SpriteMaterial({ map: texture, transparent: true });
+    }
+    return pieceSpriteMaterials[key];
+}
+
+// Piece meshes currently on the board, keyed by square name ('e4')
+const pieceMeshes = {};
+currentPieceGroup = new THREE.Group();
+scene.add(currentPieceGroup);
+
+// Parse the placement field of a FEN into { square: { color, type } }
+function parseFENPlacement(fen) {
+    const placement = {};
+    const rows = fen.split(' ')[0].split('/');
+    for (let rank = 0; rank < boardSize; rank++) {
+    let file = 0;
+    for (const ch of rows[rank]) {
+        if (ch >= '1' && ch <= '8') {
+        file += parseInt(ch);
+        } else {
+        const square = 'abcdefgh'[file] + (8 - rank);
+        placement[square] = {
+            color: ch === ch.toUpperCase() ? 'w' : 'b',
+            type: ch.toLowerCase()
+        };
+        file++;
+        }
     }
+    }
+    return placement;
+}
+
+// Place a piece's base and sprite on a square
+function positionPiece(entry, square) {
+    const { i, j } = squareToBoardIndex(square);
+    const x = (i - boardSize / 2 + 0.5) * squareSize;
+    const z = (j - boardSize / 2 + 0.5) * squareSize;
+    const elevation = squares[i][j].elevation;
     
-    const pieceGroup = new THREE.Group();
-    const chess = new Chess(fen);
-    const position = chess.board();
+    entry.base.position.set(x, elevation + 0.8, z);
+    entry.sprite.position.set(x, elevation + 2.2, z);
     
-    for (let rank = 0; rank < boardSize; rank++) {
+    // Store board position for animation updates
+    entry.base.userData = { boardPosition: { i: i, j: j } };
+    entry.sprite.userData = { boardPosition: { i: i, j: j } };
+}
+
+function addPiece(square, piece) {
+    const base = new THREE.Mesh(pieceBaseGeometry, pieceBaseMaterials[piece.color]);
+    base.castShadow = true;
+    const sprite = new THREE.Sprite(getPieceSpriteMaterial(piece.color, piece.type));
+    sprite.scale.set(1.5, 1.5, 1);
+    
+    const entry = { base: base, sprite: sprite, color: piece.color, type: piece.type };
+    positionPiece(entry, square);
+    currentPieceGroup.add(base);
+    currentPieceGroup.add(sprite);
+    pieceMeshes[square] = entry;
+}
+
+function removePiece(square) {
+    const entry = pieceMeshes[square];
+    if (entry) {
+    // Geometry, materials and textures are shared, so there is nothing to dispose
+    currentPieceGroup.remove(entry.base);
+    currentPieceGroup.remove(entry.sprite);
+    delete pieceMeshes[square];
+    }
+}
+
+// Update pieces from FEN string, touching only squares that changed.
+// lastMove ({ from, to }) lets the moving piece keep its mesh.
+function updatePiecesFromFEN(fen, lastMove = null) {
+    const start = performance.now();
+    const placement = parseFENPlacement(fen);
+    
+    if (lastMove && lastMove.from && lastMove.to && pieceMeshes[lastMove.from]) {
+    removePiece(lastMove.to);  // captured piece, if any
+    const entry = pieceMeshes[lastMove.from];
+    delete pieceMeshes[lastMove.from];
+    pieceMeshes[lastMove.to] = entry;
+    positionPiece(entry, lastMove.to);
+    }
+    
+    // Reconcile remaining differences (castling rook, en passant, promotion, resync)
     for (let file = 0; file < boardSize; file++) {
-        const piece = position[rank][file];
-        if (piece) {
-        // Create piece base
-        const baseGeometry = new THREE.CylinderGeometry(0.4, 0.5, 0.8, 12);
-        const baseMaterial = new THREE.MeshPhongMaterial({
-            color: piece.color === 'w' ? 0xffffff : 0x222222,
-        });
-        const baseMesh = new THREE.Mesh(baseGeometry, baseMaterial);
-        
-        // Position on board
-        const x = (file - boardSize / 2 + 0.5) * squareSize;
-        const z = (rank - boardSize / 2 + 0.5) * squareSize;
-        const elevation = squares[file][rank].elevation;
-        
-        baseMesh.position.set(x, elevation + 0.8, z);
-        baseMesh.castShadow = true;
-        
-        // Store board position for animation updates
-        baseMesh.userData = { boardPosition: { i: file, j: rank } };
+    for (let rank = 1; rank <= boardSize; rank++) {
+        const square = 'abcdefgh'[file] + rank;
+        const wanted = placement[square];
+        const current = pieceMeshes[square];
         
-        // Create text sprite for piece symbol
-        const canvas = document.createElement('canvas');
-        const context = canvas.getContext('2d');
-        canvas.width = 128;
-        canvas.height = 128;
-        context.font = 'Bold 80px Arial';
-        context.fillStyle = piece.color === 'w' ? '#000000' : '#ffffff';
-        context.textAlign = 'center';
-        context.textBaseline = 'middle';
-        context.fillText(pieceSymbols[piece.type] || piece.type.toUpperCase(), 64, 64);
-        
-        const texture = new THREE.CanvasTexture(canvas);
-        const spriteMaterial = new THREE.SpriteMaterial({ map: texture, transparent: true });
-        const sprite = new THREE.Sprite(spriteMaterial);
-        sprite.position.set(x, elevation + 2.2, z);
-        sprite.scale.set(1.5, 1.5, 1);
-        
-        // Store board position for animation updates
-        sprite.userData = { boardPosition: { i: file, j: rank } };
-        
-        pieceGroup.add(baseMesh);
-        pieceGroup.add(sprite);
+        if (current && (!wanted || wanted.color !== current.color || wanted.type !== current.type)) {
+        removePiece(square);
+        }
+        if (wanted && !pieceMeshes[square]) {
+        addPiece(square, wanted);
         }
     }
     }
     
-    currentPieceGroup = pieceGroup;
-    scene.add(pieceGroup);
+    recordUpdateCost('pieces', start);
+    requestRender();
 }
 
-// Update pieces from FEN string
-function updatePiecesFromFEN(fen) {
-    createPiecesFromFEN(fen);
-}
+// Update move history display - new moves are appended to the existing
+// list rather than re-rendering the whole history
+let renderedMoves = [];
+let lastMovePair = null;
 
-// Update move history display
 function updateMoveHistory(moveHistory) {
+    const start = performance.now();
     const moveList = document.getElementById('moveList');
     
     if (!moveHistory || moveHistory.length === 0) {
     moveList.innerHTML = '<div style="text-align: center; color: #666; font-style: italic;">No moves yet</div>';
+    renderedMoves = [];
+    lastMovePair = null;
     return;
     }
     
-    let html = '';
-    for (let i = 0; i < moveHistory.length; i += 2) {
-    const moveNumber = Math.floor(i / 2) + 1;
-    const whiteMove = moveHistory[i];
-    const blackMove = moveHistory[i + 1] || '';
+    // Start over if this is a different (or rewound) game
+    const lastRendered = renderedMoves.length - 1;
+    if (moveHistory.length < renderedMoves.length ||
+        (lastRendered >= 0 && moveHistory[lastRendered] !== renderedMoves[lastRendered])) {
+    renderedMoves = [];
+    lastMovePair = null;
+    }
+    if (renderedMoves.length === 0) {
+    moveList.textContent = '';
+    }
     
-    html += `
-        <div class="move-pair">
-        <div class="move-number">${moveNumber}.</div>
-        <div class="white-move">${whiteMove}</div>
-        <div class="black-move">${blackMove}</div>
-        </div>
-    `;
+    for (let i = renderedMoves.length; i < moveHistory.length; i++) {
+    if (i % 2 === 0) {
+        lastMovePair = document.createElement('div');
+        lastMovePair.className = 'move-pair';
+        
+        const moveNumber = document.createElement('div');
+        moveNumber.className = 'move-number';
+        moveNumber.textContent = `${i / 2 + 1}.`;
+        const whiteMove = document.createElement('div');
+        whiteMove.className = 'white-move';
+        whiteMove.textContent = moveHistory[i];
+        const blackMove = document.createElement('div');
+        blackMove.className = 'black-move';
+        
+        lastMovePair.append(moveNumber, whiteMove, blackMove);
+        moveList.appendChild(lastMovePair);
+    } else {
+        lastMovePair.querySelector('.black-move').textContent = moveHistory[i];
+    }
+    renderedMoves.push(moveHistory[i]);
     }
     
-    moveList.innerHTML = html;
     moveList.scrollTop = moveList.scrollHeight;
+    recordUpdateCost('moveList', start);
 }
 
 // Convert move history to PGN format
@@ -627,6 +864,8 @@ function animateBoardTransition(toMountainView) {
         }
     }
     
+    requestRender();
+    
     if (progress < 1) {
         requestAnimationFrame(animateFrame);
     } else {
@@ -675,6 +914,8 @@ document.getElementById('createMultiplayerBtn').addEventListener('click', async
     updatePiecesFromFEN(joinResult.game_state.board);
     updateGameStatus(joinResult.game_state);
     updateMoveHistory(joinResult.game_state.move_history);
+    viewingPly = null;
+    updatePlySlider(joinResult.game_state.move_history.length);
     
     alert(`Created multiplayer game! Share this Game ID with another player: ${result.game_id}`);
     } catch (error) {
@@ -709,9 +950,10 @@ document.getElementById('startComputerGameBtn').addEventListener('click', async
     if (!gameClient) return;
     
     const eloRating = parseInt(document.getElementById('eloSlider').value);
+    const ponder = document.getElementById('ponderCheckbox').checked;
     
     try {
-    const result = await gameClient.createGame('vs_computer', { elo_rating: eloRating });
+    const result = await gameClient.createGame('vs_computer', { elo_rating: eloRating, ponder: ponder });
     const joinResult = await gameClient.joinGame(result.game_id);
     
     currentGameId = result.game_id;
@@ -731,6 +973,8 @@ document.getElementById('startComputerGameBtn').addEventListener('click', async
     updatePiecesFromFEN(joinResult.game_state.board);
     updateGameStatus(joinResult.game_state);
     updateMoveHistory(joinResult.game_state.move_history);
+    viewingPly = null;
+    updatePlySlider(joinResult.game_state.move_history.length);
     
     alert(`Created game vs computer (${eloRating} ELO)!`);
     } catch (error) {
@@ -769,6 +1013,8 @@ document.getElementById('joinGameBtn').addEventListener('click', async () => {
     updatePiecesFromFEN(result.game_state.board);
     updateGameStatus(result.game_state);
     updateMoveHistory(result.game_state.move_history);
+    viewingPly = null;
+    updatePlySlider(result.game_state.move_history.length);
     
     alert(`Joined game as ${result.color} player!`);
     } catch (error) {
@@ -786,13 +1032,23 @@ document.getElementById('makeMoveBtn').addEventListener('click', async () => {
     }
     
     try {
-    await gameClient.makeMove(move);
+    if (currentTurnIsMine) {
+        await gameClient.makeMove(move);
+    } else {
+        await gameClient.queuePremoves([move], false);
+    }
     document.getElementById('moveInput').value = '';
+    clearSquareHighlights();
     } catch (error) {
     alert('Failed to make move: ' + error.message);
     }
 });
 
+// Highlight destinations as soon as a from-square is typed
+document.getElementById('moveInput').addEventListener('input', (e) => {
+    highlightLegalDestinations(e.target.value.trim().toLowerCase().substring(0, 2));
+});
+
 // Allow Enter key to make moves
 document.getElementById('moveInput').addEventListener('keypress', (e) => {
     if (e.key === 'Enter') {
@@ -800,12 +1056,27 @@ document.getElementById('moveInput').addEventListener('keypress', (e) => {
     }
 });
 
+// Scrub through the game on the 3D board
+document.getElementById('plySlider').addEventListener('input', (e) => {
+    if (!gameClient || !currentGameId) return;
+    
+    const ply = parseInt(e.target.value);
+    if (ply === parseInt(e.target.max)) {
+    returnToLive();
+    return;
+    }
+    viewingPly = ply;
+    document.getElementById('liveBtn').disabled = false;
+    requestSeek(ply);
+});
+document.getElementById('liveBtn').addEventListener('click', returnToLive);
+
 // Add event listeners for new buttons
 document.getElementById('exportPgnBtn').addEventListener('click', exportPGN);
 document.getElementById('resignBtn').addEventListener('click', resignGame);
 
 // Initialize the game
-createPiecesFromFEN(localChess.fen());
+updatePiecesFromFEN(localChess.fen());
 initializeGameClient();
 
 // Handle window resize
@@ -813,12 +1084,8 @@ window.addEventListener('resize', function () {
     camera.aspect = window.innerWidth / window.innerHeight;
     camera.updateProjectionMatrix();
     renderer.setSize(window.innerWidth, window.innerHeight);
+    requestRender();
 }, false);
 
-// Animation loop
-function animate() {
-    requestAnimationFrame(animate);
-    controls.update();
-    renderer.render(scene, camera);
-}
-animate();
\ No newline at end of file
+// Draw the first frame; later frames are drawn on demand
+requestRender();
\ No newline at end of file
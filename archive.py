@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Compressed archive of finished games with a position index.
+
+Games are appended in batches. Each batch becomes one zlib block in a
+segment file: per game, its headers and a 16-bit code per move. The batch
+also becomes one sorted index run of (Zobrist hash, game number, next move,
+result) records. Runs are memory-mapped and binary-searched, so
+"which games reached this position" and opening-explorer queries touch a
+few pages no matter how many games are archived. Runs are merged by
+compact().
+
+    python archive.py import games/*.pgn
+    python archive.py find "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+    python archive.py openings "<fen>"
+    python archive.py show 42
+    python archive.py compact
+"""
+import argparse
+import glob
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import zlib
+from collections import OrderedDict
+from threading import Lock
+
+import chess
+import chess.polyglot
+
+BLOCK_HEADER = struct.Struct('<4sII')  # magic, compressed length, games in block
+BLOCK_MAGIC = b'CGB1'
+GAME_HEADER = struct.Struct('<IBH')  # headers JSON length, result code, move count
+CATALOG_ENTRY = struct.Struct('<IQI')  # segment number, block offset, first game number in block
+INDEX_RECORD = struct.Struct('<QIHBx')  # position hash, game number, next move, result code
+
+RESULTS = ('*', '1-0', '0-1', '1/2-1/2')
+RESULT_CODES = {result: code for code, result in enumerate(RESULTS)}
+
+SEGMENT_SIZE = 64 * 1024 * 1024  # bytes before a new segment file is started
+BLOCK_CACHE_SIZE = 8  # decompressed blocks kept for get_game()
+
+def encode_move(move):
+    """16-bit move code: from square | to square << 6 | promotion piece << 12 (0 = none)"""
+    promotion = move.promotion - 1 if move.promotion else 0
+    return move.from_square | move.to_square << 6 | promotion << 12
+
+def decode_move(code):
+    promotion = code >> 12
+    return chess.Move(code & 0x3f, (code >> 6) & 0x3f, promotion + 1 if promotion else None)
+
+class Archive:
+    """Append-only game archive in `path`.
+
+    append() buffers games in memory; flush() writes the buffered batch as a
+    compressed block plus an index run. Game numbers are assigned in append
+    order, starting at 0. Safe to share between threads: writers (flush,
+    compact) take a separate lock and hold the main one only to swap state,
+    so appends and queries don't wait for compression or disk writes.
+    """
+    def __init__(self, path, segment_size=SEGMENT_SIZE):
+        self.path = path
+        self.segment_size = segment_size
+        os.makedirs(path, exist_ok=True)
+        self._lock = Lock()
+        self._write_lock = Lock()  # serialises flush() and compact()
+        self._pending = []
+        self._blocks = OrderedDict()
+        self._catalog_path = os.path.join(path, 'catalog.bin')
+        with open(self._catalog_path, 'ab') as catalog:
+            # Drop a partially written entry left by a crash
+            catalog.truncate(os.path.getsize(self._catalog_path) // CATALOG_ENTRY.size * CATALOG_ENTRY.size)
+        self._catalog = None
+        self._map_catalog()
+        self._runs = []  # (path, file, mmap, record count)
+        for run_path in sorted(glob.glob(os.path.join(path, 'index-*.idx'))):
+            self._open_run(run_path)
+        segments = sorted(glob.glob(os.path.join(path, 'segment-*.seg')))
+        self._segment = int(os.path.basename(segments[-1])[8:-4]) if segments else 0
+        self._next_number = self._catalog_count
+
+    # -- writing --
+
+    def append(self, headers, moves, result):
+        """Queue a finished game; `moves` are UCI strings or chess.Move, played from headers' FEN if any"""
+        with self._lock:
+            self._pending.append((dict(headers), [chess.Move.from_uci(m) if isinstance(m, str) else m for m in moves],
+                                  result))
+            self._next_number += 1
+            return self._next_number - 1
+
+    @property
+    def game_count(self):
+        return self._catalog_count
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def flush(self):
+        """Write buffered games as one block and one index run; returns the number written"""
+        with self._write_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, []
+                first = self._catalog_count
+            payload = bytearray()
+            postings = []
+            for number, (headers, moves, result) in enumerate(batch, first):
+                payload += self._encode_game(headers, moves, result)
+                postings.extend(self._positions(number, headers, moves, result))
+            block = zlib.compress(bytes(payload), 6)
+
+            segment_path = self._segment_path(self._segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) >= self.segment_size:
+                self._segment += 1
+                segment_path = self._segment_path(self._segment)
+            with open(segment_path, 'ab') as segment:
+                offset = segment.tell()
+                segment.write(BLOCK_HEADER.pack(BLOCK_MAGIC, len(block), len(batch)))
+                segment.write(block)
+                segment.flush()
+                os.fsync(segment.fileno())
+
+            # Catalog before index: a crash in between loses the batch's positions,
+            # but an index record can never point at the wrong game
+            with open(self._catalog_path, 'ab') as catalog:
+                entry = CATALOG_ENTRY.pack(self._segment, offset, first)
+                catalog.write(entry * len(batch))
+            with self._lock:
+                self._map_catalog()
+            postings.sort()
+            self._write_run(postings)
+            return len(batch)
+
+    def _segment_path(self, number):
+        return os.path.join(self.path, f'segment-{number:06d}.seg')
+
+    @staticmethod
+    def _encode_game(headers, moves, result):
+        header_bytes = json.dumps(headers, separators=(',', ':')).encode()
+        return (GAME_HEADER.pack(len(header_bytes), RESULT_CODES.get(result, 0), len(moves)) + header_bytes
+                + struct.pack(f'<{len(moves)}H', *(encode_move(move) for move in moves)))
+
+    @staticmethod
+    def _positions(number, headers, moves, result):
+        """Index records for every position from the initial one on, once per game, with the move played next"""
+        board = chess.Board(headers['FEN']) if 'FEN' in headers else chess.Board()
+        result_code = RESULT_CODES.get(result, 0)
+        seen = set()
+        postings = []
+        for ply in range(len(moves) + 1):
+            if ply:
+                board.push(moves[ply - 1])
+            key = chess.polyglot.zobrist_hash(board)
+            if key not in seen:
+                seen.add(key)
+                next_move = encode_move(moves[ply]) if ply < len(moves) else 0
+                postings.append((key, number, next_move, result_code))
+        return postings
+
+    def _write_run(self, records):
+        """Write a sorted run and start searching it; caller holds the write lock"""
+        existing = [int(os.path.basename(run[0])[6:-4]) for run in self._runs]
+        run_path = os.path.join(self.path, f'index-{max(existing, default=0) + 1:06d}.idx')
+        temporary = run_path + '.tmp'
+        with open(temporary, 'wb') as run:
+            for record in records:
+                run.write(INDEX_RECORD.pack(*record))
+            run.flush()
+            os.fsync(run.fileno())
+        os.replace(temporary, run_path)
+        with self._lock:
+            self._open_run(run_path)
+
+    def _open_run(self, run_path):
+        size = os.path.getsize(run_path)
+        if size == 0:
+            self._runs.append((run_path, None, None, 0))
+            return
+        run_file = open(run_path, 'rb')
+        run_map = mmap.mmap(run_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._runs.append((run_path, run_file, run_map, size // INDEX_RECORD.size))
+
+    def _map_catalog(self):
+        if self._catalog is not None:
+            self._catalog[1].close()
+            self._catalog[0].close()
+        size = os.path.getsize(self._catalog_path)
+        self._catalog_count = size // CATALOG_ENTRY.size
+        if size:
+            catalog_file = open(self._catalog_path, 'rb')
+            self._catalog = (catalog_file, mmap.mmap(catalog_file.fileno(), 0, access=mmap.ACCESS_READ))
+        else:
+            self._catalog = None
+
+    def compact(self):
+        """Merge all index runs into one; returns the number of runs merged"""
+        with self._write_lock:
+            # Only writers change the run list, so the runs can be read without
+            # the main lock while queries keep using them
+            old_runs = list(self._runs)
+            if len(old_runs) < 2:
+                return 0
+            merged = heapq.merge(*(self._iter_run(run) for run in old_runs))
+            run_path = os.path.join(self.path, f'index-{int(os.path.basename(old_runs[-1][0])[6:-4]) + 1:06d}.idx')
+            temporary = run_path + '.tmp'
+            with open(temporary, 'wb') as run:
+                for record in merged:
+                    run.write(INDEX_RECORD.pack(*record))
+                run.flush()
+                os.fsync(run.fileno())
+            os.replace(temporary, run_path)
+            with self._lock:
+                self._runs = []
+                self._open_run(run_path)
+                for old_path, old_file, old_map, _ in old_runs:
+                    if old_map is not None:
+                        old_map.close()
+                        old_file.close()
+                    os.remove(old_path)
+            return len(old_runs)
+
+    @staticmethod
+    def _iter_run(run):
+        _, _, run_map, count = run
+        for index in range(count):
+            yield INDEX_RECORD.unpack_from(run_map, index * INDEX_RECORD.size)
+
+    @property
+    def run_count(self):
+        return len(self._runs)
+
+    # -- reading --
+
+    def _postings(self, key):
+        """All index records for position hash `key`, across runs"""
+        records = []
+        for _, _, run_map, count in self._runs:
+            low, high = 0, count
+            while low < high:
+                middle = (low + high) // 2
+                if struct.unpack_from('<Q', run_map, middle * INDEX_RECORD.size)[0] < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            while low < count:
+                record = INDEX_RECORD.unpack_from(run_map, low * INDEX_RECORD.size)
+                if record[0] != key:
+                    break
+                records.append(record)
+                low += 1
+        return records
+
+    def games_reaching(self, board, limit=None):
+        """Numbers of archived games that reached `board` (a chess.Board or FEN), oldest first"""
+        if isinstance(board, str):
+            board = chess.Board(board)
+        with self._lock:
+            numbers = sorted(record[1] for record in self._postings(chess.polyglot.zobrist_hash(board)))
+        return numbers[:limit] if limit is not None else numbers
+
+    def opening_stats(self, board):
+        """Moves played from `board` in archived games, with White/draw/Black counts"""
+        if isinstance(board, str):
+            board = chess.Board(board)
+        with self._lock:
+            records = self._postings(chess.polyglot.zobrist_hash(board))
+        moves = {}
+        for _, _, next_move, result_code in records:
+            if not next_move:
+                continue
+            stats = moves.setdefault(next_move, {"games": 0, "white": 0, "draws": 0, "black": 0})
+            stats["games"] += 1
+            outcome = {1: "white", 2: "black", 3: "draws"}.get(result_code)
+            if outcome:
+                stats[outcome] += 1
+        rows = []
+        for code, stats in sorted(moves.items(), key=lambda item: -item[1]["games"]):
+            move = decode_move(code)
+            rows.append({"move": move.uci(), "san": board.san(move) if board.is_legal(move) else None, **stats})
+        return {"games": len(records), "moves": rows}
+
+    def get_game(self, number):
+        """{"number", "headers", "result", "moves"} for game `number`"""
+        with self._lock:
+            if not 0 <= number < self._catalog_count:
+                raise KeyError(number)
+            segment, offset, first = CATALOG_ENTRY.unpack_from(self._catalog[1], number * CATALOG_ENTRY.size)
+            payload = self._read_block(segment, offset)
+        position = 0
+        for _ in range(number - first + 1):
+            header_length, result_code, move_count = GAME_HEADER.unpack_from(payload, position)
+            start = position + GAME_HEADER.size
+            position = start + header_length + 2 * move_count
+        headers = json.loads(payload[start:start + header_length])
+        codes = struct.unpack_from(f'<{move_count}H', payload, start + header_length)
+        return {
+            "number": number,
+            "headers": headers,
+            "result": RESULTS[result_code],
+            "moves": [decode_move(code).uci() for code in codes],
+        }
+
+    def _read_block(self, segment, offset):
+        key = (segment, offset)
+        payload = self._blocks.pop(key, None)
+        if payload is None:
+            with open(self._segment_path(segment), 'rb') as segment_file:
+                segment_file.seek(offset)
+                magic, length, _ = BLOCK_HEADER.unpack(segment_file.read(BLOCK_HEADER.size))
+                if magic != BLOCK_MAGIC:
+                    raise IOError(f"Corrupt archive block at {segment}:{offset}")
+                payload = zlib.decompress(segment_file.read(length))
+            if len(self._blocks) >= BLOCK_CACHE_SIZE:
+                self._blocks.popitem(last=False)
+        self._blocks[key] = payload
+        return payload
+
+    def stats(self):
+        with self._lock:
+            return {
+                "games": self._catalog_count,
+                "pending": len(self._pending),
+                "segments": self._segment + 1 if self._catalog_count else 0,
+                "index_runs": len(self._runs),
+                "indexed_positions": sum(run[3] for run in self._runs),
+                "bytes": sum(os.path.getsize(p) for p in glob.glob(os.path.join(self.path, '*'))),
+            }
+
+    def close(self):
+        self.flush()
+        with self._write_lock, self._lock:
+            for _, run_file, run_map, _ in self._runs:
+                if run_map is not None:
+                    run_map.close()
+                    run_file.close()
+            self._runs = []
+            if self._catalog is not None:
+                self._catalog[1].close()
+                self._catalog[0].close()
+                self._catalog = None
+
+def import_pgn(archive, paths, batch_size=5000):
+    """Archive every game in the PGN files at `paths`; returns the number imported"""
+    import chess.pgn
+
+    imported = 0
+    for path in paths:
+        with open(path, encoding='utf-8', errors='replace') as pgn:
+            while True:
+                game = chess.pgn.read_game(pgn)
+                if game is None:
+                    break
+                if game.errors:
+                    print(f"   Skipping a game in {path}: {game.errors[0]}")
+                    continue
+                archive.append(dict(game.headers), list(game.mainline_moves()), game.headers.get("Result", "*"))
+                imported += 1
+                if archive.pending >= batch_size:
+                    archive.flush()
+    archive.flush()
+    return imported
+
+def main():
+    parser = argparse.ArgumentParser(description="Finished-game archive with a position index")
+    parser.add_argument('--archive', default=os.environ.get('ARCHIVE_DIR') or 'archive', help="archive directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    import_command = commands.add_parser('import', help="archive PGN files")
+    import_command.add_argument('pgn', nargs='+')
+    find_command = commands.add_parser('find', help="games that reached a position")
+    find_command.add_argument('fen')
+    find_command.add_argument('--limit', type=int, default=20)
+    openings_command = commands.add_parser('openings', help="moves played from a position")
+    openings_command.add_argument('fen')
+    show_command = commands.add_parser('show', help="print one archived game")
+    show_command.add_argument('number', type=int)
+    commands.add_parser('compact', help="merge index runs")
+    commands.add_parser('stats', help="archive size and counts")
+    args = parser.parse_args()
+
+    archive = Archive(args.archive)
+    try:
+        if args.command == 'import':
+            paths = [path for pattern in args.pgn for path in glob.glob(pattern)]
+            count = import_pgn(archive, paths)
+            archive.compact()
+            print(f"📦 Archived {count} games from {len(paths)} file(s)")
+        elif args.command == 'find':
+            numbers = archive.games_reaching(args.fen)
+            print(f"🔍 {len(numbers)} game(s) reached this position")
+            for number in numbers[:args.limit]:
+                game = archive.get_game(number)
+                headers = game["headers"]
+                print(f"   #{number} {headers.get('White', '?')} - {headers.get('Black', '?')} {game['result']} "
+                      f"({headers.get('GameId', headers.get('Date', ''))})")
+        elif args.command == 'openings':
+            stats = archive.opening_stats(args.fen)
+            print(f"📖 {stats['games']} game(s) reached this position")
+            for row in stats["moves"]:
+                print(f"   {row['san'] or row['move']:<8}{row['games']:>8}  +{row['white']} ={row['draws']} -{row['black']}")
+        elif args.command == 'show':
+            game = archive.get_game(args.number)
+            print(json.dumps(game, indent=2))
+        elif args.command == 'compact':
+            print(f"🗜️  Merged {archive.compact()} index run(s)")
+        elif args.command == 'stats':
+            print(json.dumps(archive.stats(), indent=2))
+    finally:
+        archive.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
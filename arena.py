@@ -0,0 +1,236 @@
+"""
+Arena tournaments: players are paired again as soon as their game ends.
+
+Players waiting for a game sit in a list sorted by rating. A player is
+paired by binary-searching that list for the closest rated opponent, an
+O(log n) search in the number of waiting players; taking the opponent out
+of the list (or putting a player in) shifts the entries after it, an O(n)
+memmove that stays in the microseconds for tens of thousands of players.
+The standings are kept as a sorted leaderboard that each result updates
+in place the same way, so ranks are never recomputed from scratch.
+
+Scoring follows the usual arena rules: 2 points for a win, 1 for a draw,
+and double points after two wins in a row. The last opponent is never
+paired again straight away while there is anyone else.
+
+Arena does no locking and creates no games; the server calls it under
+games_lock and turns the Pairings it returns into ChessGames.
+"""
+import bisect
+import time
+import uuid
+from collections import namedtuple
+
+Pairing = namedtuple('Pairing', 'game_id white black')
+
+WIN, DRAW = 2, 1
+STREAK = 2  # wins in a row after which points are doubled
+
+class Standing:
+    """One participant's score and pairing history"""
+    __slots__ = ('player_id', 'rating', 'score', 'games', 'wins', 'draws', 'losses', 'streak',
+                 'color_balance', 'last_color', 'last_opponent', 'game_id', 'withdrawn', 'key')
+
+    def __init__(self, player_id, rating):
+        self.player_id = player_id
+        self.rating = rating
+        self.score = 0
+        self.games = self.wins = self.draws = self.losses = 0
+        self.streak = 0
+        self.color_balance = 0  # games as White minus games as Black
+        self.last_color = None
+        self.last_opponent = None
+        self.game_id = None  # game being played, if any
+        self.withdrawn = False
+        self.key = None  # leaderboard key
+
+    def to_dict(self):
+        return {
+            "player_id": self.player_id,
+            "rating": self.rating,
+            "score": self.score,
+            "games": self.games,
+            "wins": self.wins,
+            "draws": self.draws,
+            "losses": self.losses,
+            "on_fire": self.streak >= STREAK,
+            "playing": self.game_id,
+        }
+
+class Arena:
+    def __init__(self, arena_id, minutes, starts_at=None, scan=4):
+        self.arena_id = arena_id
+        self.starts_at = time.time() if starts_at is None else starts_at
+        self.ends_at = self.starts_at + minutes * 60
+        self.started = False
+        self.scan = scan  # waiting players looked at on each side of the closest rating
+        self.players = {}
+        self.games = {}  # game id -> (white, black) for games in progress
+        self.games_played = 0
+        self._waiting = []  # (rating, ticket) sorted; ticket orders equal ratings by arrival
+        self._waiting_key = {}  # player id -> its entry in _waiting
+        self._ticket_players = {}
+        self._tickets = 0
+        self._leaderboard = []  # (-score, -rating, player id) sorted
+
+    @property
+    def finished(self):
+        return time.time() >= self.ends_at
+
+    @property
+    def waiting(self):
+        return len(self._waiting)
+
+    def join(self, player_id, rating):
+        """Enter (or re-enter) the arena; returns the pairing made for the player, if any"""
+        standing = self.players.get(player_id)
+        if standing is None:
+            standing = self.players[player_id] = Standing(player_id, rating)
+            self._rank(standing)
+        standing.withdrawn = False
+        if self.finished or standing.game_id or player_id in self._waiting_key:
+            return []
+        return self._seek(standing)
+
+    def leave(self, player_id):
+        """Stop being paired; a game in progress still counts"""
+        standing = self.players.get(player_id)
+        if standing is None:
+            return False
+        standing.withdrawn = True
+        self._unwait(player_id)
+        return True
+
+    def start(self):
+        """Pair everyone already waiting at once, neighbours in rating order"""
+        self.started = True
+        if self.finished:
+            return []
+        waiting = [self._ticket_players[ticket] for _, ticket in self._waiting]
+        self._waiting.clear()
+        self._waiting_key.clear()
+        self._ticket_players.clear()
+        pairings = [self._pair(self.players[waiting[i]], self.players[waiting[i + 1]])
+                    for i in range(0, len(waiting) - 1, 2)]
+        if len(waiting) % 2:
+            self._wait(self.players[waiting[-1]])
+        return pairings
+
+    def game_finished(self, game_id, result):
+        """Score a finished arena game and pair both players again; returns the new pairings"""
+        players = [self.players[player_id] for player_id in self.games.pop(game_id)]
+        self.games_played += 1
+        outcomes = {'1-0': ('win', 'loss'), '0-1': ('loss', 'win')}.get(result, ('draw', 'draw'))
+        for standing, outcome in zip(players, outcomes):
+            self._score(standing, outcome)
+        return self._pair_again(players)
+
+    def abandon(self, game_id):
+        """Forget a game that ended without a result (deleted); both players are paired again"""
+        return self._pair_again([self.players[player_id] for player_id in self.games.pop(game_id)])
+
+    def close(self):
+        """At the end of the arena: nobody waits for a game any more"""
+        for player_id in list(self._waiting_key):
+            self._unwait(player_id)
+
+    def standings(self, limit=50, offset=0):
+        return [dict(self.players[player_id].to_dict(), rank=offset + index + 1)
+                for index, (_, _, player_id) in enumerate(self._leaderboard[offset:offset + limit])]
+
+    def rank(self, player_id):
+        """1-based place on the leaderboard"""
+        return bisect.bisect_left(self._leaderboard, self.players[player_id].key) + 1
+
+    def status(self):
+        return {
+            "arena_id": self.arena_id,
+            "state": 'finished' if self.finished else 'running' if self.started else 'waiting',
+            "starts_at": self.starts_at,
+            "ends_at": self.ends_at,
+            "players": len(self.players),
+            "waiting": self.waiting,
+            "playing": 2 * len(self.games),
+            "games_played": self.games_played,
+        }
+
+    def _score(self, standing, outcome):
+        points = {'win': WIN, 'draw': DRAW, 'loss': 0}[outcome]
+        if standing.streak >= STREAK:
+            points *= 2
+        standing.games += 1
+        standing.score += points
+        if outcome == 'win':
+            standing.wins += 1
+            standing.streak += 1
+        else:
+            if outcome == 'draw':
+                standing.draws += 1
+            else:
+                standing.losses += 1
+            standing.streak = 0
+        self._rank(standing)
+
+    def _rank(self, standing):
+        if standing.key is not None:
+            del self._leaderboard[bisect.bisect_left(self._leaderboard, standing.key)]
+        standing.key = (-standing.score, -standing.rating, standing.player_id)
+        bisect.insort(self._leaderboard, standing.key)
+
+    def _pair_again(self, players):
+        pairings = []
+        for standing in players:
+            standing.game_id = None
+            if not standing.withdrawn and not self.finished:
+                pairings.extend(self._seek(standing))
+        return pairings
+
+    def _seek(self, standing):
+        """Pair with the closest waiting rating (not the last opponent if there's a choice), else wait"""
+        if not self.started:
+            self._wait(standing)
+            return []
+        index = bisect.bisect_left(self._waiting, (standing.rating, -1))
+        best = None
+        for candidate in range(max(0, index - self.scan), min(len(self._waiting), index + self.scan)):
+            rating, ticket = self._waiting[candidate]
+            opponent_id = self._ticket_players[ticket]
+            gap = abs(rating - standing.rating)
+            rematch = opponent_id == standing.last_opponent
+            if best is None or (rematch, gap) < best[0]:
+                best = ((rematch, gap), opponent_id)
+        if best is None or best[0][0] and self.games:
+            # Nobody else to play yet; wait for the next game to finish
+            self._wait(standing)
+            return []
+        opponent = self.players[best[1]]
+        self._unwait(opponent.player_id)
+        return [self._pair(opponent, standing)]
+
+    def _pair(self, first, second):
+        # White to whoever has had Black more often, then to whoever had Black last,
+        # then to the player who waited longer
+        def owed_white(standing):
+            return standing.color_balance, standing.last_color == 'white'
+        white, black = (second, first) if owed_white(second) < owed_white(first) else (first, second)
+        game_id = str(uuid.uuid4())
+        white.color_balance += 1
+        black.color_balance -= 1
+        white.last_color, black.last_color = 'white', 'black'
+        white.last_opponent, black.last_opponent = black.player_id, white.player_id
+        white.game_id = black.game_id = game_id
+        self.games[game_id] = (white.player_id, black.player_id)
+        return Pairing(game_id, white.player_id, black.player_id)
+
+    def _wait(self, standing):
+        self._tickets += 1
+        key = (standing.rating, self._tickets)
+        bisect.insort(self._waiting, key)
+        self._waiting_key[standing.player_id] = key
+        self._ticket_players[self._tickets] = standing.player_id
+
+    def _unwait(self, player_id):
+        key = self._waiting_key.pop(player_id, None)
+        if key is not None:
+            del self._waiting[bisect.bisect_left(self._waiting, key)]
+            del self._ticket_players[key[1]]
@@ -3,13 +3,32 @@ from flask_cors import CORS
 from flask_socketio import SocketIO, emit, join_room, leave_room
 import chess
 import chess.engine
-import chess.pgn
 import json
 import uuid
-from threading import Lock
+import atexit
+import bisect
+import cProfile
+import functools
+import hmac
+import random
+import re
+import shutil
+import sys
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from threading import Lock, Condition, Thread, Event, Timer, local, get_ident, active_count
 import os
 import io
+import math
+import time
 from datetime import datetime
+from lite_engine import LiteEngine
+from archive import Archive
+from uci_driver import UciDriver
+import wire
+from game_stats import GameStats
+from arena import Arena
+from subscriptions import GameFilter, SubscriptionHub
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-here'
@@ -25,19 +44,975 @@ GAMES_DIR = 'games'
 if not os.path.exists(GAMES_DIR):
     os.makedirs(GAMES_DIR)
 
-# Stockfish engine path - adjust this based on your system
-STOCKFISH_PATH = os.environ.get('STOCKFISH_PATH', '/opt/homebrew/bin/stockfish')
-if not os.path.exists(STOCKFISH_PATH):
-    STOCKFISH_PATH = '/usr/local/bin/stockfish'  # Alternative path
-if not os.path.exists(STOCKFISH_PATH):
-    STOCKFISH_PATH = '/usr/bin/stockfish'  # Docker/Linux path
-if not os.path.exists(STOCKFISH_PATH):
-    STOCKFISH_PATH = '/usr/games/stockfish'  # Debian/Ubuntu games path
-if not os.path.exists(STOCKFISH_PATH):
-    STOCKFISH_PATH = 'stockfish'  # Assume it's in PATH
+def resolve_stockfish_path():
+    """Stockfish engine path - $STOCKFISH_PATH, then common install locations, then PATH"""
+    candidates = [
+        os.environ.get('STOCKFISH_PATH'),
+        '/opt/homebrew/bin/stockfish',  # macOS Homebrew (Apple Silicon)
+        '/usr/local/bin/stockfish',  # Alternative path
+        '/usr/bin/stockfish',  # Docker/Linux path
+        '/usr/games/stockfish',  # Debian/Ubuntu games path
+    ]
+    for candidate in candidates:
+        if candidate and os.path.exists(candidate):
+            return candidate
+    return shutil.which('stockfish') or 'stockfish'  # Assume it's in PATH
+
+STOCKFISH_PATH = resolve_stockfish_path()
+
+# Number of Stockfish instances kept started and idle, so creating a
+# vs_computer game never pays for a process spawn and UCI handshake
+ENGINE_PREWARM = int(os.environ.get('ENGINE_PREWARM', '2'))
+
+# How engine processes are driven: 'shared' runs every engine's UCI protocol on
+# one event-loop thread, 'thread' gives each engine its own (SimpleEngine.popen_uci)
+ENGINE_DRIVER = os.environ.get('ENGINE_DRIVER', 'shared')
+uci_driver = UciDriver()
+
+def spawn_engine(path):
+    """Start a UCI engine with the configured driver; returns a SimpleEngine either way"""
+    if ENGINE_DRIVER == 'thread':
+        return chess.engine.SimpleEngine.popen_uci(path)
+    return uci_driver.popen_uci(path)
+
+class EnginePool:
+    """Pre-started UCI engines handed out to new vs_computer games.
+    
+    start() validates the engine once and keeps `size` idle instances warm
+    in a background thread; `ready` flips once the first batch is up.
+    Engines released by finished games are reused while the pool is short.
+    """
+    RETRY_DELAY = 5.0
+    
+    def __init__(self, path=STOCKFISH_PATH, size=ENGINE_PREWARM):
+        self.path = path
+        self.size = size
+        self.ready = False
+        self.error = None
+        self._idle = []
+        self._cond = Condition()
+        self._thread = None
+    
+    def _spawn(self):
+        return spawn_engine(self.path)
+    
+    def start(self):
+        if self._thread is None:
+            self._thread = Thread(target=self._maintain, name='engine-prewarm', daemon=True)
+            self._thread.start()
+    
+    def _maintain(self):
+        while True:
+            with self._cond:
+                while self.ready and len(self._idle) >= self.size:
+                    self._cond.wait()
+            try:
+                engine = self._spawn()
+            except Exception as e:
+                self.error = f"Failed to start engine at {self.path}: {e}"
+                print(self.error)
+                time.sleep(self.RETRY_DELAY)
+                continue
+            self.error = None
+            with self._cond:
+                if len(self._idle) < self.size:
+                    self._idle.append(engine)
+                    engine = None
+                if len(self._idle) >= self.size and not self.ready:
+                    self.ready = True
+                    print(f"Engine pool ready ({self.size} warm instance(s) of {self.path})")
+            if engine is not None:
+                # Only needed to validate the engine (size 0) or the pool refilled meanwhile
+                engine.quit()
+    
+    def acquire(self):
+        """A started engine - a warm one if available, otherwise spawned now"""
+        with self._cond:
+            engine = self._idle.pop() if self._idle else None
+            self._cond.notify()
+        return engine if engine is not None else self._spawn()
+    
+    def release(self, engine):
+        """Return a finished game's engine to the pool at full strength, or shut it down"""
+        with self._cond:
+            keep = len(self._idle) < self.size
+        if keep:
+            try:
+                # Games weaken their engine; the next user (a game or an analysis) mustn't inherit that
+                if "Skill Level" in engine.options:
+                    engine.configure({"Skill Level": engine.options["Skill Level"].default})
+            except Exception:
+                keep = False  # the engine died; the prewarm thread replaces it
+        if keep:
+            with self._cond:
+                if len(self._idle) < self.size:
+                    self._idle.append(engine)
+                    return
+        engine.quit()
+    
+    def status(self):
+        with self._cond:
+            return {
+                "ready": self.ready,
+                "engine_path": self.path,
+                "warm_engines": len(self._idle),
+                "target_warm_engines": self.size,
+                "error": self.error,
+            }
+
+engine_pool = EnginePool()
+
+# Engine admission control - bounds concurrent Stockfish searches so a burst of
+# vs_computer moves degrades gracefully instead of stalling every request
+ENGINE_MOVE_TIME = float(os.environ.get('ENGINE_MOVE_TIME', '1.0'))  # seconds per full search
+ENGINE_SHALLOW_MOVE_TIME = float(os.environ.get('ENGINE_SHALLOW_MOVE_TIME', '0.1'))  # degraded search
+ENGINE_MAX_CONCURRENT = int(os.environ.get('ENGINE_MAX_CONCURRENT', '4'))
+ENGINE_QUEUE_LIMIT = int(os.environ.get('ENGINE_QUEUE_LIMIT', '32'))
+ENGINE_QUEUE_DEADLINE = float(os.environ.get('ENGINE_QUEUE_DEADLINE', '3.0'))  # max seconds a reply may wait
+ENGINE_GLOBAL_RATE = float(os.environ.get('ENGINE_GLOBAL_RATE', '20'))  # searches per second, all clients
+ENGINE_GLOBAL_BURST = int(os.environ.get('ENGINE_GLOBAL_BURST', '40'))
+ENGINE_CLIENT_RATE = float(os.environ.get('ENGINE_CLIENT_RATE', '1'))  # searches per second, per client
+ENGINE_CLIENT_BURST = int(os.environ.get('ENGINE_CLIENT_BURST', '5'))
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`"""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+    
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, now):
+        """Seconds until a token is available (0 if one is available now)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+    
+    def take(self):
+        self.tokens -= 1
+
+class EngineBusy(Exception):
+    """Raised when an engine search is shed; `retry_after` is in whole seconds"""
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+# Engine work classes, highest priority first, and their shares of engine slots
+# when all are backlogged: interactive = a player waiting for the computer's reply,
+# analysis = on-demand position analysis, batch = background jobs
+WORK_CLASSES = ('interactive', 'analysis', 'batch')
+ENGINE_CLASS_WEIGHTS = os.environ.get('ENGINE_CLASS_WEIGHTS', 'interactive:100,analysis:10,batch:1')
+ENGINE_ANALYSIS_DEADLINE = float(os.environ.get('ENGINE_ANALYSIS_DEADLINE', '30.0'))  # max queueing, analysis/batch
+ENGINE_SLICE_TIME = float(os.environ.get('ENGINE_SLICE_TIME', '0.5'))  # seconds per analysis time slice
+
+def parse_class_weights(spec):
+    """'interactive:100,analysis:10' -> {class: weight}, defaulting unnamed classes to 1"""
+    weights = {work_class: 1.0 for work_class in WORK_CLASSES}
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        work_class, weight = item.split(':')
+        if work_class.strip() not in weights:
+            raise ValueError(f"Unknown engine work class: {work_class}")
+        weights[work_class.strip()] = float(weight)
+    return weights
+
+# Upper bounds (seconds) of the wait-time histogram buckets; the last bucket is unbounded
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class WaitHistogram:
+    """Counts of queue wait times per bucket"""
+    def __init__(self, buckets=WAIT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+    
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+    
+    def snapshot(self):
+        return {
+            "le": list(self.buckets) + ["+Inf"],
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": round(self.total, 6),
+        }
+
+class EngineTicket:
+    """An admitted engine search slot. Always release() it when done.
+    
+    Analysis and batch tickets can be preempted by a higher-priority request;
+    `preempted` is then set and any on_preempt() callback runs, and the holder
+    should stop its search and release the slot.
+    """
+    def __init__(self, admission, limit, degraded, work_class='interactive'):
+        self._admission = admission
+        self.limit = limit
+        self.degraded = degraded
+        self.work_class = work_class
+        self.started = time.monotonic()
+        self.preempted = Event()
+        self._on_preempt = None
+        self._released = False
+    
+    def on_preempt(self, callback):
+        self._on_preempt = callback
+        if callback is not None and self.preempted.is_set():
+            callback()
+    
+    def _preempt(self):
+        self.preempted.set()
+        if self._on_preempt is not None:
+            self._on_preempt()
+    
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._admission._release(self)
+
+class _Waiter:
+    def __init__(self, work_class, key):
+        self.work_class = work_class
+        self.key = key
+        self.granted = False
+
+class EngineAdmission:
+    """Weighted fair engine scheduler with global and per-client token buckets.
+    
+    Requests beyond the rate limits or the queue length are shed immediately.
+    Free slots go to the backlogged work class with the earliest virtual
+    finish time (weighted fair queueing on ENGINE_CLASS_WEIGHTS), and within
+    a class round-robin across games, so one busy game can't starve the others. An interactive
+    request that would miss the queue deadline with a full search is given a
+    shallow search instead, and one that cannot get a slot before the deadline
+    is shed. When every slot is busy, a waiting request preempts a running
+    search of a lower class.
+    """
+    MAX_TRACKED_CLIENTS = 10000
+    
+    def __init__(self, max_concurrent=ENGINE_MAX_CONCURRENT, queue_limit=ENGINE_QUEUE_LIMIT,
+                 queue_deadline=ENGINE_QUEUE_DEADLINE, weights=ENGINE_CLASS_WEIGHTS):
+        self.max_concurrent = max_concurrent
+        self.queue_limit = queue_limit
+        self.queue_deadline = queue_deadline
+        self.weights = parse_class_weights(weights) if isinstance(weights, str) else dict(weights)
+        self._cond = Condition()
+        self._active = 0
+        self._waiting = 0
+        self._queues = {work_class: OrderedDict() for work_class in WORK_CLASSES}  # key -> deque of waiters
+        self._pass = {work_class: 0.0 for work_class in WORK_CLASSES}
+        self._virtual_time = 0.0
+        self._running = set()
+        self._global_bucket = TokenBucket(ENGINE_GLOBAL_RATE, ENGINE_GLOBAL_BURST)
+        self._client_buckets = OrderedDict()
+        self.histograms = {work_class: WaitHistogram() for work_class in WORK_CLASSES}
+        self.counters = {
+            "admitted": 0,
+            "degraded": 0,
+            "preempted": 0,
+            "shed_rate_limited": 0,
+            "shed_queue_full": 0,
+            "shed_deadline": 0,
+        }
+    
+    def _client_bucket(self, client_id):
+        bucket = self._client_buckets.pop(client_id, None)
+        if bucket is None:
+            bucket = TokenBucket(ENGINE_CLIENT_RATE, ENGINE_CLIENT_BURST)
+            if len(self._client_buckets) >= self.MAX_TRACKED_CLIENTS:
+                self._client_buckets.popitem(last=False)
+        self._client_buckets[client_id] = bucket
+        return bucket
+    
+    def _drain_estimate(self):
+        """Rough seconds until the current queue has drained"""
+        backlog = self._waiting + self._active
+        return max(1, math.ceil(backlog / self.max_concurrent * ENGINE_MOVE_TIME))
+    
+    def _enqueue(self, waiter):
+        queue = self._queues[waiter.work_class]
+        if not queue:
+            # A class returning from idle doesn't get credit for the time it had no work
+            self._pass[waiter.work_class] = max(self._pass[waiter.work_class], self._virtual_time)
+        queue.setdefault(waiter.key, deque()).append(waiter)
+        self._waiting += 1
+    
+    def _dequeue(self, waiter):
+        queue = self._queues[waiter.work_class]
+        waiters = queue.get(waiter.key)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            if not waiters:
+                del queue[waiter.key]
+            self._waiting -= 1
+    
+    def _dispatch(self):
+        """Hand free slots to waiters; preempt lower classes if none are free"""
+        granted = False
+        while self._active < self.max_concurrent:
+            backlogged = [work_class for work_class in WORK_CLASSES if self._queues[work_class]]
+            if not backlogged:
+                break
+            # Earliest virtual finish time wins; ties go to the higher class
+            work_class = min(backlogged, key=lambda c: (self._pass[c] + 1 / self.weights[c], WORK_CLASSES.index(c)))
+            self._virtual_time = self._pass[work_class]
+            self._pass[work_class] += 1 / self.weights[work_class]
+            
+            queue = self._queues[work_class]
+            key, waiters = next(iter(queue.items()))
+            waiter = waiters.popleft()
+            del queue[key]
+            if waiters:
+                queue[key] = waiters  # back of the round-robin
+            waiter.granted = True
+            self._waiting -= 1
+            self._active += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+        if self._waiting:
+            self._preempt_for_waiters()
+    
+    def _preempt_for_waiters(self):
+        waiting = [WORK_CLASSES.index(c) for c in WORK_CLASSES if self._queues[c]]
+        victims = [ticket for ticket in self._running
+                   if not ticket.preempted.is_set() and WORK_CLASSES.index(ticket.work_class) > min(waiting)]
+        if victims:
+            # Lowest class first, then the search that has run longest
+            victim = max(victims, key=lambda t: (WORK_CLASSES.index(t.work_class), -t.started))
+            self.counters["preempted"] += 1
+            victim._preempt()
+    
+    def admit(self, client_id, game_id=None, work_class='interactive', deadline=None):
+        """Wait for an engine slot and return an EngineTicket, or raise EngineBusy.
+        
+        `deadline` is the longest wait in seconds; by default ENGINE_QUEUE_DEADLINE
+        for interactive requests and ENGINE_ANALYSIS_DEADLINE for the rest.
+        """
+        if work_class not in self._queues:
+            raise ValueError(f"Unknown engine work class: {work_class}")
+        if deadline is None:
+            deadline = self.queue_deadline if work_class == 'interactive' else ENGINE_ANALYSIS_DEADLINE
+        start = time.monotonic()
+        deadline_at = start + deadline
+        with self._cond:
+            # Batch work is the server's own background jobs, already yielding to
+            # everything else; the rate limits are for clients
+            rate_limited = work_class != 'batch'
+            if rate_limited:
+                client_bucket = self._client_bucket(client_id)
+                wait = max(client_bucket.wait_time(start), self._global_bucket.wait_time(start))
+                if wait > 0:
+                    self.counters["shed_rate_limited"] += 1
+                    raise EngineBusy("rate_limited", max(1, math.ceil(wait)))
+            if self._waiting >= self.queue_limit:
+                self.counters["shed_queue_full"] += 1
+                raise EngineBusy("queue_full", self._drain_estimate())
+            if rate_limited:
+                client_bucket.take()
+                self._global_bucket.take()
+            
+            waiter = _Waiter(work_class, game_id or client_id)
+            self._enqueue(waiter)
+            self._dispatch()
+            while not waiter.granted:
+                remaining = deadline_at - time.monotonic()
+                if remaining <= 0:
+                    self._dequeue(waiter)
+                    self.counters["shed_deadline"] += 1
+                    raise EngineBusy("deadline", self._drain_estimate())
+                self._cond.wait(remaining)
+            
+            self.counters["admitted"] += 1
+            waited = time.monotonic() - start
+            self.histograms[work_class].observe(waited)
+            degraded = False
+            if work_class != 'interactive':
+                limit = chess.engine.Limit(time=ENGINE_SLICE_TIME)
+            elif waited + ENGINE_MOVE_TIME > deadline:
+                degraded = True
+                self.counters["degraded"] += 1
+                limit = chess.engine.Limit(time=ENGINE_SHALLOW_MOVE_TIME)
+            else:
+                limit = chess.engine.Limit(time=ENGINE_MOVE_TIME)
+            ticket = EngineTicket(self, limit, degraded, work_class)
+            self._running.add(ticket)
+            return ticket
+    
+    def _release(self, ticket):
+        with self._cond:
+            self._active -= 1
+            self._running.discard(ticket)
+            self._dispatch()
+    
+    def snapshot(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "queue_depth": self._waiting,
+                "max_concurrent": self.max_concurrent,
+                "queue_limit": self.queue_limit,
+                "queue_deadline": self.queue_deadline,
+                "weights": self.weights,
+                "classes": {
+                    work_class: {
+                        "queued": sum(len(waiters) for waiters in self._queues[work_class].values()),
+                        "running": sum(1 for ticket in self._running if ticket.work_class == work_class),
+                        "wait_histogram": self.histograms[work_class].snapshot(),
+                    }
+                    for work_class in WORK_CLASSES
+                },
+                **self.counters,
+            }
+
+engine_admission = EngineAdmission()
+
+# Admin API and on-demand profiling
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')  # admin endpoints are disabled unless this is set
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_MODE = os.environ.get('PROFILE_MODE')  # 'deterministic' or 'sampling' to profile from startup
+PROFILE_SECONDS = float(os.environ.get('PROFILE_SECONDS', '60'))
+PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', '1.0'))  # fraction of matching requests
+PROFILE_TARGETS = [t for t in os.environ.get('PROFILE_TARGETS', '').split(',') if t]  # empty = all
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING', '0') == '1'
+
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.0'))  # fraction of requests traced
+TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH', os.path.join('traces', 'spans.jsonl'))
+TRACE_FLUSH_SIZE = int(os.environ.get('TRACE_FLUSH_SIZE', '256'))  # spans buffered before a write
+
+_request_context = local()
+
+class Tracer:
+    """Span-based request tracing with head sampling.
+    
+    A trace starts at a route or socket handler, reusing the client's trace id
+    when one is sent. Sampling is decided once per trace, so unsampled
+    requests only pay for a thread-local lookup per stage. Finished spans are
+    buffered and appended to TRACE_EXPORT_PATH as JSON lines, which stands in
+    for a trace collector.
+    """
+    def __init__(self, export_path=TRACE_EXPORT_PATH, sample_rate=TRACE_SAMPLE_RATE,
+                 flush_size=TRACE_FLUSH_SIZE):
+        self.export_path = export_path
+        self.sample_rate = sample_rate
+        self.flush_size = flush_size
+        self._lock = Lock()
+        self._buffer = []
+    
+    @contextmanager
+    def trace(self, name, trace_id=None, force=False):
+        """Root span for a request; yields the trace id (None when not sampled)"""
+        if not (force or (self.sample_rate > 0 and random.random() < self.sample_rate)):
+            yield None
+            return
+        _request_context.trace_id = trace_id or uuid.uuid4().hex
+        _request_context.spans = []
+        try:
+            with self.span(name):
+                yield _request_context.trace_id
+        finally:
+            _request_context.trace_id = None
+            _request_context.spans = None
+    
+    @contextmanager
+    def span(self, name, **attributes):
+        spans = getattr(_request_context, 'spans', None)
+        if spans is None:
+            yield None
+            return
+        span = {
+            "trace_id": _request_context.trace_id,
+            "span_id": uuid.uuid4().hex[:16],
+            "parent_id": spans[-1]["span_id"] if spans else None,
+            "name": name,
+            "start_time": time.time(),
+            "attributes": attributes,
+        }
+        spans.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        finally:
+            span["duration_ms"] = (time.perf_counter() - start) * 1000
+            spans.pop()
+            self._export(span)
+    
+    def set_attributes(self, **attributes):
+        """Attach attributes to the innermost open span, if the request is traced"""
+        spans = getattr(_request_context, 'spans', None)
+        if spans:
+            spans[-1]["attributes"].update(attributes)
+    
+    def _export(self, span):
+        with self._lock:
+            self._buffer.append(span)
+            if len(self._buffer) >= self.flush_size:
+                self._flush_locked()
+    
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+    
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        try:
+            directory = os.path.dirname(self.export_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.export_path, 'a') as f:
+                for span in self._buffer:
+                    f.write(json.dumps(span) + "\n")
+        except OSError as e:
+            print(f"Failed to export traces: {e}")
+        self._buffer = []
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+@contextmanager
+def timed_stage(name):
+    """Time a request stage when timing is enabled, and trace it as a span
+    when the request is sampled"""
+    with tracer.span(name):
+        timings = getattr(_request_context, 'timings', None)
+        if timings is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+@contextmanager
+def locked_games():
+    """Hold games_lock, recording the wait as the 'lock_wait' stage"""
+    with timed_stage('lock_wait'):
+        games_lock.acquire()
+    try:
+        yield
+    finally:
+        games_lock.release()
+
+class RequestTimings:
+    """Aggregated per-target, per-stage request timings"""
+    def __init__(self):
+        self.enabled = REQUEST_TIMING
+        self._lock = Lock()
+        self._stats = {}
+    
+    def record(self, target, total, stages):
+        stages = {**stages, "total": total}
+        with self._lock:
+            target_stats = self._stats.setdefault(target, {})
+            for stage, elapsed in stages.items():
+                stat = target_stats.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                stat["count"] += 1
+                stat["total_ms"] += elapsed * 1000
+                stat["max_ms"] = max(stat["max_ms"], elapsed * 1000)
+        print(f"[timing] {target} " + " ".join(f"{k}={v * 1000:.1f}ms" for k, v in stages.items()))
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                target: {
+                    stage: {**stat, "avg_ms": stat["total_ms"] / stat["count"]}
+                    for stage, stat in target_stats.items()
+                }
+                for target, target_stats in self._stats.items()
+            }
+    
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+class Profiler:
+    """Time-boxed profiling of a live process.
+    
+    'deterministic' mode runs a fraction of matching requests under cProfile
+    and writes one .pstats file per request. 'sampling' mode snapshots every
+    thread's stack at a fixed interval and writes a folded-stack file that
+    flamegraph.pl and speedscope read directly.
+    """
+    MODES = ('deterministic', 'sampling')
+    
+    def __init__(self, output_dir=PROFILE_DIR):
+        self.output_dir = output_dir
+        self._lock = Lock()
+        self.mode = None
+        self.until = 0.0
+        self.sample_rate = 1.0
+        self.targets = set()
+        self.files = []
+        self._stop = Event()
+        self._sampler = None
+    
+    def start(self, mode, seconds, sample_rate=1.0, targets=None, interval=0.005):
+        if mode not in self.MODES:
+            raise ValueError(f"mode must be one of {', '.join(self.MODES)}")
+        self.stop()
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            self.mode = mode
+            self.until = time.monotonic() + seconds
+            self.sample_rate = sample_rate
+            self.targets = set(targets or [])
+            self._stop = Event()
+            if mode == 'sampling':
+                self._sampler = Thread(target=self._sample, args=(interval, self._stop), daemon=True)
+                self._sampler.start()
+    
+    def stop(self):
+        with self._lock:
+            sampler = self._sampler
+            self._sampler = None
+            self.mode = None
+            self._stop.set()
+        if sampler:
+            sampler.join()
+    
+    def active(self):
+        if self.mode and time.monotonic() >= self.until and self.mode == 'deterministic':
+            self.mode = None
+        return self.mode is not None
+    
+    def should_profile(self, target):
+        return (self.active() and self.mode == 'deterministic'
+                and (not self.targets or target in self.targets)
+                and random.random() < self.sample_rate)
+    
+    def _output_path(self, name, extension):
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        return os.path.join(self.output_dir, f"{name}_{stamp}_{uuid.uuid4().hex[:6]}.{extension}")
+    
+    def profile_call(self, target, fn, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            path = self._output_path(target.replace(':', '_'), 'pstats')
+            profile.dump_stats(path)
+            with self._lock:
+                self.files.append(path)
+    
+    def _sample(self, interval, stop):
+        counts = {}
+        own_id = get_ident()
+        while not stop.is_set() and time.monotonic() < self.until:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+            stop.wait(interval)
+        
+        path = self._output_path('sampling', 'folded')
+        with open(path, 'w') as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        with self._lock:
+            self.files.append(path)
+            if self._sampler is not None and self._stop is stop:
+                self._sampler = None
+                self.mode = None
+    
+    def status(self):
+        with self._lock:
+            active = self.active()
+            return {
+                "active": active,
+                "mode": self.mode,
+                "seconds_left": max(0.0, self.until - time.monotonic()) if active else 0.0,
+                "sample_rate": self.sample_rate,
+                "targets": sorted(self.targets),
+                "files": list(self.files),
+            }
+
+request_timings = RequestTimings()
+profiler = Profiler()
+
+# Client trace ids are written to the span export as they are: only short hex ids and UUIDs are kept
+TRACE_ID_PATTERN = re.compile(r'[0-9a-f]{8,32}|[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.IGNORECASE)
+
+def _client_trace_id(trace_id):
+    """`trace_id` if it looks like one, else None so the tracer makes a new one"""
+    if isinstance(trace_id, str) and TRACE_ID_PATTERN.fullmatch(trace_id):
+        return trace_id
+    return None
+
+def _incoming_trace(target, args):
+    """The (trace_id, force_sampling) a client sent with a request, if any.
+    
+    Forced sampling is honoured only with the admin token, so clients can't
+    make the server trace (and export) every request they send.
+    """
+    if target.startswith('socket:'):
+        data = args[0] if args and isinstance(args[0], dict) else {}
+        return (_client_trace_id(data.get('trace_id')),
+                bool(data.get('trace_sampled')) and is_admin(data.get('admin_token')))
+    return (_client_trace_id(request.headers.get('X-Trace-Id')),
+            request.headers.get('X-Trace-Sampled') == '1' and is_admin(request.headers.get('X-Admin-Token')))
+
+def instrumented(target):
+    """Wrap a route or socket handler with tracing and opt-in timing and profiling"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timing = request_timings.enabled
+            if timing:
+                _request_context.timings = {}
+            start = time.perf_counter()
+            trace_id, force = _incoming_trace(target, args)
+            try:
+                with tracer.trace(target, trace_id, force):
+                    if profiler.should_profile(target):
+                        return profiler.profile_call(target, fn, *args, **kwargs)
+                    return fn(*args, **kwargs)
+            finally:
+                if timing:
+                    stages = _request_context.timings
+                    _request_context.timings = None
+                    request_timings.record(target, time.perf_counter() - start, stages)
+        return wrapper
+    return decorator
+
+def is_admin(token):
+    """Whether `token` matches ADMIN_TOKEN (never, if the admin API is disabled)"""
+    return bool(ADMIN_TOKEN) and isinstance(token, str) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+def admin_required(fn):
+    """Require the X-Admin-Token header to match ADMIN_TOKEN"""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"success": False, "error": "Admin API disabled"}), 404
+        if not is_admin(request.headers.get('X-Admin-Token', '')):
+            return jsonify({"success": False, "error": "Unauthorized"}), 401
+        return fn(*args, **kwargs)
+    return wrapper
+
+# Pondering - vs_computer games can keep the engine thinking about its next
+# move during the player's turn, capped by a server-wide budget
+ENGINE_PONDER = os.environ.get('ENGINE_PONDER', '0') == '1'  # default for new games
+PONDER_MAX_CONCURRENT = int(os.environ.get('PONDER_MAX_CONCURRENT', '2'))  # games pondering at once
+PONDER_MAX_TIME = float(os.environ.get('PONDER_MAX_TIME', '10.0'))  # seconds per ponder
+
+class PonderBudget:
+    """Server-wide cap on concurrent ponder searches.
+    
+    A slot frees up when the ponder is collected or cancelled, or once its
+    search has run out of time, so games whose player walked away don't hold
+    one forever.
+    """
+    def __init__(self, max_concurrent=PONDER_MAX_CONCURRENT, max_time=PONDER_MAX_TIME):
+        self.max_concurrent = max_concurrent
+        self.max_time = max_time
+        self._lock = Lock()
+        self._slots = {}  # token -> monotonic expiry
+        self.counters = {"started": 0, "hits": 0, "misses": 0, "rejected": 0}
+    
+    def acquire(self):
+        """A slot token, or None when the budget is spent"""
+        now = time.monotonic()
+        with self._lock:
+            self._slots = {token: expiry for token, expiry in self._slots.items() if expiry > now}
+            if len(self._slots) >= self.max_concurrent:
+                self.counters["rejected"] += 1
+                return None
+            token = object()
+            self._slots[token] = now + self.max_time
+            self.counters["started"] += 1
+            return token
+    
+    def release(self, token, hit):
+        with self._lock:
+            self._slots.pop(token, None)
+            self.counters["hits" if hit else "misses"] += 1
+    
+    def snapshot(self):
+        now = time.monotonic()
+        with self._lock:
+            active = sum(1 for expiry in self._slots.values() if expiry > now)
+            return {"active": active, "max_concurrent": self.max_concurrent, **self.counters}
+
+ponder_budget = PonderBudget()
+
+# Syzygy endgame tablebases - directories of .rtbw/.rtbz files separated by os.pathsep.
+# Unset disables probing; low-material positions are then searched like any other.
+SYZYGY_PATH = os.environ.get('SYZYGY_PATH', '')
+SYZYGY_ADJUDICATE = os.environ.get('SYZYGY_ADJUDICATE', '0') == '1'  # end tablebase-decided games at once
+SYZYGY_MAX_FDS = int(os.environ.get('SYZYGY_MAX_FDS', '128'))  # table files kept open and mapped
+
+class EndgameTablebase:
+    """Syzygy WDL/DTZ tables shared by every game.
+    
+    Table files are memory-mapped on first probe and kept in one LRU of at
+    most `max_fds` open files, so games probing at the same time share the
+    mappings instead of reopening files. Probes are thread-safe.
+    """
+    def __init__(self, paths=SYZYGY_PATH, max_fds=SYZYGY_MAX_FDS):
+        self.paths = [path for path in paths.split(os.pathsep) if path]
+        self.max_fds = max_fds
+        self.max_pieces = 0
+        self.error = None
+        self._tablebase = None
+        self._lock = Lock()
+        self.counters = {"probes": 0, "moves": 0, "adjudications": 0, "misses": 0}
+        if self.paths:
+            self._open()
+    
+    def _open(self):
+        import chess.syzygy  # Only needed when tables are configured
+    
+        tablebase = chess.syzygy.Tablebase(max_fds=self.max_fds)
+        try:
+            for path in self.paths:
+                tablebase.add_directory(path)
+        except OSError as e:
+            self.error = f"Failed to open Syzygy tables: {e}"
+            print(self.error)
+        # Table keys look like KRPvKR, so the widest table is its length minus the 'v'
+        self.max_pieces = max((len(key) - 1 for key in tablebase.wdl), default=0)
+        if self.max_pieces:
+            self._tablebase = tablebase
+            print(f"Syzygy tables loaded from {os.pathsep.join(self.paths)} (up to {self.max_pieces} pieces)")
+    
+    def covers(self, board):
+        """Whether `board` has few enough pieces to be in the tables"""
+        return (self._tablebase is not None and not board.castling_rights
+                and chess.popcount(board.occupied) <= self.max_pieces)
+    
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+    
+    def probe_wdl(self, board):
+        """Win/draw/loss for the side to move (2, 1, 0, -1, -2), or None if not in the tables"""
+        if not self.covers(board):
+            return None
+        self._count("probes")
+        try:
+            return self._tablebase.probe_wdl(board)
+        except KeyError:  # MissingTableError
+            self._count("misses")
+            return None
+    
+    def adjudicate(self, board):
+        """Result string for a position the tables decide, or None.
+        
+        Cursed wins and blessed losses are draws under the fifty-move rule.
+        """
+        wdl = self.probe_wdl(board)
+        if wdl is None:
+            return None
+        self._count("adjudications")
+        if wdl in (-1, 0, 1):
+            return '1/2-1/2'
+        white_wins = (wdl == 2) == (board.turn == chess.WHITE)
+        return '1-0' if white_wins else '0-1'
+    
+    def _rank(self, board, move):
+        """Sort key for `move` - higher is better for the side playing it"""
+        board.push(move)
+        try:
+            if board.is_checkmate():
+                return (2, 1, 1, 0)
+            wdl = -self._tablebase.probe_wdl(board)
+            dtz = abs(self._tablebase.probe_dtz(board))
+            zeroing = board.halfmove_clock == 0
+        finally:
+            board.pop()
+        if wdl > 0:
+            # Winning: reset the fifty-move counter if possible, otherwise close in fastest
+            return (wdl, 0, int(zeroing), -dtz)
+        if wdl < 0:
+            # Losing: hold out as long as possible
+            return (wdl, 0, int(not zeroing), dtz)
+        return (wdl, 0, 0, 0)
+    
+    def best_move(self, board):
+        """The tablebase-optimal move in UCI, or None if the position isn't covered"""
+        if not self.covers(board):
+            return None
+        board = board.copy(stack=False)
+        self._count("probes")
+        try:
+            move = max(board.legal_moves, key=lambda move: self._rank(board, move), default=None)
+        except KeyError:  # MissingTableError - a WDL or DTZ file for a child position is absent
+            self._count("misses")
+            return None
+        if move is None:
+            return None
+        self._count("moves")
+        return move.uci()
+    
+    def status(self):
+        with self._lock:
+            return {
+                "enabled": self._tablebase is not None,
+                "paths": self.paths,
+                "max_pieces": self.max_pieces,
+                "max_open_files": self.max_fds,
+                "open_files": len(self._tablebase.lru) if self._tablebase is not None else 0,
+                "adjudicate": SYZYGY_ADJUDICATE,
+                "error": self.error,
+                **self.counters
+            }
+
+endgame_tablebase = EndgameTablebase()
+
+# Computer opponents rated at or below this are played by the built-in engine
+# instead of Stockfish (0 always uses Stockfish)
+LITE_ENGINE_MAX_ELO = int(os.environ.get('LITE_ENGINE_MAX_ELO', '1200'))
+LITE_ENGINE_MOVE_TIME = float(os.environ.get('LITE_ENGINE_MOVE_TIME', '0.25'))  # search time cap, seconds
+
+# Longest premove queue a player may hold
+PREMOVE_MAX_QUEUE = int(os.environ.get('PREMOVE_MAX_QUEUE', '8'))
+
+# Longest player id, in UTF-8 bytes; game_update's binary encoding (wire.py) can carry up to 255
+PLAYER_ID_MAX_BYTES = min(255, int(os.environ.get('PLAYER_ID_MAX_BYTES', '64')))
+
+def player_id_error(player_id):
+    """Why `player_id` can't join a game or arena, or None"""
+    if not isinstance(player_id, str) or not player_id or len(player_id.encode()) > PLAYER_ID_MAX_BYTES:
+        return f"player_id must be a non-empty string of at most {PLAYER_ID_MAX_BYTES} bytes"
+    return None
+
+# Plies between stored board checkpoints; a position lookup replays fewer than this many moves
+CHECKPOINT_INTERVAL = int(os.environ.get('CHECKPOINT_INTERVAL', '16'))
+
+# Called with the ChessGame once it has a result, under games_lock - keep them quick
+game_finished_hooks = []
+
+# Finished-game archive (archive.py); an empty ARCHIVE_DIR disables it
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(GAMES_DIR, 'archive'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '256'))  # games per compressed block
+ARCHIVE_FLUSH_INTERVAL = float(os.environ.get('ARCHIVE_FLUSH_INTERVAL', '60'))  # max seconds a game stays buffered
+ARCHIVE_MAX_RUNS = int(os.environ.get('ARCHIVE_MAX_RUNS', '16'))  # index runs before the flusher merges them
 
 class ChessGame:
-    def __init__(self, game_id, game_type='multiplayer', elo_rating=1500):
+    def __init__(self, game_id, game_type='multiplayer', elo_rating=1500, ponder=ENGINE_PONDER):
         self.game_id = game_id
         self.board = chess.Board()
         self.game_type = game_type  # 'multiplayer' or 'vs_computer'
@@ -49,10 +1024,24 @@ class ChessGame:
         self.game_result = '*'  # '*' = ongoing, '1-0' = white wins, '0-1' = black wins, '1/2-1/2' = draw
         self.start_time = datetime.now()
         self.end_time = None
+        self._legal_map_key = None
+        self._legal_map = {}
+        self.checkpoints = [self.board.fen()]  # FEN at ply 0, K, 2K, ... (K = CHECKPOINT_INTERVAL)
+        self.ponder = ponder and game_type == 'vs_computer'
+        self._ponder = None  # (expected reply, analysis, budget token, start time)
+        self._ponder_lock = Lock()
+        self._expected_reply = None
+        self.premoves = {'white': [], 'black': []}  # queued {"move", "if"} per color
+        self.adjudication = None  # set when the tablebase decided the result
         
-        if game_type == 'vs_computer':
+        if game_type == 'vs_computer' and elo_rating <= LITE_ENGINE_MAX_ELO:
+            # In-process engine - no subprocess, replies in milliseconds, no pondering
+            self.engine = LiteEngine(elo_rating)
+            self.ponder = False
+            print(f"Initialized built-in engine (ELO {elo_rating})")
+        elif game_type == 'vs_computer':
             try:
-                self.engine = chess.engine.SimpleEngine.popen_uci(STOCKFISH_PATH)
+                self.engine = engine_pool.acquire()
                 # Convert ELO rating to Stockfish skill level (0-20)
                 skill_level = self._elo_to_skill_level(elo_rating)
                 self.engine.configure({"Skill Level": skill_level})
@@ -61,7 +1050,13 @@ class ChessGame:
                 print(f"Failed to initialize Stockfish: {e}")
                 self.engine = None
     
-    def _elo_to_skill_level(self, elo):
+    @property
+    def uses_stockfish(self):
+        """Whether the computer's moves cost a Stockfish search"""
+        return self.engine is not None and not isinstance(self.engine, LiteEngine)
+    
+    @staticmethod
+    def _elo_to_skill_level(elo):
         """Convert ELO rating to Stockfish skill level (0-20)"""
         # Map ELO 800-3000 to skill level 0-20
         # 800 ELO -> 0, 1500 ELO -> 10, 3000 ELO -> 20
@@ -94,41 +1089,71 @@ class ChessGame:
         if player_id in self.players:
             del self.players[player_id]
     
-    def make_move(self, move_str, player_id=None):
+    def move_error(self, move_str, player_id=None):
+        """Why a player's move would be rejected now, or None if it can be played"""
+        if self.game_result != '*':
+            return "Game is over"
         # Validate player turn for multiplayer
         if self.game_type == 'multiplayer':
             if player_id not in self.players:
-                return {"success": False, "error": "Player not in game"}
+                return "Player not in game"
             
             player_color = self.players[player_id]
             if player_color != self.current_turn:
-                return {"success": False, "error": "Not your turn"}
+                return "Not your turn"
+        elif self.engine and self.current_turn == 'black':
+            # The computer plays black; its reply is computed outside games_lock
+            # and played with play_computer_move(), whatever player_id says
+            return "Not your turn"
         
+        try:
+            move = chess.Move.from_uci(move_str)
+        except Exception as e:
+            return f"Invalid move format: {str(e)}"
+        if move not in self.board.legal_moves:
+            return "Invalid move"
+        return None
+    
+    def make_move(self, move_str, player_id=None):
+        error = self.move_error(move_str, player_id)
+        if error:
+            return {"success": False, "error": error}
+        return self._play(move_str)
+    
+    def play_computer_move(self, move_str):
+        """Play the computer's (Black's) reply in a vs_computer game"""
+        if self.game_result != '*' or self.current_turn != 'black':
+            return {"success": False, "error": "Not the computer's turn"}
+        return self._play(move_str)
+    
+    def _play(self, move_str):
         try:
             move = chess.Move.from_uci(move_str)
             if move in self.board.legal_moves:
-                self.board.push(move)
-                self.move_history.append(move_str)
-                self.current_turn = 'black' if self.current_turn == 'white' else 'white'
+                self._push(move, move_str)
+                moves = [move_str]
                 
-                # Check for game ending conditions
-                if self.board.is_checkmate():
-                    self.game_result = '0-1' if self.current_turn == 'white' else '1-0'
-                    self.end_time = datetime.now()
-                elif self.board.is_stalemate() or self.board.is_insufficient_material():
-                    self.game_result = '1/2-1/2'
-                    self.end_time = datetime.now()
+                # The opponent's queued premoves are played in the same critical section
+                premoves_applied = self._apply_premoves()
+                moves.extend(premoves_applied)
+                last_move = chess.Move.from_uci(moves[-1])
                 
                 result = {
                     "success": True,
                     "board": self.board.fen(),
-                    "move": move_str,
+                    "move": moves[-1],
+                    "moves": moves,
+                    "premoves_applied": premoves_applied,
+                    "from_square": chess.square_name(last_move.from_square),
+                    "to_square": chess.square_name(last_move.to_square),
                     "current_turn": self.current_turn,
                     "is_check": self.board.is_check(),
                     "is_checkmate": self.board.is_checkmate(),
                     "is_stalemate": self.board.is_stalemate(),
                     "move_history": self.move_history,
-                    "game_result": self.game_result
+                    "game_result": self.game_result,
+                    "adjudication": self.adjudication,
+                    "legal_moves": self.legal_move_map()
                 }
                 
                 return result
@@ -137,18 +1162,144 @@ class ChessGame:
         except Exception as e:
             return {"success": False, "error": f"Invalid move format: {str(e)}"}
     
+    def _push(self, move, move_str):
+        """Play a legal move and update history, checkpoints, turn and result"""
+        self.board.push(move)
+        self.move_history.append(move_str)
+        if len(self.move_history) % CHECKPOINT_INTERVAL == 0:
+            self.checkpoints.append(self.board.fen())
+        self.current_turn = 'black' if self.current_turn == 'white' else 'white'
+        
+        # Check for game ending conditions
+        if self.board.is_checkmate():
+            self._finish('0-1' if self.current_turn == 'white' else '1-0')
+        elif self.board.is_stalemate() or self.board.is_insufficient_material():
+            self._finish('1/2-1/2')
+        elif SYZYGY_ADJUDICATE:
+            result = endgame_tablebase.adjudicate(self.board)
+            if result is not None:
+                self.adjudication = 'syzygy'
+                self._finish(result)
+    
+    def _finish(self, result):
+        """Record the result and run game_finished_hooks, once per game; a finished game keeps its result"""
+        if self.game_result != '*':
+            return
+        self.game_result = result
+        self.end_time = datetime.now()
+        for hook in game_finished_hooks:
+            try:
+                hook(self)
+            except Exception as e:
+                print(f"Game finished hook {hook.__name__} failed: {e}")
+    
+    def queue_premoves(self, player_id, premoves, replace=True):
+        """Queue moves to play as soon as it is this player's turn.
+        
+        Each premove is a UCI string or {"move": uci, "if": uci}, where "if"
+        makes it conditional on the opponent's previous move. Premoves are only
+        checked for format here; legality is checked when they are played.
+        """
+        if player_id not in self.players:
+            return {"success": False, "error": "Player not in game"}
+        if not isinstance(premoves, list):
+            return {"success": False, "error": "Premoves must be a list"}
+        
+        color = self.players[player_id]
+        queue = [] if replace else list(self.premoves[color])
+        for premove in premoves:
+            if isinstance(premove, str):
+                premove = {"move": premove}
+            try:
+                move = chess.Move.from_uci(premove["move"]).uci()
+                condition = premove.get("if")
+                if condition is not None:
+                    condition = chess.Move.from_uci(condition).uci()
+            except (KeyError, TypeError, ValueError, AttributeError):
+                return {"success": False, "error": f"Invalid premove: {premove}"}
+            queue.append({"move": move, "if": condition})
+        
+        if len(queue) > PREMOVE_MAX_QUEUE:
+            return {"success": False, "error": f"At most {PREMOVE_MAX_QUEUE} premoves can be queued"}
+        self.premoves[color] = queue
+        return {"success": True, "color": color, "premoves": queue}
+    
+    def _apply_premoves(self):
+        """Play queued premoves for the side to move until one doesn't apply.
+        
+        A premove that is illegal or whose condition doesn't match clears
+        that player's whole queue.
+        """
+        applied = []
+        while self.game_result == '*' and self.premoves[self.current_turn]:
+            queue = self.premoves[self.current_turn]
+            premove = queue[0]
+            move = chess.Move.from_uci(premove["move"])
+            last_move = self.move_history[-1] if self.move_history else None
+            if (premove["if"] is not None and premove["if"] != last_move) or move not in self.board.legal_moves:
+                self.premoves[self.current_turn] = []
+                break
+            queue.pop(0)
+            self._push(move, premove["move"])
+            applied.append(premove["move"])
+        return applied
+    
+    def legal_move_map(self):
+        """Legal moves for the side to move as {from_square: to-square bitmask}.
+        
+        Bit n of each mask is python-chess square n (a1=0 ... h8=63), sent as a
+        16-digit hex string so it survives JSON number precision. Computed once
+        per ply and cached.
+        """
+        key = (len(self.board.move_stack), self.game_result)
+        if key != self._legal_map_key:
+            masks = {}
+            if self.game_result == '*':
+                for move in self.board.legal_moves:
+                    from_square = chess.square_name(move.from_square)
+                    masks[from_square] = masks.get(from_square, 0) | chess.BB_SQUARES[move.to_square]
+            self._legal_map = {square: format(mask, '016x') for square, mask in masks.items()}
+            self._legal_map_key = key
+        return self._legal_map
+    
+    def position_at(self, ply):
+        """Board after `ply` half-moves, replayed from the nearest checkpoint"""
+        if ply < 0 or ply > len(self.move_history):
+            raise ValueError(f"ply must be between 0 and {len(self.move_history)}")
+        index = ply // CHECKPOINT_INTERVAL
+        board = chess.Board(self.checkpoints[index])
+        for move_uci in self.move_history[index * CHECKPOINT_INTERVAL:ply]:
+            board.push_uci(move_uci)
+        return board
+    
+    def get_position(self, ply):
+        """Position payload for seeking to `ply` in the game"""
+        board = self.position_at(ply)
+        position = {
+            "ply": ply,
+            "total_plies": len(self.move_history),
+            "board": board.fen(),
+            "move": None
+        }
+        if ply > 0:
+            last_move = chess.Move.from_uci(self.move_history[ply - 1])
+            position["move"] = last_move.uci()
+            position["from_square"] = chess.square_name(last_move.from_square)
+            position["to_square"] = chess.square_name(last_move.to_square)
+        return position
+    
     def resign(self, player_id):
+        if self.game_result != '*':
+            return {"success": False, "error": "Game is over"}
         if player_id not in self.players:
             return {"success": False, "error": "Player not in game"}
         
         # Set game result based on who resigned
         resigning_color = self.players[player_id]
         if resigning_color == 'white':
-            self.game_result = '0-1'  # Black wins
+            self._finish('0-1')  # Black wins
         else:
-            self.game_result = '1-0'  # White wins
-        
-        self.end_time = datetime.now()
+            self._finish('1-0')  # White wins
         
         return {
             "success": True,
@@ -156,16 +1307,99 @@ class ChessGame:
             "resigned_by": resigning_color
         }
     
-    def get_computer_move(self):
+    def get_computer_move(self, limit=None):
         if self.engine and not self.board.is_game_over():
+            # Low-material positions are played perfectly from the tables, without a search
+            tablebase_move = endgame_tablebase.best_move(self.board)
+            if tablebase_move:
+                self._cancel_pondering()
+                self._expected_reply = None
+                return tablebase_move
+            if limit is None:
+                limit = chess.engine.Limit(time=ENGINE_MOVE_TIME if self.uses_stockfish else LITE_ENGINE_MOVE_TIME)
             try:
-                result = self.engine.play(self.board, chess.engine.Limit(time=1.0))
+                ponder_move, limit = self._collect_ponder(limit)
+                if ponder_move:
+                    return ponder_move
+                # Search on a copy - this runs without holding games_lock
+                result = self.engine.play(self.board.copy(), limit, game=self.game_id)
+                self._expected_reply = result.ponder
                 return result.move.uci()
             except Exception as e:
                 print(f"Engine error: {e}")
                 return None
         return None
     
+    def start_pondering(self, board):
+        """Think about the position after the expected reply during the player's turn.
+        
+        `board` is a copy of the position after the computer's move, taken
+        under games_lock.
+        """
+        expected = self._expected_reply
+        self._expected_reply = None
+        if not self.ponder or not self.engine or expected is None or board.is_game_over():
+            return
+        if expected not in board.legal_moves or endgame_tablebase.covers(board):
+            return
+        
+        with self._ponder_lock:
+            # The player already moved - the reply search owns the engine now
+            if self._ponder is not None or len(self.move_history) != len(board.move_stack):
+                return
+            token = ponder_budget.acquire()
+            if token is None:
+                return
+            board.push(expected)
+            try:
+                analysis = self.engine.analysis(board, chess.engine.Limit(time=ponder_budget.max_time),
+                                                game=self.game_id)
+            except Exception as e:
+                print(f"Engine error while pondering: {e}")
+                ponder_budget.release(token, False)
+                return
+            self._ponder = (expected.uci(), analysis, token, time.monotonic())
+    
+    def _stop_pondering(self):
+        """Cancel any ponder search.
+        
+        Returns (expected reply, engine BestMove, seconds pondered, budget
+        token), or None if the engine wasn't pondering.
+        """
+        with self._ponder_lock:
+            ponder, self._ponder = self._ponder, None
+        if ponder is None:
+            return None
+        expected, analysis, token, started = ponder
+        try:
+            analysis.stop()
+            best = analysis.wait()
+        except Exception:
+            best = None
+        return expected, best, time.monotonic() - started, token
+    
+    def _collect_ponder(self, limit):
+        """Use the ponder search if the player made the expected reply.
+        
+        Returns (move, limit): the pondered move if it already searched at
+        least as long as `limit` asks, otherwise None and a limit shortened
+        by the time already spent. On a miss the ponder is cancelled and
+        `limit` is returned unchanged.
+        """
+        stopped = self._stop_pondering()
+        if stopped is None:
+            return None, limit
+        expected, best, pondered, token = stopped
+        hit = bool(self.move_history) and self.move_history[-1] == expected
+        ponder_budget.release(token, hit)
+        if not hit:
+            return None, limit
+        if best and best.move and (limit.time is None or pondered >= limit.time):
+            self._expected_reply = best.ponder
+            return best.move.uci(), limit
+        remaining = max(ENGINE_SHALLOW_MOVE_TIME, (limit.time or ENGINE_MOVE_TIME) - pondered)
+        return None, chess.engine.Limit(time=remaining)
+    
     def get_board_state(self):
         return {
             "board": self.board.fen(),
@@ -175,30 +1409,43 @@ class ChessGame:
             "is_stalemate": self.board.is_stalemate(),
             "move_history": self.move_history,
             "players": self.players,
-            "game_result": self.game_result
+            "game_result": self.game_result,
+            "adjudication": self.adjudication,
+            "legal_moves": self.legal_move_map()
         }
     
-    def generate_pgn(self):
-        """Generate PGN format for the game"""
-        game = chess.pgn.Game()
-        
-        # Set headers
-        game.headers["Event"] = "3D Chess Game"
-        game.headers["Site"] = "3D Chess Web Application"
-        game.headers["Date"] = self.start_time.strftime("%Y.%m.%d")
-        game.headers["Round"] = "1"
-        game.headers["White"] = "Player" if self.game_type == 'multiplayer' else "Player"
-        game.headers["Black"] = "Computer" if self.game_type == 'vs_computer' else "Player"
-        game.headers["Result"] = self.game_result
-        game.headers["GameId"] = self.game_id
-        game.headers["TimeControl"] = "-"
+    def pgn_headers(self):
+        """PGN tag pairs describing the game"""
+        headers = {
+            "Event": "3D Chess Game",
+            "Site": "3D Chess Web Application",
+            "Date": self.start_time.strftime("%Y.%m.%d"),
+            "Round": "1",
+            "White": "Player" if self.game_type == 'multiplayer' else "Player",
+            "Black": "Computer" if self.game_type == 'vs_computer' else "Player",
+            "Result": self.game_result,
+            "GameId": self.game_id,
+            "TimeControl": "-",
+        }
         
         if self.game_type == 'vs_computer':
-            game.headers["BlackElo"] = str(self.elo_rating)
-            game.headers["ComputerLevel"] = f"ELO {self.elo_rating}"
+            headers["BlackElo"] = str(self.elo_rating)
+            headers["ComputerLevel"] = f"ELO {self.elo_rating}"
+        
+        if self.adjudication:
+            headers["Termination"] = "adjudication"
         
         if self.end_time:
-            game.headers["EndTime"] = self.end_time.strftime("%H:%M:%S")
+            headers["EndTime"] = self.end_time.strftime("%H:%M:%S")
+        return headers
+    
+    def generate_pgn(self, headers=None):
+        """Generate PGN format for the game; `headers` adds to or overrides the defaults"""
+        import chess.pgn  # Only needed for exports, kept off the startup path
+        
+        game = chess.pgn.Game()
+        game.headers.update(self.pgn_headers())
+        game.headers.update(headers or {})
         
         # Add moves
         node = game
@@ -215,10 +1462,20 @@ class ChessGame:
         
         return str(game)
     
+    def _cancel_pondering(self):
+        stopped = self._stop_pondering()
+        if stopped is not None:
+            ponder_budget.release(stopped[3], False)
+    
     def cleanup(self):
+        self._cancel_pondering()
         if self.engine:
+            engine, self.engine = self.engine, None
             try:
-                self.engine.quit()
+                if isinstance(engine, LiteEngine):
+                    engine.quit()
+                else:
+                    engine_pool.release(engine)
             except:
                 pass
 
@@ -245,8 +1502,13 @@ def index():
                 <li>POST /api/game/{game_id}/join - Join a game</li>
                 <li>POST /api/game/{game_id}/move - Make a move</li>
                 <li>GET /api/game/{game_id}/state - Get game state</li>
+                <li>GET /api/game/{game_id}/legal-moves - Legal moves for the side to move</li>
+                <li>GET /api/game/{game_id}/position?ply=N - Position after N plies</li>
+                <li>POST /api/game/{game_id}/premove - Queue premoves</li>
                 <li>GET /api/game/{game_id}/pgn - Export PGN</li>
                 <li>POST /api/game/{game_id}/resign - Resign game</li>
+                <li>GET /api/engine/stats - Engine queue statistics</li>
+                <li>GET /healthz, GET /readyz - Liveness and readiness probes</li>
             </ul>
         </body>
         </html>
@@ -295,32 +1557,41 @@ def serve_chess_game_js():
         return "// 3d-chess-game.js not found", 404
 
 @app.route('/api/game/create', methods=['POST'])
+@instrumented('create_game')
 def create_game():
     data = request.get_json() or {}
     game_type = data.get('type', 'multiplayer')  # 'multiplayer' or 'vs_computer'
     elo_rating = data.get('elo_rating', 1500)  # Default to 1500 ELO
+    ponder = bool(data.get('ponder', ENGINE_PONDER))  # Let the computer think on the player's time
     
     # Validate ELO rating
     if not isinstance(elo_rating, int) or elo_rating < 800 or elo_rating > 3000:
         return jsonify({"success": False, "error": "ELO rating must be between 800 and 3000"}), 400
     
     game_id = str(uuid.uuid4())
+    game = ChessGame(game_id, game_type, elo_rating, ponder)
     
     with games_lock:
-        games[game_id] = ChessGame(game_id, game_type, elo_rating)
+        games[game_id] = game
     
     return jsonify({
         "success": True,
         "game_id": game_id,
         "type": game_type,
-        "elo_rating": elo_rating if game_type == 'vs_computer' else None
+        "elo_rating": elo_rating if game_type == 'vs_computer' else None,
+        "engine": ("stockfish" if game.uses_stockfish else "builtin") if game.engine else None,
+        "ponder": game.ponder
     })
 
 @app.route('/api/game/<game_id>/join', methods=['POST'])
+@instrumented('join_game')
 def join_game(game_id):
     data = request.get_json() or {}
     player_id = data.get('player_id', str(uuid.uuid4()))
     color = data.get('color')  # Optional color preference
+    error = player_id_error(player_id)
+    if error:
+        return jsonify({"success": False, "error": error}), 400
     
     with games_lock:
         if game_id not in games:
@@ -339,34 +1610,583 @@ def join_game(game_id):
         else:
             return jsonify({"success": False, "error": "Cannot join game"}), 400
 
+game_archive = None
+_archive_queue = deque()  # finished games waiting to be handed to the archive
+_archive_wakeup = Event()
+_archive_drain_lock = Lock()  # the flusher thread and the analysis job both drain the queue
+
+def archive_finished_game(game):
+    """Queue a finished game for the archive; runs under games_lock, so the flusher does the appending"""
+    if game.move_history:
+        _archive_queue.append((game.pgn_headers(), list(game.move_history), game.game_result))
+        if len(_archive_queue) >= ARCHIVE_BATCH_SIZE:
+            _archive_wakeup.set()
+
+def flush_archive():
+    """Hand queued games to the archive, in the order they finished, and write them"""
+    with _archive_drain_lock:
+        while _archive_queue:
+            game_archive.append(*_archive_queue.popleft())
+    return game_archive.flush()
+
+def _flush_archive():
+    while True:
+        _archive_wakeup.wait(ARCHIVE_FLUSH_INTERVAL)
+        _archive_wakeup.clear()
+        try:
+            flush_archive()
+            if game_archive.run_count > ARCHIVE_MAX_RUNS:
+                game_archive.compact()
+        except Exception as e:
+            print(f"Archive flush failed: {e}")
+
+def start_archive(path=ARCHIVE_DIR):
+    """Open the archive and start archiving finished games"""
+    global game_archive
+    if not path or game_archive is not None:
+        return
+    game_archive = Archive(path)
+    game_finished_hooks.append(archive_finished_game)
+    Thread(target=_flush_archive, name='archive-flush', daemon=True).start()
+    atexit.register(flush_archive)
+    print(f"Archiving finished games to {path} ({game_archive.game_count} archived)")
+
+# Aggregates over finished games for /api/stats (game_stats.py), snapshotted to
+# STATS_FILE so they survive restarts; an empty STATS_FILE keeps them in memory only
+STATS_FILE = os.environ.get('STATS_FILE', os.path.join(GAMES_DIR, 'stats.json'))
+STATS_SNAPSHOT_INTERVAL = float(os.environ.get('STATS_SNAPSHOT_INTERVAL', '30'))  # seconds between snapshots
+STATS_ELO_BAND = int(os.environ.get('STATS_ELO_BAND', '200'))  # width of the computer ELO bands
+STATS_OPENING_PLIES = int(os.environ.get('STATS_OPENING_PLIES', '4'))  # plies that make an opening
+game_stats = GameStats(STATS_ELO_BAND, STATS_OPENING_PLIES)
+
+def termination(game):
+    """How a finished game ended"""
+    if game.adjudication:
+        return 'adjudication'
+    if game.board.is_checkmate():
+        return 'checkmate'
+    if game.board.is_stalemate():
+        return 'stalemate'
+    if game.board.is_insufficient_material():
+        return 'insufficient_material'
+    return 'resignation'
+
+def record_game_stats(game):
+    game_stats.record(game.game_type, game.elo_rating if game.game_type == 'vs_computer' else None,
+                      game.game_result, game.move_history, termination(game))
+
+game_finished_hooks.append(record_game_stats)
+
+def _save_stats(path):
+    if game_stats.dirty:
+        game_stats.save(path)
+
+def _snapshot_stats(path):
+    while True:
+        time.sleep(STATS_SNAPSHOT_INTERVAL)
+        try:
+            _save_stats(path)
+        except Exception as e:
+            print(f"Stats snapshot failed: {e}")
+
+def start_stats(path=STATS_FILE):
+    """Reload the last stats snapshot and keep snapshotting"""
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if game_stats.load(path):
+        print(f"Loaded game stats from {path}")
+    Thread(target=_snapshot_stats, args=(path,), name='stats-snapshot', daemon=True).start()
+    atexit.register(_save_stats, path)
+
+# Arena tournaments (arena.py): players are paired again as soon as their game
+# ends. Arenas are only touched under games_lock; pairings are pushed to each
+# player's arena room by a notifier thread, outside the lock
+ARENA_MAX_MINUTES = int(os.environ.get('ARENA_MAX_MINUTES', '240'))
+ARENA_PAIRING_SCAN = int(os.environ.get('ARENA_PAIRING_SCAN', '4'))  # waiting players compared either side of the closest rating
+ARENA_KEEP_FINISHED = int(os.environ.get('ARENA_KEEP_FINISHED', '600'))  # seconds final standings stay readable
+ARENA_GAME_KEEP = int(os.environ.get('ARENA_GAME_KEEP', '60'))  # seconds a finished arena game stays in games, with its replay ring
+arenas = {}
+arena_games = {}  # game id -> Arena, for arena games in progress
+_finished_arena_games = deque()  # (evict at, game id) for finished arena games, oldest first
+_arena_notices = deque()
+_arena_wakeup = Event()
+_arena_notifier = None
+
+def arena_room(arena_id, player_id=None):
+    return f"arena:{arena_id}" if player_id is None else f"arena:{arena_id}:{player_id}"
+
+def open_arena_games(arena, pairings):
+    """Create the games for new pairings in one go and queue their notices; caller holds games_lock"""
+    if not pairings:
+        return []
+    for pairing in pairings:
+        game = ChessGame(pairing.game_id, 'multiplayer')
+        game.add_player(pairing.white, 'white')
+        game.add_player(pairing.black, 'black')
+        games[pairing.game_id] = game
+        arena_games[pairing.game_id] = arena
+    _arena_notices.append((arena, pairings))
+    _arena_wakeup.set()
+    return pairings
+
+def pairing_notice(arena, pairing, color):
+    player_id, opponent_id = (pairing.white, pairing.black) if color == 'white' else (pairing.black, pairing.white)
+    return {
+        "arena_id": arena.arena_id,
+        "game_id": pairing.game_id,
+        "player_id": player_id,
+        "color": color,
+        "opponent": opponent_id,
+        "opponent_rating": arena.players[opponent_id].rating,
+    }
+
+def evict_arena(arena):
+    """Forget an arena once it has ended, its last game is over and ARENA_KEEP_FINISHED has passed; caller holds games_lock"""
+    if arena.finished and not arena.games and time.time() >= arena.ends_at + ARENA_KEEP_FINISHED:
+        arenas.pop(arena.arena_id, None)
+
+def evict_arena_games():
+    """Drop finished arena games once ARENA_GAME_KEEP has passed, so a long arena doesn't pile them up; caller holds games_lock"""
+    now = time.time()
+    while _finished_arena_games and _finished_arena_games[0][0] <= now:
+        _, game_id = _finished_arena_games.popleft()
+        game = games.pop(game_id, None)
+        event_replay.drop(game_id)
+        if game is not None:
+            game.cleanup()
+
+def arena_game_finished(game):
+    arena = arena_games.pop(game.game_id, None)
+    if arena is not None:
+        open_arena_games(arena, arena.game_finished(game.game_id, game.game_result))
+        evict_arena(arena)
+        # Sweep before queueing this game: its final game_update is recorded after the hooks run
+        evict_arena_games()
+        _finished_arena_games.append((time.time() + ARENA_GAME_KEEP, game.game_id))
+
+game_finished_hooks.append(arena_game_finished)
+
+def _notify_arena_players():
+    while True:
+        _arena_wakeup.wait()
+        _arena_wakeup.clear()
+        while _arena_notices:
+            arena, pairings = _arena_notices.popleft()
+            for pairing in pairings:
+                for player_id, color in ((pairing.white, 'white'), (pairing.black, 'black')):
+                    socketio.emit('arena_pairing', pairing_notice(arena, pairing, color),
+                                  room=arena_room(arena.arena_id, player_id))
+
+def start_arena(arena_id):
+    with games_lock:
+        arena = arenas[arena_id]
+        pairings = open_arena_games(arena, arena.start())
+    print(f"Arena {arena_id} started: {len(pairings)} games, {arena.waiting} waiting")
+
+def end_arena(arena_id):
+    """No new pairings; games still being played count when they finish"""
+    with games_lock:
+        arena = arenas[arena_id]
+        arena.close()
+        final = {**arena.status(), "standings": arena.standings()}
+    socketio.emit('arena_finished', final, room=arena_room(arena_id))
+    timer = Timer(max(0, arena.ends_at + ARENA_KEEP_FINISHED - time.time()), expire_arena, args=(arena,))
+    timer.daemon = True
+    timer.start()
+
+def expire_arena(arena):
+    """Drop a finished arena, unless games are still being played; the last one to finish drops it then"""
+    with games_lock:
+        evict_arena(arena)
+        evict_arena_games()
+
+def schedule_arena(arena):
+    global _arena_notifier
+    if _arena_notifier is None:
+        _arena_notifier = Thread(target=_notify_arena_players, name='arena-notify', daemon=True)
+        _arena_notifier.start()
+    for delay, action in ((arena.starts_at - time.time(), start_arena), (arena.ends_at - time.time(), end_arena)):
+        timer = Timer(max(0, delay), action, args=(arena.arena_id,))
+        timer.daemon = True
+        timer.start()
+
+# Sockets that join_game with {"encoding": "binary"} get move_made and game_update
+# packed by wire.py. They sit in a suffixed room, so each event is encoded once
+# per variant however many clients watch
+WIRE_ROOMS = {True: ':bin', False: ':bin-nofen'}  # include FEN -> room suffix
+
+def game_rooms(game_id):
+    return [game_id] + [game_id + suffix for suffix in WIRE_ROOMS.values()]
+
+def _room_occupied(room):
+    return bool(socketio.server.manager.rooms.get('/', {}).get(room))
+
+# Recent events kept per game room, so a reconnecting socket gets only what it missed
+ROOM_REPLAY_SIZE = int(os.environ.get('ROOM_REPLAY_SIZE', '64'))
+
+class ReplayEvent:
+    """One numbered room event, with its binary encodings cached for replays"""
+    def __init__(self, seq, event, payload):
+        self.seq = seq
+        self.event = event
+        self.payload = payload
+        self._encoded = {}
+    
+    def data(self, encoding='json', include_fen=True):
+        if encoding == 'json':
+            return self.payload
+        if include_fen not in self._encoded:
+            self._encoded[include_fen] = wire.encode_event(self.event, self.payload, include_fen)
+        return self._encoded[include_fen]
+
+class EventReplay:
+    """Bounded ring buffer of recent move_made / game_update events per game.
+    
+    Every event gets the next sequence number of its game. A socket that
+    re-joins with the last number it saw is sent just the events after it,
+    unless they have already rolled out of the buffer.
+    """
+    def __init__(self, size=ROOM_REPLAY_SIZE):
+        self.size = size
+        self._rooms = {}  # game_id -> (deque of ReplayEvent, last seq)
+        self._lock = Lock()
+    
+    def record(self, game_id, event, payload):
+        """Number and buffer an event; the payload is snapshotted, since its history and players are the game's own"""
+        payload = dict(payload)
+        for key, copy in (("move_history", list), ("players", dict)):
+            if key in payload:
+                payload[key] = copy(payload[key])
+        with self._lock:
+            events, seq = self._rooms.get(game_id) or (deque(maxlen=self.size), 0)
+            payload["seq"] = seq + 1
+            entry = ReplayEvent(seq + 1, event, payload)
+            events.append(entry)
+            self._rooms[game_id] = (events, entry.seq)
+            return entry
+    
+    def last_seq(self, game_id):
+        with self._lock:
+            return self._rooms.get(game_id, (None, 0))[1]
+    
+    def since(self, game_id, last_seq):
+        """Events after `last_seq`, or None if some of them are no longer buffered"""
+        with self._lock:
+            events, seq = self._rooms.get(game_id, ((), 0))
+            if last_seq > seq:
+                return None  # from before a restart, or another game
+            missed = [entry for entry in events if entry.seq > last_seq]
+            if len(missed) < seq - last_seq:
+                return None
+            return missed
+    
+    def drop(self, game_id):
+        with self._lock:
+            self._rooms.pop(game_id, None)
+
+event_replay = EventReplay()
+
+# Multiplexed subscriptions (subscriptions.py): one socket follows many games, or
+# every game matching a filter, and gets their events batched into one
+# game_batch frame per tick
+SUBSCRIPTION_TICK = float(os.environ.get('SUBSCRIPTION_TICK', '0.25'))  # seconds between game_batch frames
+SUBSCRIPTION_MAX_GAMES = int(os.environ.get('SUBSCRIPTION_MAX_GAMES', '1000'))  # game ids per socket
+subscriptions = SubscriptionHub(SUBSCRIPTION_MAX_GAMES)
+_subscription_flusher = None
+
+def game_tags(game):
+    """What subscription filters match on: type and rating (the computer's, or an arena pairing's average)"""
+    if game.game_type == 'vs_computer':
+        elo = game.elo_rating
+    elif game.game_id in arena_games:
+        players = arena_games[game.game_id].players
+        elo = sum(players[player_id].rating for player_id in game.players) // max(len(game.players), 1)
+    else:
+        elo = None
+    return {"type": game.game_type, "elo": elo}
+
+def _flush_subscriptions():
+    while True:
+        time.sleep(SUBSCRIPTION_TICK)
+        for sid, frame in subscriptions.flush():
+            socketio.emit('game_batch', frame, to=sid)
+
+def start_subscription_flusher():
+    global _subscription_flusher
+    if _subscription_flusher is None:
+        _subscription_flusher = Thread(target=_flush_subscriptions, name='subscription-flush', daemon=True)
+        _subscription_flusher.start()
+
+def emit_game_event(event, payload, game_id):
+    """Number a move_made or game_update and emit it to everyone following the game, in their encoding"""
+    entry = event_replay.record(game_id, event, payload)
+    socketio.emit(event, entry.payload, room=game_id)
+    for include_fen, suffix in WIRE_ROOMS.items():
+        if _room_occupied(game_id + suffix):
+            socketio.emit(event, entry.data('binary', include_fen), room=game_id + suffix)
+    if subscriptions.active:
+        game = games.get(game_id)
+        subscriptions.publish(game_id, event, entry.payload, game_tags(game) if game else None)
+
+def play_computer_reply(game, limit=None):
+    """Search for the computer's reply outside games_lock and apply it"""
+    with locked_games():
+        if game.game_type != 'vs_computer' or game.current_turn != 'black' or game.game_result != '*':
+            return None
+        ply = len(game.move_history)
+    
+    with timed_stage('engine'):
+        tracer.set_attributes(limit=str(limit), elo_rating=game.elo_rating)
+        computer_move = game.get_computer_move(limit)
+    if not computer_move:
+        return None
+    
+    with locked_games():
+        # The game may have been resigned or deleted while the engine was thinking
+        if games.get(game.game_id) is not game or len(game.move_history) != ply or game.game_result != '*':
+            return None
+        with timed_stage('validate'):
+            computer_result = game.play_computer_move(computer_move)
+        if not computer_result["success"]:
+            return computer_result
+        with timed_stage('emit'):
+            emit_game_event('move_made', computer_result, game.game_id)
+        ponder_board = game.board.copy() if game.ponder else None
+    
+    if ponder_board is not None:
+        game.start_pondering(ponder_board)
+    return computer_result
+
+def admit_waiting(client_id, game_id):
+    """Admit an interactive search, retrying after each EngineBusy instead of giving up"""
+    while True:
+        try:
+            with timed_stage('admission'):
+                return engine_admission.admit(client_id, game_id)
+        except EngineBusy as e:
+            time.sleep(e.retry_after)
+
+def process_move(game_id, move, player_id, client_id):
+    """Apply a player's move and, in vs_computer games, the computer's reply.
+    
+    Returns (result, status_code). The move is checked first, then
+    engine-bound moves go through admission control, so a shed request is
+    rejected before the board changes and a rejected move costs no token.
+    Each engine search holds its own ticket: further replies set off by the
+    player's premoves are admitted one by one, waiting rather than shedding,
+    since the player's move is already on the board.
+    """
+    tracer.set_attributes(game_id=game_id, move=move)
+    with locked_games():
+        game = games.get(game_id)
+        if game is None:
+            return {"success": False, "error": "Game not found"}, 404
+        # Illegal, out-of-turn and finished-game moves are turned away before they cost an engine token
+        with timed_stage('validate'):
+            error = game.move_error(move, player_id)
+        if error:
+            return {"success": False, "error": error}, 200
+        wants_reply = game.engine is not None
+    
+    # Only Stockfish searches are admission-controlled; the built-in engine is cheap
+    ticket = None
+    if wants_reply and game.uses_stockfish:
+        try:
+            with timed_stage('admission'):
+                ticket = engine_admission.admit(client_id, game_id)
+        except EngineBusy as e:
+            return {
+                "success": False,
+                "error": "Computer opponent is busy, please retry",
+                "reason": e.reason,
+                "retry_after": e.retry_after
+            }, 429
+    
+    try:
+        with locked_games():
+            if games.get(game_id) is not game:
+                return {"success": False, "error": "Game not found"}, 404
+            with timed_stage('validate'):
+                result = game.make_move(move, player_id)
+            if result["success"]:
+                # Emit move to all players in the game
+                with timed_stage('emit'):
+                    emit_game_event('move_made', result, game_id)
+        
+        # If it's a computer game and now it's the computer's turn
+        # A reply can trigger the player's premoves, handing the turn straight back
+        if result["success"] and wants_reply:
+            with tracer.span('computer_reply', degraded=bool(ticket and ticket.degraded)):
+                reply = play_computer_reply(game, ticket.limit if ticket else None)
+                while reply and reply["success"] and reply["premoves_applied"] and game.game_result == '*':
+                    if ticket:
+                        ticket.release()
+                        ticket = None
+                        ticket = admit_waiting(client_id, game_id)
+                    reply = play_computer_reply(game, ticket.limit if ticket else None)
+    finally:
+        if ticket:
+            ticket.release()
+    
+    return result, 200
+
+# Longest analysis a single request may ask for, in seconds of engine time
+ANALYSIS_MAX_TIME = float(os.environ.get('ANALYSIS_MAX_TIME', '30.0'))
+
+def analyse_position(board, seconds, client_id, game_id, work_class='analysis', engine=None):
+    """Analyse `board` for `seconds` of engine time and return the engine's InfoDict.
+    
+    The search runs in ENGINE_SLICE_TIME slices, each admitted separately on
+    one engine with the same game id, so the hash carries over between
+    slices. A slice preempted for a higher-priority request stops early and
+    the remaining time is queued again. Without `engine`, a pooled engine is
+    used for this position only.
+    """
+    if engine is None:
+        with pooled_engine() as engine:
+            return analyse_position(board, seconds, client_id, game_id, work_class, engine)
+    info = {}
+    remaining = seconds
+    while remaining > 0:
+        ticket = engine_admission.admit(client_id, game_id, work_class)
+        started = time.monotonic()
+        try:
+            limit = chess.engine.Limit(time=min(ticket.limit.time, remaining))
+            with engine.analysis(board, limit, game=game_id) as analysis:
+                ticket.on_preempt(analysis.stop)
+                for _ in analysis:
+                    pass
+                if analysis.info.get("pv"):
+                    info = dict(analysis.info)
+        finally:
+            ticket.release()
+        remaining -= time.monotonic() - started
+    return info
+
+@contextmanager
+def pooled_engine():
+    """An engine from the pool for the duration of the block"""
+    engine = engine_pool.acquire()
+    try:
+        yield engine
+    finally:
+        engine_pool.release(engine)
+
+# Offline accuracy analysis of finished games (game_analysis.py), run in-process
+# as a background job on batch-class engine time. game_analysis pulls in chess.pgn
+# and multiprocessing, so it is imported by the functions that use it
+GAME_ANALYSIS_DIR = os.environ.get('GAME_ANALYSIS_DIR', os.path.join(GAMES_DIR, 'analysis'))
+GAME_ANALYSIS_MOVE_TIME = float(os.environ.get('GAME_ANALYSIS_MOVE_TIME', '0.1'))  # engine seconds per position
+game_analysis_job = None
+
+def games_to_score():
+    """Every archived game, or the PGN exports when archiving is off; run on the analysis job's thread"""
+    import game_analysis
+    if game_archive is not None:
+        flush_archive()
+        return game_analysis.archive_games(game_archive)
+    return game_analysis.load_pgn_games([os.path.join(GAMES_DIR, '*.pgn')])
+
+def batch_evaluator(seconds):
+    """A game_analysis `evaluate` that searches as batch work on one pooled engine, held for the whole job"""
+    import game_analysis
+    def evaluate(tasks):
+        with pooled_engine() as engine:
+            for key, fen in tasks:
+                while True:
+                    try:
+                        info = analyse_position(chess.Board(fen), seconds, 'game-analysis', 'game-analysis',
+                                                work_class='batch', engine=engine)
+                        break
+                    except EngineBusy as e:
+                        time.sleep(e.retry_after)  # players come first; try again later
+                yield (key, *game_analysis.eval_from_info(info))
+    return evaluate
+
 @app.route('/api/game/<game_id>/move', methods=['POST'])
+@instrumented('make_move')
 def make_move(game_id):
     data = request.get_json()
     move = data.get('move')
     player_id = data.get('player_id')
     
+    # Rate limits are per connection: player_id is whatever the client sends
+    result, status = process_move(game_id, move, player_id, request.remote_addr)
+    response = jsonify(result)
+    if request.headers.get('X-Trace-Id'):
+        response.headers['X-Trace-Id'] = request.headers['X-Trace-Id']
+    if status == 429:
+        response.headers['Retry-After'] = str(result["retry_after"])
+    return response, status
+
+@app.route('/api/game/<game_id>/analysis', methods=['POST'])
+@instrumented('analyse')
+def analyse_game(game_id):
+    data = request.get_json() or {}
+    seconds = data.get('seconds', 2.0)
+    if not isinstance(seconds, (int, float)) or not 0 < seconds <= ANALYSIS_MAX_TIME:
+        return jsonify({"success": False, "error": f"seconds must be between 0 and {ANALYSIS_MAX_TIME}"}), 400
+    
+    with locked_games():
+        game = games.get(game_id)
+        if game is None:
+            return jsonify({"success": False, "error": "Game not found"}), 404
+        board = game.board.copy()
+    if board.is_game_over():
+        return jsonify({"success": False, "error": "Game is over"}), 400
+    
+    try:
+        info = analyse_position(board, seconds, request.remote_addr, game_id)
+    except EngineBusy as e:
+        response = jsonify({"success": False, "error": "Engine is busy, please retry",
+                            "reason": e.reason, "retry_after": e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    except (chess.engine.EngineError, OSError) as e:
+        return jsonify({"success": False, "error": f"Engine unavailable: {e}"}), 503
+    
+    score = info.get("score")
+    pv = [move.uci() for move in info.get("pv", [])]
+    return jsonify({
+        "success": True,
+        "ply": len(board.move_stack),
+        "best_move": pv[0] if pv else None,
+        "pv": pv,
+        "score_cp": score.white().score() if score else None,  # from White's point of view
+        "mate": score.white().mate() if score else None,
+        "depth": info.get("depth"),
+        "nodes": info.get("nodes")
+    })
+
+@app.route('/api/game/<game_id>/premove', methods=['POST'])
+@instrumented('queue_premoves')
+def queue_premoves(game_id):
+    data = request.get_json() or {}
+    
     with games_lock:
         if game_id not in games:
             return jsonify({"success": False, "error": "Game not found"}), 404
         
         game = games[game_id]
-        result = game.make_move(move, player_id)
-        
-        if result["success"]:
-            # Emit move to all players in the game
-            socketio.emit('move_made', result, room=game_id)
-            
-            # If it's a computer game and now it's the computer's turn
-            if game.game_type == 'vs_computer' and game.current_turn == 'black' and game.game_result == '*':
-                computer_move = game.get_computer_move()
-                if computer_move:
-                    computer_result = game.make_move(computer_move)
-                    if computer_result["success"]:
-                        socketio.emit('move_made', computer_result, room=game_id)
+        result = game.queue_premoves(data.get('player_id'), data.get('moves', []), data.get('replace', True))
+        return jsonify(result), 200 if result["success"] else 400
+
+@app.route('/api/game/<game_id>/premove', methods=['DELETE'])
+@instrumented('clear_premoves')
+def clear_premoves(game_id):
+    data = request.get_json(silent=True) or {}
+    player_id = data.get('player_id') or request.args.get('player_id')
+    
+    with games_lock:
+        if game_id not in games:
+            return jsonify({"success": False, "error": "Game not found"}), 404
         
-        return jsonify(result)
+        result = games[game_id].queue_premoves(player_id, [])
+        return jsonify(result), 200 if result["success"] else 400
 
 @app.route('/api/game/<game_id>/state', methods=['GET'])
+@instrumented('get_game_state')
 def get_game_state(game_id):
     with games_lock:
         if game_id not in games:
@@ -378,7 +2198,38 @@ def get_game_state(game_id):
             "game_state": game.get_board_state()
         })
 
+@app.route('/api/game/<game_id>/position', methods=['GET'])
+@instrumented('get_position')
+def get_position(game_id):
+    ply = request.args.get('ply', type=int)
+    
+    with games_lock:
+        if game_id not in games:
+            return jsonify({"success": False, "error": "Game not found"}), 404
+        
+        game = games[game_id]
+        try:
+            position = game.get_position(len(game.move_history) if ply is None else ply)
+        except ValueError as e:
+            return jsonify({"success": False, "error": str(e)}), 400
+        return jsonify({"success": True, **position})
+
+@app.route('/api/game/<game_id>/legal-moves', methods=['GET'])
+@instrumented('get_legal_moves')
+def get_legal_moves(game_id):
+    with games_lock:
+        if game_id not in games:
+            return jsonify({"success": False, "error": "Game not found"}), 404
+        
+        game = games[game_id]
+        return jsonify({
+            "success": True,
+            "current_turn": game.current_turn,
+            "legal_moves": game.legal_move_map()
+        })
+
 @app.route('/api/game/<game_id>/pgn', methods=['GET'])
+@instrumented('export_pgn')
 def export_pgn(game_id):
     with games_lock:
         if game_id not in games:
@@ -401,6 +2252,7 @@ def export_pgn(game_id):
             return jsonify({"success": False, "error": f"Failed to create PGN file: {str(e)}"}), 500
 
 @app.route('/api/game/<game_id>/resign', methods=['POST'])
+@instrumented('resign_game')
 def resign_game(game_id):
     data = request.get_json()
     player_id = data.get('player_id')
@@ -415,11 +2267,11 @@ def resign_game(game_id):
         if result["success"]:
             # Emit resignation to all players in the game
             game_state = game.get_board_state()
-            socketio.emit('game_update', {
+            emit_game_event('game_update', {
                 **game_state,
                 "resigned_by": result["resigned_by"],
                 "message": f"{result['resigned_by'].title()} player has resigned"
-            }, room=game_id)
+            }, game_id)
             
             return jsonify({
                 "success": True,
@@ -429,45 +2281,277 @@ def resign_game(game_id):
         else:
             return jsonify(result), 400
 
+@app.route('/api/archive/positions', methods=['GET'])
+@instrumented('archive_positions')
+def archive_positions():
+    """Archived games that reached ?fen=..., and the moves played from there"""
+    if game_archive is None:
+        return jsonify({"success": False, "error": "Archive is disabled"}), 404
+    try:
+        board = chess.Board(request.args.get('fen', chess.STARTING_FEN))
+    except ValueError as e:
+        return jsonify({"success": False, "error": f"Invalid FEN: {e}"}), 400
+    limit = request.args.get('limit', 50, type=int)
+    
+    numbers = game_archive.games_reaching(board)
+    return jsonify({
+        "success": True,
+        "games": len(numbers),
+        "game_numbers": numbers[-limit:] if limit > 0 else [],  # most recent
+        "moves": game_archive.opening_stats(board)["moves"]
+    })
+
+@app.route('/api/archive/games/<int:number>', methods=['GET'])
+@instrumented('archive_game')
+def archive_game(number):
+    if game_archive is None:
+        return jsonify({"success": False, "error": "Archive is disabled"}), 404
+    try:
+        return jsonify({"success": True, **game_archive.get_game(number)})
+    except KeyError:
+        return jsonify({"success": False, "error": "Archived game not found"}), 404
+
+@app.route('/api/engine/stats', methods=['GET'])
+def engine_stats():
+    """Engine queue depth, active searches, shed counters, ponder, tablebase and driver stats"""
+    return jsonify({
+        "success": True,
+        "engine": engine_admission.snapshot(),
+        "ponder": ponder_budget.snapshot(),
+        "tablebase": endgame_tablebase.status(),
+        "driver": {"mode": ENGINE_DRIVER, "threads": active_count(), **uci_driver.status()}
+    })
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Results, game length, terminations, ELO bands and openings over every finished game"""
+    return jsonify({"success": True, **game_stats.summary()})
+
+@app.route('/api/arena/create', methods=['POST'])
+@instrumented('create_arena')
+def create_arena():
+    data = request.get_json() or {}
+    minutes = data.get('minutes', 60)
+    starts_in = data.get('starts_in', 0)  # seconds players have to join before the first pairings
+    if not isinstance(minutes, (int, float)) or not 0 < minutes <= ARENA_MAX_MINUTES:
+        return jsonify({"success": False, "error": f"minutes must be between 0 and {ARENA_MAX_MINUTES}"}), 400
+    if not isinstance(starts_in, (int, float)) or starts_in < 0:
+        return jsonify({"success": False, "error": "starts_in must be a number of seconds"}), 400
+    
+    arena_id = str(uuid.uuid4())
+    arena = Arena(arena_id, minutes, time.time() + starts_in, ARENA_PAIRING_SCAN)
+    with games_lock:
+        arenas[arena_id] = arena
+    schedule_arena(arena)
+    return jsonify({"success": True, "arena": arena.status()})
+
+def join_arena_pool(arena_id, player_id, rating):
+    """Enter a player into an arena; (pairing notice or None, error)"""
+    error = player_id_error(player_id)
+    if error:
+        return None, error
+    if not isinstance(rating, int) or not 100 <= rating <= 3500:
+        return None, "rating must be between 100 and 3500"
+    with games_lock:
+        arena = arenas.get(arena_id)
+        if arena is None:
+            return None, "Arena not found"
+        if arena.finished:
+            return None, "Arena has finished"
+        pairings = open_arena_games(arena, arena.join(player_id, rating))
+        if not pairings:
+            return None, None
+        color = 'white' if pairings[0].white == player_id else 'black'
+        return pairing_notice(arena, pairings[0], color), None
+
+@app.route('/api/arena/<arena_id>/join', methods=['POST'])
+@instrumented('join_arena')
+def join_arena(arena_id):
+    """Join an arena; `pairing` is set if an opponent was waiting, later pairings arrive as arena_pairing events"""
+    data = request.get_json() or {}
+    player_id = data.get('player_id', str(uuid.uuid4()))
+    pairing, error = join_arena_pool(arena_id, player_id, data.get('rating', 1500))
+    if error:
+        return jsonify({"success": False, "error": error}), 404 if error == "Arena not found" else 400
+    return jsonify({"success": True, "player_id": player_id, "pairing": pairing})
+
+@app.route('/api/arena/<arena_id>/leave', methods=['POST'])
+@instrumented('leave_arena')
+def leave_arena(arena_id):
+    data = request.get_json() or {}
+    with games_lock:
+        arena = arenas.get(arena_id)
+        if arena is None or not arena.leave(data.get('player_id')):
+            return jsonify({"success": False, "error": "Not in this arena"}), 404
+    return jsonify({"success": True})
+
+@app.route('/api/arena/<arena_id>', methods=['GET'])
+@instrumented('arena_standings')
+def arena_standings(arena_id):
+    """Arena state and a page of the standings; `player_id` adds that player's rank"""
+    limit = min(request.args.get('limit', 50, type=int), 500)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    player_id = request.args.get('player_id')
+    with games_lock:
+        arena = arenas.get(arena_id)
+        if arena is None:
+            return jsonify({"success": False, "error": "Arena not found"}), 404
+        response = {"success": True, "arena": arena.status(), "standings": arena.standings(limit, offset)}
+        if player_id in arena.players:
+            response["player"] = dict(arena.players[player_id].to_dict(), rank=arena.rank(player_id))
+    return jsonify(response)
+
 @app.route('/api/game/<game_id>', methods=['DELETE'])
+@instrumented('delete_game')
 def delete_game(game_id):
     with games_lock:
-        if game_id in games:
-            games[game_id].cleanup()
-            del games[game_id]
-            return jsonify({"success": True})
-        else:
-            return jsonify({"success": False, "error": "Game not found"}), 404
+        game = games.pop(game_id, None)
+        arena = arena_games.pop(game_id, None)
+        if arena is not None:
+            open_arena_games(arena, arena.abandon(game_id))
+            evict_arena(arena)
+    
+    if game is None:
+        return jsonify({"success": False, "error": "Game not found"}), 404
+    event_replay.drop(game_id)
+    game.cleanup()
+    return jsonify({"success": True})
+
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness - the process is up and serving requests"""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness - only OK once the engine is validated and warm instances are up"""
+    status = engine_pool.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+@app.route('/api/admin/profile', methods=['GET'])
+@admin_required
+def profile_status():
+    return jsonify({"success": True, "profile": profiler.status()})
+
+@app.route('/api/admin/profile', methods=['POST'])
+@admin_required
+def start_profile():
+    """Profile this process for N seconds, optionally only some routes/socket events"""
+    data = request.get_json() or {}
+    try:
+        profiler.start(
+            data.get('mode', 'deterministic'),
+            float(data.get('seconds', 30)),
+            sample_rate=float(data.get('sample_rate', 1.0)),
+            targets=data.get('targets'),
+            interval=float(data.get('interval', 0.005))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    return jsonify({"success": True, "profile": profiler.status()})
+
+@app.route('/api/admin/profile', methods=['DELETE'])
+@admin_required
+def stop_profile():
+    profiler.stop()
+    return jsonify({"success": True, "profile": profiler.status()})
+
+@app.route('/api/admin/timings', methods=['GET'])
+@admin_required
+def get_timings():
+    return jsonify({"success": True, "enabled": request_timings.enabled, "timings": request_timings.snapshot()})
+
+@app.route('/api/admin/timings', methods=['POST'])
+@admin_required
+def set_timings():
+    """Turn per-request stage timing on or off, optionally clearing the aggregates"""
+    data = request.get_json() or {}
+    request_timings.enabled = bool(data.get('enabled', True))
+    if data.get('reset'):
+        request_timings.reset()
+    return jsonify({"success": True, "enabled": request_timings.enabled})
+
+@app.route('/api/admin/game-analysis', methods=['GET'])
+@admin_required
+def game_analysis_status():
+    return jsonify({"success": True, "job": game_analysis_job.status() if game_analysis_job else None})
+
+@app.route('/api/admin/game-analysis', methods=['POST'])
+@admin_required
+def start_game_analysis():
+    """Score every archived (or exported PGN) game in the background, resuming from the checkpoint"""
+    global game_analysis_job
+    data = request.get_json() or {}
+    seconds = data.get('movetime', GAME_ANALYSIS_MOVE_TIME)
+    if not isinstance(seconds, (int, float)) or not 0 < seconds <= ANALYSIS_MAX_TIME:
+        return jsonify({"success": False, "error": f"movetime must be between 0 and {ANALYSIS_MAX_TIME}"}), 400
+    if game_analysis_job and game_analysis_job.running:
+        return jsonify({"success": False, "error": "Game analysis already running", "job": game_analysis_job.status()}), 409
+    
+    import game_analysis
+    game_analysis_job = game_analysis.AnalysisJob(games_to_score, GAME_ANALYSIS_DIR, batch_evaluator(seconds))
+    return jsonify({"success": True, "job": game_analysis_job.status()}), 202
+
+@app.route('/api/admin/game-analysis', methods=['DELETE'])
+@admin_required
+def cancel_game_analysis():
+    """Stop the running job; its checkpoint is kept for the next run"""
+    if game_analysis_job:
+        game_analysis_job.cancel()
+    return jsonify({"success": True, "job": game_analysis_job.status() if game_analysis_job else None})
 
 # WebSocket events
 @socketio.on('join_game')
+@instrumented('socket:join_game')
 def on_join_game(data):
+    """Subscribe to a game's events; `last_seq` (from a reconnect) replays just the missed ones"""
     game_id = data['game_id']
     player_id = data.get('player_id')
+    encoding = data.get('encoding', 'json')  # or 'binary', see wire.py
+    if encoding not in ('json', 'binary'):
+        emit('error', {"message": f"Unknown encoding: {encoding}"})
+        return
+    include_fen = data.get('fen', True) is not False
+    room = game_id if encoding == 'json' else game_id + WIRE_ROOMS[include_fen]
+    last_seq = data.get('last_seq')
     
-    join_room(game_id)
+    # Re-joining with another encoding moves the socket between rooms
+    for other in game_rooms(game_id):
+        if other != room:
+            leave_room(other)
+    join_room(room)
     
     with games_lock:
         if game_id in games:
             game = games[game_id]
-            emit('game_update', game.get_board_state())
+            # An event emitted since join_room() may arrive twice; clients drop seqs they've seen
+            missed = event_replay.since(game_id, last_seq) if isinstance(last_seq, int) else None
+            if missed is not None:
+                for entry in missed:
+                    emit(entry.event, entry.data(encoding, include_fen))
+                return
+            state = {**game.get_board_state(), "seq": event_replay.last_seq(game_id), "snapshot": True}
+            emit('game_update', state if encoding == 'json' else wire.encode_event('game_update', state, include_fen))
 
 @socketio.on('leave_game')
+@instrumented('socket:leave_game')
 def on_leave_game(data):
     game_id = data['game_id']
     player_id = data.get('player_id')
     
-    leave_room(game_id)
+    for room in game_rooms(game_id):
+        leave_room(room)
     
     with games_lock:
         if game_id in games and player_id:
             games[game_id].remove_player(player_id)
 
-@socketio.on('make_move')
-def on_make_move(data):
+@socketio.on('seek')
+@instrumented('socket:seek')
+def on_seek(data):
+    """Send the requesting client the position at a given ply"""
     game_id = data['game_id']
-    move = data['move']
-    player_id = data.get('player_id')
+    ply = data.get('ply')
     
     with games_lock:
         if game_id not in games:
@@ -475,23 +2559,120 @@ def on_make_move(data):
             return
         
         game = games[game_id]
-        result = game.make_move(move, player_id)
+        try:
+            position = game.get_position(len(game.move_history) if ply is None else int(ply))
+        except (TypeError, ValueError) as e:
+            emit('error', {"message": str(e)})
+            return
+    emit('position', {"game_id": game_id, **position})
+
+@socketio.on('premove')
+@instrumented('socket:premove')
+def on_premove(data):
+    """Queue (or with an empty list, clear) the sender's premoves"""
+    game_id = data['game_id']
+    
+    with games_lock:
+        if game_id not in games:
+            emit('error', {"message": "Game not found"})
+            return
         
-        if result["success"]:
-            emit('move_made', result, room=game_id)
-            
-            # Handle computer move for vs_computer games
-            if game.game_type == 'vs_computer' and game.current_turn == 'black' and game.game_result == '*':
-                computer_move = game.get_computer_move()
-                if computer_move:
-                    computer_result = game.make_move(computer_move)
-                    if computer_result["success"]:
-                        emit('move_made', computer_result, room=game_id)
-        else:
-            emit('error', {"message": result["error"]})
+        result = games[game_id].queue_premoves(data.get('player_id'), data.get('moves', []),
+                                               data.get('replace', True))
+    if result["success"]:
+        emit('premoves', {"game_id": game_id, "premoves": result["premoves"]})
+    else:
+        emit('error', {"message": result["error"]})
+
+@socketio.on('make_move')
+@instrumented('socket:make_move')
+def on_make_move(data):
+    game_id = data['game_id']
+    move = data['move']
+    player_id = data.get('player_id')
+    
+    result, _ = process_move(game_id, move, player_id, request.sid)
+    if not result["success"]:
+        error = {"message": result["error"]}
+        if "retry_after" in result:
+            error["retry_after"] = result["retry_after"]
+        emit('error', error)
+
+@socketio.on('arena_join')
+@instrumented('socket:arena_join')
+def on_arena_join(data):
+    """Follow an arena and enter its pairing pool; pairings arrive as arena_pairing"""
+    arena_id = data['arena_id']
+    player_id = data.get('player_id') or request.sid
+    join_room(arena_room(arena_id))
+    join_room(arena_room(arena_id, player_id))
+    _, error = join_arena_pool(arena_id, player_id, data.get('rating', 1500))
+    if error:
+        emit('error', {"message": error})
+
+@socketio.on('arena_leave')
+@instrumented('socket:arena_leave')
+def on_arena_leave(data):
+    arena_id = data['arena_id']
+    player_id = data.get('player_id') or request.sid
+    leave_room(arena_room(arena_id))
+    leave_room(arena_room(arena_id, player_id))
+    with games_lock:
+        if arena_id in arenas:
+            arenas[arena_id].leave(player_id)
+
+@socketio.on('subscribe')
+@instrumented('socket:subscribe')
+def on_subscribe(data):
+    """Follow many games from one socket: `game_ids` and/or a `filter` ({"type", "min_elo", "max_elo"}).
+    
+    The sender gets a game_batch snapshot of every live game it now follows,
+    then one game_batch per tick with whatever changed.
+    """
+    game_ids = data.get('game_ids', [])
+    if not isinstance(game_ids, list) or not all(isinstance(game_id, str) for game_id in game_ids):
+        emit('error', {"message": "game_ids must be a list of game ids"})
+        return
+    try:
+        game_filter = GameFilter.from_dict(data['filter']) if data.get('filter') is not None else None
+        subscriptions.subscribe(request.sid, game_ids, game_filter)
+    except (ValueError, TypeError, AttributeError) as e:
+        emit('error', {"message": str(e)})
+        return
+    start_subscription_flusher()
+    
+    with games_lock:
+        snapshot_ids = [game_id for game_id in game_ids if game_id in games]
+        if game_filter is not None:
+            requested = set(snapshot_ids)
+            snapshot_ids += [game_id for game_id, game in games.items()
+                             if game.game_result == '*' and game_id not in requested and game_filter.matches(game_tags(game))]
+        snapshot = [{**games[game_id].get_board_state(), "game_id": game_id, "event": 'game_update',
+                     "seq": event_replay.last_seq(game_id), "snapshot": True}
+                    for game_id in snapshot_ids]
+    emit('subscribed', {**subscriptions.subscription(request.sid), "tick": SUBSCRIPTION_TICK})
+    if snapshot:
+        emit('game_batch', {"tick": None, "games": snapshot})
+
+@socketio.on('unsubscribe')
+@instrumented('socket:unsubscribe')
+def on_unsubscribe(data):
+    """Stop following `game_ids`, and the filter if {"filter": true}"""
+    subscriptions.unsubscribe(request.sid, data.get('game_ids') or [], bool(data.get('filter')))
+    emit('subscribed', {**subscriptions.subscription(request.sid), "tick": SUBSCRIPTION_TICK})
+
+@socketio.on('disconnect')
+def on_disconnect():
+    subscriptions.drop(request.sid)
 
 if __name__ == '__main__':
     print("Starting 3D Chess Backend...")
     print(f"Stockfish path: {STOCKFISH_PATH}")
+    engine_pool.start()
+    start_archive()
+    start_stats()
     print("Server will be available at http://localhost:5001")
+    if PROFILE_MODE:
+        profiler.start(PROFILE_MODE, PROFILE_SECONDS, PROFILE_SAMPLE_RATE, PROFILE_TARGETS)
+        print(f"Profiling ({PROFILE_MODE}) for {PROFILE_SECONDS}s, writing to {PROFILE_DIR}/")
     socketio.run(app, debug=False, host='0.0.0.0', port=5001, allow_unsafe_werkzeug=True)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Benchmark arena pairing with thousands of participants.
+
+Fills an arena with randomly rated players, pairs them all at the start,
+then finishes games one at a time, oldest first, so every finish scores
+the game and pairs both players again. Reports the bulk start time and the latency
+of each finish, rank lookup and standings page:
+
+    python bench_arena.py --participants 1000 10000 100000
+    python bench_arena.py --participants 10000 --server
+
+With --server every game is a ChessGame in the backend and finishes
+through resign(), so the numbers include game creation and the
+game_finished_hooks path under games_lock.
+"""
+import argparse
+import random
+import sys
+import time
+
+from arena import Arena
+
+def percentiles(samples):
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6
+
+def run(participants, finishes, server, seed):
+    rng = random.Random(seed)
+    arena = Arena(f"bench-{participants}", minutes=600)
+    players = [f"player-{index}" for index in range(participants)]
+    for player_id in players:
+        arena.join(player_id, max(100, min(3500, int(rng.gauss(1500, 350)))))
+
+    if server:
+        import backend
+        backend.arenas[arena.arena_id] = arena
+        def start():
+            with backend.games_lock:
+                return backend.open_arena_games(arena, arena.start())
+        def finish(game_id):
+            with backend.games_lock:
+                game = backend.games.pop(game_id)
+                if rng.random() < 0.8:
+                    game.resign(rng.choice(list(game.players)))
+                else:
+                    game._finish('1/2-1/2')
+            backend._arena_notices.clear()
+    else:
+        start = arena.start
+        def finish(game_id):
+            arena.game_finished(game_id, rng.choice(('1-0', '0-1', '1/2-1/2')))
+
+    started = time.perf_counter()
+    pairings = start()
+    start_seconds = time.perf_counter() - started
+
+    latencies = []
+    for _ in range(finishes):
+        game_id = next(iter(arena.games))  # games in progress, oldest first
+        started = time.perf_counter()
+        finish(game_id)
+        latencies.append(time.perf_counter() - started)
+
+    rank_latencies = []
+    for player_id in rng.sample(players, min(1000, participants)):
+        started = time.perf_counter()
+        arena.rank(player_id)
+        rank_latencies.append(time.perf_counter() - started)
+    started = time.perf_counter()
+    arena.standings(50)
+    standings_us = (time.perf_counter() - started) * 1e6
+
+    if server:
+        with backend.games_lock:
+            for game_id in arena.games:
+                backend.games.pop(game_id, None)
+                backend.arena_games.pop(game_id, None)
+            backend.arenas.pop(arena.arena_id)
+    return {
+        "participants": participants,
+        "start_games": len(pairings),
+        "start_ms": start_seconds * 1000,
+        "finish_us": percentiles(latencies),
+        "rank_us": percentiles(rank_latencies),
+        "standings_us": standings_us,
+        "waiting": arena.waiting,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Arena pairing latency at scale")
+    parser.add_argument('--participants', type=int, nargs='+', default=[10000], help="arena sizes (default 10000)")
+    parser.add_argument('--finishes', type=int, default=20000, help="games finished per arena (default 20000)")
+    parser.add_argument('--server', action='store_true', help="create and finish real backend games")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"🏟️  {args.finishes} finishes per arena{', through the backend' if args.server else ''}")
+    print(f"   {'players':>8}{'start games':>13}{'start ms':>10}{'finish p50/p99 µs':>20}"
+          f"{'rank p50/p99 µs':>18}{'top 50 µs':>11}")
+    for participants in args.participants:
+        r = run(participants, args.finishes, args.server, args.seed)
+        print(f"   {r['participants']:>8}{r['start_games']:>13}{r['start_ms']:>10.1f}"
+              f"{r['finish_us'][0]:>11.1f} / {r['finish_us'][1]:<6.1f}"
+              f"{r['rank_us'][0]:>9.1f} / {r['rank_us'][1]:<6.1f}{r['standings_us']:>11.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
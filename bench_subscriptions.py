@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Compare per-game rooms with multiplexed subscriptions for clients that follow many games.
+
+Plays random moves in many games at once. Each of --sockets clients follows
+--follow random games. The same event stream is delivered two ways:
+
+    rooms      one join_game room per game: a frame per event per follower
+    multiplex  subscriptions.py: one game_batch frame per socket per tick
+
+and the frames, bytes and encoding CPU per second of play are reported
+(transport costs per frame come on top and are not measured):
+
+    python bench_subscriptions.py --games 2000 --sockets 50 --follow 200 --moves-per-second 400
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import backend
+from subscriptions import SubscriptionHub
+
+def encoded_size(event, data):
+    """Bytes of one Socket.IO text event on the wire"""
+    return len(json.dumps([event, data], separators=(',', ':')).encode()) + 2  # '42' packet prefix
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-game rooms vs multiplexed game_batch frames")
+    parser.add_argument('--games', type=int, default=2000, help="live games (default 2000)")
+    parser.add_argument('--sockets', type=int, default=50, help="multi-game clients (default 50)")
+    parser.add_argument('--follow', type=int, default=200, help="games each client follows (default 200)")
+    parser.add_argument('--moves-per-second', type=int, default=400, help="moves across all games (default 400)")
+    parser.add_argument('--seconds', type=int, default=10, help="seconds of play to simulate (default 10)")
+    parser.add_argument('--tick', type=float, default=0.25, help="subscription tick in seconds (default 0.25)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    games = []
+    for index in range(args.games):
+        game = backend.ChessGame(f"bench-{index}", 'multiplayer')
+        game.add_player('white-player', 'white')
+        game.add_player('black-player', 'black')
+        games.append(game)
+    hub = SubscriptionHub(max_games=args.follow)
+    followers = {}
+    for sid in range(args.sockets):
+        followed = rng.sample(range(args.games), args.follow)
+        hub.subscribe(sid, [games[index].game_id for index in followed])
+        for index in followed:
+            followers[index] = followers.get(index, 0) + 1
+
+    rooms = {"frames": 0, "bytes": 0, "cpu": 0.0}
+    multiplex = {"frames": 0, "bytes": 0, "cpu": 0.0}
+    seqs = {}
+    moves_per_tick = max(1, round(args.moves_per_second * args.tick))
+    ticks = round(args.seconds / args.tick)
+    for _ in range(ticks):
+        for _ in range(moves_per_tick):
+            index = rng.randrange(args.games)
+            game = games[index]
+            if game.game_result != '*':
+                continue
+            player = 'white-player' if game.current_turn == 'white' else 'black-player'
+            payload = game.make_move(rng.choice(list(game.board.legal_moves)).uci(), player)
+            seqs[index] = seqs.get(index, 0) + 1
+            payload["seq"] = seqs[index]
+
+            # Rooms: the event is encoded once and sent to every follower
+            started = time.process_time()
+            size = encoded_size('move_made', payload)
+            rooms["cpu"] += time.process_time() - started
+            rooms["frames"] += followers.get(index, 0)
+            rooms["bytes"] += size * followers.get(index, 0)
+
+            started = time.process_time()
+            hub.publish(game.game_id, 'move_made', payload, None)
+            multiplex["cpu"] += time.process_time() - started
+
+        started = time.process_time()
+        for _, frame in hub.flush():
+            multiplex["frames"] += 1
+            multiplex["bytes"] += encoded_size('game_batch', frame)
+        multiplex["cpu"] += time.process_time() - started
+
+    print(f"📡 {args.games} games, {args.sockets} sockets x {args.follow} games, "
+          f"{args.moves_per_second} moves/s, {args.tick}s tick")
+    print(f"   {'delivery':<11}{'frames/s':>10}{'KB/s':>10}{'encode ms/s':>12}")
+    for name, totals in (("rooms", rooms), ("multiplex", multiplex)):
+        print(f"   {name:<11}{totals['frames'] / args.seconds:>10.0f}{totals['bytes'] / args.seconds / 1024:>10.0f}"
+              f"{totals['cpu'] / args.seconds * 1000:>12.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark the engine drivers with many concurrent engine games.
+
+Starts one engine per game, then plays every game from a pool of handler
+threads (standing in for request threads) and reports the process's
+thread count, context switches and CPU time for each driver. The
+`futures` mode plays all games from one thread, submitting each engine's
+play() coroutine to the driver loop with UciDriver.submit():
+
+    python bench_uci_driver.py --games 500
+    STOCKFISH_PATH=/usr/games/stockfish python bench_uci_driver.py --games 500 --movetime 0.01
+
+Without STOCKFISH_PATH the engines are fake_uci_engine.py, so the numbers
+measure driver overhead rather than search time.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread, Event, active_count
+
+import chess
+import chess.engine
+
+from uci_driver import UciDriver
+
+FAKE_ENGINE = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_uci_engine.py')]
+
+def native_threads():
+    """OS threads in this process, including ones Python doesn't know about"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return active_count()
+
+def usage():
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    return ru.ru_nvcsw + ru.ru_nivcsw, ru.ru_utime + ru.ru_stime
+
+def run(mode, command, games, moves, movetime, handlers):
+    """Play `games` engine games of `moves` plies each with one driver; returns the measurements"""
+    driver = UciDriver()
+    spawn = chess.engine.SimpleEngine.popen_uci if mode == 'thread' else driver.popen_uci
+    with ThreadPoolExecutor(handlers) as pool:
+        engines = list(pool.map(lambda _: spawn(command), range(games)))
+
+    peak = {"threads": native_threads()}
+    done = Event()
+    def sample():
+        while not done.wait(0.05):
+            peak["threads"] = max(peak["threads"], native_threads())
+    sampler = Thread(target=sample, daemon=True)
+    sampler.start()
+
+    latencies = []
+    def play(engine):
+        board = chess.Board()
+        for _ in range(moves):
+            started = time.monotonic()
+            result = engine.play(board, chess.engine.Limit(time=movetime))
+            latencies.append(time.monotonic() - started)
+            if result.move is None:
+                break
+            board.push(result.move)
+
+    def play_all(engines):
+        """Every game's next move in flight at once, one thread waiting on the futures"""
+        boards = [chess.Board() for _ in engines]
+        for _ in range(moves):
+            started = time.monotonic()
+            pending = [(board, driver.submit(engine.protocol.play(board.copy(), chess.engine.Limit(time=movetime))))
+                       for engine, board in zip(engines, boards) if not board.is_game_over()]
+            for _, future in pending:
+                future.add_done_callback(lambda _, started=started: latencies.append(time.monotonic() - started))
+            for board, future in pending:
+                board.push(future.result().move)
+
+    switches_before, cpu_before = usage()
+    started = time.monotonic()
+    if mode == 'futures':
+        play_all(engines)
+    else:
+        with ThreadPoolExecutor(handlers) as pool:
+            list(pool.map(play, engines))
+    elapsed = time.monotonic() - started
+    switches_after, cpu_after = usage()
+    done.set()
+    sampler.join()
+
+    with ThreadPoolExecutor(handlers) as pool:
+        list(pool.map(lambda engine: engine.quit(), engines))
+    latencies.sort()
+    return {
+        "mode": mode,
+        "games": games,
+        "moves": len(latencies),
+        "seconds": elapsed,
+        "peak_threads": peak["threads"],
+        "context_switches": switches_after - switches_before,
+        "cpu_seconds": cpu_after - cpu_before,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the thread-per-engine and shared-loop UCI drivers")
+    parser.add_argument('--games', type=int, default=500, help="concurrent engine games (default 500)")
+    parser.add_argument('--moves', type=int, default=10, help="engine moves per game (default 10)")
+    parser.add_argument('--movetime', type=float, default=0.05, help="seconds per move (default 0.05)")
+    parser.add_argument('--handlers', type=int, default=64, help="request handler threads (default 64)")
+    parser.add_argument('--mode', choices=['thread', 'shared', 'futures', 'all'], default='all')
+    parser.add_argument('--json', action='store_true', help=argparse.SUPPRESS)  # one mode, result on stdout
+    args = parser.parse_args()
+    command = os.environ.get('STOCKFISH_PATH') or FAKE_ENGINE
+
+    if args.mode != 'all':
+        result = run(args.mode, command, args.games, args.moves, args.movetime, args.handlers)
+        if args.json:
+            print(json.dumps(result))
+            return 0
+        results = [result]
+    else:
+        # A fresh process per driver so thread and context-switch counts don't mix
+        results = []
+        for mode in ('thread', 'shared', 'futures'):
+            output = subprocess.run(
+                [sys.executable, __file__, '--mode', mode, '--json', '--games', str(args.games),
+                 '--moves', str(args.moves), '--movetime', str(args.movetime), '--handlers', str(args.handlers)],
+                check=True, stdout=subprocess.PIPE, text=True).stdout
+            results.append(json.loads(output.splitlines()[-1]))
+
+    print(f"🏁 {args.games} games x {args.moves} moves at {args.movetime}s, {args.handlers} handler threads")
+    print(f"   {'driver':<8}{'threads':>9}{'ctx switches':>14}{'cpu s':>8}{'wall s':>8}{'p50 ms':>8}{'p99 ms':>8}")
+    for r in results:
+        print(f"   {r['mode']:<8}{r['peak_threads']:>9}{r['context_switches']:>14}{r['cpu_seconds']:>8.1f}"
+              f"{r['seconds']:>8.1f}{r['p50_ms']:>8.0f}{r['p99_ms']:>8.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Compare the JSON and binary (wire.py) encodings of game events.
+
+Plays seeded random games through ChessGame, takes every move_made payload
+and a game_update snapshot per game, and reports the bytes each encoding
+puts on the Socket.IO connection and the CPU time to encode and decode it:
+
+    python bench_wire_format.py --games 50 --plies 80
+
+Sizes are whole Engine.IO messages, so the binary figures include the text
+header Socket.IO sends ahead of each binary attachment.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+
+import socketio.packet
+
+import backend
+import wire
+
+def sample_events(games, plies, seed):
+    """(event, payload) pairs from random games, as the server would emit them"""
+    rng = random.Random(seed)
+    events = []
+    for index in range(games):
+        game = backend.ChessGame(f"bench-{index}", 'multiplayer')
+        game.add_player('white-player', 'white')
+        game.add_player('black-player', 'black')
+        for _ in range(plies):
+            if game.game_result != '*':
+                break
+            player = 'white-player' if game.current_turn == 'white' else 'black-player'
+            move = rng.choice(list(game.board.legal_moves)).uci()
+            events.append(('move_made', game.make_move(move, player)))
+        events.append(('game_update', game.get_board_state()))
+    return events
+
+def message_bytes(event, data):
+    """Bytes on the connection for one Socket.IO event, Engine.IO framing included"""
+    parts = socketio.packet.Packet(socketio.packet.EVENT, data=[event, data]).encode()
+    if not isinstance(parts, list):
+        parts = [parts]
+    # Text messages get Engine.IO's one-character message prefix, binary ones go raw
+    return sum(len(part.encode()) + 1 if isinstance(part, str) else len(part) for part in parts)
+
+def timed(function, items, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        for item in items:
+            function(item)
+    return (time.process_time() - started) / (repeat * len(items)) * 1e6
+
+def measure(events, event, repeat):
+    payloads = [payload for name, payload in events if name == event]
+    rows = []
+    for name, encode in [
+        ("json", lambda payload: json.dumps(payload, separators=(',', ':'))),
+        ("binary", lambda payload: wire.encode_event(event, payload)),
+        ("binary, no FEN", lambda payload: wire.encode_event(event, payload, include_fen=False)),
+    ]:
+        encoded = [encode(payload) for payload in payloads]
+        decode = json.loads if name == "json" else wire.decode_event
+        sizes = [message_bytes(event, payload if name == "json" else data)
+                 for payload, data in zip(payloads, encoded)]
+        rows.append({
+            "encoding": name,
+            "bytes": sum(sizes) / len(sizes),
+            "payload_bytes": sum(len(data) for data in encoded) / len(encoded),
+            "encode_us": timed(encode, payloads, repeat),
+            "decode_us": timed(decode, encoded, repeat),
+        })
+    return len(payloads), rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes and CPU per event, JSON vs the binary wire format")
+    parser.add_argument('--games', type=int, default=50, help="random games to sample (default 50)")
+    parser.add_argument('--plies', type=int, default=80, help="max plies per game (default 80)")
+    parser.add_argument('--repeat', type=int, default=5, help="timing repetitions (default 5)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    events = sample_events(args.games, args.plies, args.seed)
+    for event in ('move_made', 'game_update'):
+        count, rows = measure(events, event, args.repeat)
+        baseline = rows[0]["bytes"]
+        print(f"\n📦 {event}: {count} events")
+        print(f"   {'encoding':<16}{'bytes':>8}{'payload':>9}{'vs json':>9}{'encode µs':>11}{'decode µs':>11}")
+        for row in rows:
+            print(f"   {row['encoding']:<16}{row['bytes']:>8.0f}{row['payload_bytes']:>9.0f}"
+                  f"{row['bytes'] / baseline:>9.1%}{row['encode_us']:>11.1f}{row['decode_us']:>11.1f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,151 @@
+// Decoder for the opt-in binary encoding of move_made and game_update
+// (layout documented in wire.py). Payloads decode to the same keys as the
+// JSON events; move_made carries `ply` instead of the whole move history.
+const ChessWire = {
+    RESULTS: ['*', '1-0', '0-1', '1/2-1/2'],
+    COLORS: ['white', 'black'],
+    PROMOTIONS: ['', '', 'n', 'b', 'r', 'q'],  // python-chess piece types
+    FLAG_CHECK: 1,
+    FLAG_CHECKMATE: 2,
+    FLAG_STALEMATE: 4,
+    FLAG_BLACK_TO_MOVE: 8,
+    FLAG_FEN: 16,
+    FLAG_ADJUDICATION: 32,
+    FLAG_LEGAL: 64,
+    FLAG_SNAPSHOT: 128,
+
+    squareName(square) {
+        return 'abcdefgh'[square % 8] + (Math.floor(square / 8) + 1);
+    },
+
+    parseSquare(name) {
+        return 'abcdefgh'.indexOf(name[0]) + (parseInt(name[1], 10) - 1) * 8;
+    },
+
+    // 16-bit move code: from | to << 6 | promotion piece << 12 (see archive.encode_move)
+    encodeMove(uci) {
+        const promotion = uci.length > 4 ? this.PROMOTIONS.indexOf(uci[4]) - 1 : 0;
+        return this.parseSquare(uci.substring(0, 2)) | this.parseSquare(uci.substring(2, 4)) << 6 | promotion << 12;
+    },
+
+    decodeMove(code) {
+        const promotion = code >> 12;
+        return this.squareName(code & 0x3f) + this.squareName((code >> 6) & 0x3f) +
+            (promotion ? this.PROMOTIONS[promotion + 1] : '');
+    },
+
+    isBinary(data) {
+        return data instanceof ArrayBuffer || ArrayBuffer.isView(data);
+    },
+
+    decodeEvent(data) {
+        const bytes = data instanceof ArrayBuffer ? new Uint8Array(data)
+            : new Uint8Array(data.buffer, data.byteOffset, data.byteLength);
+        const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+        const kind = bytes[0], flags = bytes[1], status = bytes[2];
+        const ply = view.getUint16(3, true);
+        const seq = view.getUint32(5, true);
+        let offset = 9;
+        const moves = [];
+        const count = view.getUint16(offset, true);
+        offset += 2;
+        for (let i = 0; i < count; i++, offset += 2) {
+            moves.push(this.decodeMove(view.getUint16(offset, true)));
+        }
+        const shortString = () => {
+            const length = bytes[offset];
+            const value = new TextDecoder().decode(bytes.subarray(offset + 1, offset + 1 + length));
+            offset += 1 + length;
+            return value;
+        };
+
+        const payload = {
+            seq: seq,
+            current_turn: flags & this.FLAG_BLACK_TO_MOVE ? 'black' : 'white',
+            is_check: Boolean(flags & this.FLAG_CHECK),
+            is_checkmate: Boolean(flags & this.FLAG_CHECKMATE),
+            is_stalemate: Boolean(flags & this.FLAG_STALEMATE),
+            game_result: this.RESULTS[status & 3],
+            adjudication: null
+        };
+        if (flags & this.FLAG_SNAPSHOT) payload.snapshot = true;
+        if (flags & this.FLAG_FEN) payload.board = shortString();
+        if (flags & this.FLAG_ADJUDICATION) payload.adjudication = shortString();
+        if (flags & this.FLAG_LEGAL) {
+            const masks = {};
+            const pairs = bytes[offset++];
+            for (let i = 0; i < pairs; i++, offset += 2) {
+                const pair = view.getUint16(offset, true);
+                const from = this.squareName(pair & 0x3f);
+                masks[from] = (masks[from] || 0n) | (1n << BigInt(pair >> 6));
+            }
+            payload.legal_moves = {};
+            for (const from in masks) {
+                payload.legal_moves[from] = masks[from].toString(16).padStart(16, '0');
+            }
+        }
+        if (status >> 2) {
+            payload.resigned_by = this.COLORS[(status >> 2) - 1];
+            payload.message = `${payload.resigned_by[0].toUpperCase()}${payload.resigned_by.slice(1)} player has resigned`;
+        }
+
+        if (kind === 1) {
+            const last = moves[moves.length - 1];
+            Object.assign(payload, {
+                success: true,
+                move: last,
+                moves: moves,
+                premoves_applied: moves.slice(1),
+                from_square: last.substring(0, 2),
+                to_square: last.substring(2, 4),
+                ply: ply
+            });
+            return { event: 'move_made', payload };
+        }
+        payload.move_history = moves;
+        payload.players = {};
+        const players = bytes[offset++];
+        for (let i = 0; i < players; i++) {
+            const color = this.COLORS[bytes[offset++]];
+            payload.players[shortString()] = color;
+        }
+        return { event: 'game_update', payload };
+    }
+};
+
 class ChessGameClient {
-    constructor(serverUrl = 'http://localhost:5001') {
+    // options.encoding: 'json' (default) or 'binary' for compact move_made and
+    // game_update events; options.fen: false drops the FEN from binary events
+    // options.adminToken: sent with forced traces (forceTracing), which need it
+    constructor(serverUrl = 'http://localhost:5001', options = {}) {
         this.serverUrl = serverUrl;
+        this.encoding = options.encoding || 'json';
+        this.wireFen = options.fen !== false;
+        this.moveHistory = [];  // kept up to date from binary move_made events
+        this.lastSeq = null;  // number of the last room event applied, sent when re-joining
+        this.catchingUp = false;  // a re-join for missed events is in flight
         this.socket = null;
         this.gameId = null;
         this.playerId = null;
         this.playerColor = null;
+        this.legalMoves = null;  // {from: to-square bitmask hex} for the side to move
+        this.forceTracing = false;  // ask the server to trace every move regardless of sampling
+        this.adminToken = options.adminToken || null;  // forced tracing is only honoured with the admin token
+        this.lastTraceId = null;
+        this.premoves = [];  // our queued premoves, as last confirmed by the server
+        this.subscribedGames = new Set();  // followed through subscribe(), re-sent on reconnect
+        this.subscriptionFilter = null;
         this.callbacks = {};
     }
 
+    // Random 128-bit trace id, sent with each move so server spans can be
+    // matched to what the user saw
+    newTraceId() {
+        const bytes = new Uint8Array(16);
+        crypto.getRandomValues(bytes);
+        return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+    }
+
     // Connect to the server using Socket.IO
     connect() {
         return new Promise((resolve, reject) => {
@@ -16,6 +154,16 @@ class ChessGameClient {
                 
                 this.socket.on('connect', () => {
                     console.log('Connected to chess server');
+                    // After a dropped connection, catch up on what happened meanwhile
+                    if (this.gameId) {
+                        this.joinRoom();
+                    }
+                    if (this.subscribedGames.size || this.subscriptionFilter) {
+                        this.socket.emit('subscribe', {
+                            game_ids: Array.from(this.subscribedGames),
+                            filter: this.subscriptionFilter
+                        });
+                    }
                     resolve();
                 });
                 
@@ -25,15 +173,52 @@ class ChessGameClient {
                 });
                 
                 this.socket.on('move_made', (data) => {
+                    if (ChessWire.isBinary(data)) {
+                        data = ChessWire.decodeEvent(data).payload;
+                    }
+                    if (!this.acceptEvent(data)) return;
+                    if (data.move_history) {
+                        this.moveHistory = data.move_history.slice();
+                    } else {
+                        // Binary events carry only the new moves
+                        this.moveHistory.push(...data.moves);
+                        data.move_history = this.moveHistory.slice();
+                    }
                     console.log('Move made:', data);
+                    this.updateLegalMoves(data);
+                    this.updatePremoves(data);
                     this.triggerCallback('move_made', data);
                 });
                 
                 this.socket.on('game_update', (data) => {
+                    if (ChessWire.isBinary(data)) {
+                        data = ChessWire.decodeEvent(data).payload;
+                    }
+                    if (!this.acceptEvent(data)) return;
+                    this.moveHistory = data.move_history.slice();
                     console.log('Game update:', data);
+                    this.updateLegalMoves(data);
                     this.triggerCallback('game_update', data);
                 });
                 
+                this.socket.on('premoves', (data) => {
+                    this.premoves = data.premoves;
+                    this.triggerCallback('premoves', data);
+                });
+                
+                this.socket.on('position', (data) => {
+                    this.triggerCallback('position', data);
+                });
+                
+                // Subscriptions: every game that changed during a tick, in one frame
+                this.socket.on('game_batch', (data) => {
+                    this.triggerCallback('game_batch', data);
+                });
+                
+                this.socket.on('subscribed', (data) => {
+                    this.triggerCallback('subscribed', data);
+                });
+                
                 this.socket.on('error', (data) => {
                     console.error('Game error:', data);
                     this.triggerCallback('error', data);
@@ -59,6 +244,9 @@ class ChessGameClient {
             if (options.elo_rating) {
                 requestBody.elo_rating = options.elo_rating;
             }
+            if (options.ponder !== undefined) {
+                requestBody.ponder = options.ponder;
+            }
             
             const response = await fetch(`${this.serverUrl}/api/game/create`, {
                 method: 'POST',
@@ -104,14 +292,12 @@ class ChessGameClient {
                 this.gameId = gameId;
                 this.playerId = data.player_id;
                 this.playerColor = data.color;
+                this.updateLegalMoves(data.game_state);
                 
                 // Join the Socket.IO room
-                if (this.socket) {
-                    this.socket.emit('join_game', {
-                        game_id: this.gameId,
-                        player_id: this.playerId
-                    });
-                }
+                this.moveHistory = data.game_state.move_history.slice();
+                this.lastSeq = null;
+                this.joinRoom();
                 
                 console.log(`Joined game ${gameId} as ${data.color} player`);
                 return data;
@@ -124,11 +310,53 @@ class ChessGameClient {
         }
     }
 
+    // Subscribe to the game's events in our wire encoding. With a lastSeq the
+    // server replays only the events after it, otherwise (or if they're no
+    // longer buffered) it sends a game_update snapshot
+    joinRoom() {
+        if (this.socket && this.gameId) {
+            this.socket.emit('join_game', {
+                game_id: this.gameId,
+                player_id: this.playerId,
+                encoding: this.encoding,
+                fen: this.wireFen,
+                last_seq: this.lastSeq
+            });
+        }
+    }
+
+    // Room events are numbered. Drop ones already applied (a replay can
+    // overlap live events) and re-join to fetch any we skipped over.
+    acceptEvent(data) {
+        if (data.seq === undefined) return true;
+        if (!data.snapshot && this.lastSeq !== null) {
+            if (data.seq <= this.lastSeq) return false;
+            if (data.seq > this.lastSeq + 1) {
+                if (!this.catchingUp) {
+                    this.catchingUp = true;
+                    this.joinRoom();
+                }
+                return false;
+            }
+        }
+        this.lastSeq = data.seq;
+        this.catchingUp = false;
+        return true;
+    }
+
     // Make a move
     async makeMove(move) {
         if (!this.gameId) {
             throw new Error('Not connected to a game');
         }
+        
+        // Reject illegal input locally instead of paying a server round trip
+        if (!this.isLegalMove(move)) {
+            throw new Error(`Illegal move: ${move}`);
+        }
+
+        const traceId = this.newTraceId();
+        this.lastTraceId = traceId;
 
         try {
             // Use Socket.IO for real-time updates
@@ -136,16 +364,26 @@ class ChessGameClient {
                 this.socket.emit('make_move', {
                     game_id: this.gameId,
                     move: move,
-                    player_id: this.playerId
+                    player_id: this.playerId,
+                    trace_id: traceId,
+                    trace_sampled: this.forceTracing,
+                    ...(this.forceTracing && this.adminToken ? { admin_token: this.adminToken } : {})
                 });
-                return { success: true };
+                return { success: true, trace_id: traceId };
             } else {
                 // Fallback to HTTP API
+                const headers = {
+                    'Content-Type': 'application/json',
+                    'X-Trace-Id': traceId,
+                };
+                if (this.forceTracing) {
+                    headers['X-Trace-Sampled'] = '1';
+                    if (this.adminToken) headers['X-Admin-Token'] = this.adminToken;
+                }
+                
                 const response = await fetch(`${this.serverUrl}/api/game/${this.gameId}/move`, {
                     method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json',
-                    },
+                    headers: headers,
                     body: JSON.stringify({
                         move: move,
                         player_id: this.playerId
@@ -182,6 +420,98 @@ class ChessGameClient {
         }
     }
 
+    // Queue moves to play automatically as soon as it's our turn. Each entry is
+    // a UCI move or { move, if } where `if` is the opponent move it depends on.
+    async queuePremoves(moves, replace = true) {
+        if (!this.gameId) {
+            throw new Error('Not connected to a game');
+        }
+        
+        if (this.socket && this.socket.connected) {
+            this.socket.emit('premove', {
+                game_id: this.gameId,
+                player_id: this.playerId,
+                moves: moves,
+                replace: replace
+            });
+            return { success: true };
+        }
+        
+        const response = await fetch(`${this.serverUrl}/api/game/${this.gameId}/premove`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify({ player_id: this.playerId, moves: moves, replace: replace }),
+        });
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error || 'Failed to queue premoves');
+        }
+        this.premoves = data.premoves;
+        this.triggerCallback('premoves', data);
+        return data;
+    }
+
+    // Drop premoves the server has played. If it's our turn after a move, the
+    // server has played or discarded everything we had queued.
+    updatePremoves(data) {
+        if (this.premoves.length === 0) return;
+        
+        if (data.current_turn === this.playerColor) {
+            this.premoves = [];
+        } else {
+            const applied = (data.premoves_applied || []).length;
+            this.premoves = this.premoves.slice(Math.min(applied, this.premoves.length));
+        }
+        this.triggerCallback('premoves', { game_id: this.gameId, premoves: this.premoves });
+    }
+
+    // Ask for the position after `ply` half-moves; answered with a 'position'
+    // event (or, without a socket, the returned promise)
+    async seek(ply) {
+        if (!this.gameId) {
+            throw new Error('Not connected to a game');
+        }
+        
+        if (this.socket && this.socket.connected) {
+            this.socket.emit('seek', { game_id: this.gameId, ply: ply });
+            return null;
+        }
+        
+        const response = await fetch(`${this.serverUrl}/api/game/${this.gameId}/position?ply=${ply}`);
+        const data = await response.json();
+        if (!data.success) {
+            throw new Error(data.error || 'Failed to get position');
+        }
+        this.triggerCallback('position', data);
+        return data;
+    }
+
+    // Follow many games at once: `gameIds` and/or a `filter` such as
+    // {type: 'vs_computer', min_elo: 2000}. Updates arrive as 'game_batch'
+    // callbacks, {tick, games: [...]}, one per server tick
+    subscribe(gameIds = [], filter = null) {
+        gameIds.forEach(gameId => this.subscribedGames.add(gameId));
+        if (filter) {
+            this.subscriptionFilter = filter;
+        }
+        if (this.socket && this.socket.connected) {
+            this.socket.emit('subscribe', { game_ids: gameIds, filter: filter });
+        }
+    }
+
+    // Stop following `gameIds`, and the filter if `filter` is true
+    unsubscribe(gameIds = [], filter = false) {
+        gameIds.forEach(gameId => this.subscribedGames.delete(gameId));
+        if (filter) {
+            this.subscriptionFilter = null;
+        }
+        if (this.socket && this.socket.connected) {
+            this.socket.emit('unsubscribe', { game_ids: gameIds, filter: filter });
+        }
+    }
+
     // Leave the current game
     leaveGame() {
         if (this.socket && this.gameId) {
@@ -194,6 +524,39 @@ class ChessGameClient {
         this.gameId = null;
         this.playerId = null;
         this.playerColor = null;
+        this.legalMoves = null;
+        this.premoves = [];
+        this.moveHistory = [];
+        this.lastSeq = null;
+        this.catchingUp = false;
+    }
+
+    // Store the legal-move map pushed with game state payloads
+    updateLegalMoves(data) {
+        if (data && data.legal_moves) {
+            this.legalMoves = data.legal_moves;
+        }
+    }
+
+    // Destination squares (e.g. ['e3', 'e4']) for a piece on fromSquare
+    getLegalDestinations(fromSquare) {
+        if (!this.legalMoves || !this.legalMoves[fromSquare]) return [];
+        
+        const mask = BigInt('0x' + this.legalMoves[fromSquare]);
+        const destinations = [];
+        for (let square = 0; square < 64; square++) {
+            if ((mask >> BigInt(square)) & 1n) {
+                destinations.push('abcdefgh'[square % 8] + (Math.floor(square / 8) + 1));
+            }
+        }
+        return destinations;
+    }
+
+    // Check a UCI move against the legal-move map (true if no map is known yet)
+    isLegalMove(move) {
+        if (!this.legalMoves) return true;
+        if (typeof move !== 'string' || !/^[a-h][1-8][a-h][1-8][qrbn]?$/.test(move)) return false;
+        return this.getLegalDestinations(move.substring(0, 2)).includes(move.substring(2, 4));
     }
 
     // Set up event callbacks
@@ -271,4 +634,5 @@ class ChessGameClient {
 // Export for use in your HTML file
 if (typeof window !== 'undefined') {
     window.ChessGameClient = ChessGameClient;
+    window.ChessWire = ChessWire;
 }
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Minimal UCI engine for tests - no chess strength, predictable timing.
+
+Plays the first legal move in UCI order after the requested movetime (or
+until `stop` for infinite searches), printing an info line every 50 ms
+so callers see progress. Run it as STOCKFISH_PATH to exercise the engine
+pool, scheduler and pondering without Stockfish.
+"""
+import sys
+import threading
+import time
+
+import chess
+
+INFO_INTERVAL = 0.05
+
+def send(line):
+    sys.stdout.write(line + "\n")
+    sys.stdout.flush()
+
+def first_move(board):
+    moves = sorted(board.legal_moves, key=lambda move: move.uci())
+    return moves[0] if moves else None
+
+def search(board, seconds, stop):
+    started = time.monotonic()
+    move = first_move(board)
+    ponder = None
+    if move is not None:
+        after = board.copy(stack=False)
+        after.push(move)
+        ponder = first_move(after)
+    pv = " ".join(m.uci() for m in (move, ponder) if m is not None)
+    depth = 1
+    while not stop.wait(INFO_INTERVAL) and time.monotonic() - started < seconds:
+        send(f"info depth {depth} score cp 0 nodes {depth * 1000} pv {pv}")
+        depth += 1
+    send(f"info depth {depth} score cp 0 nodes {depth * 1000} pv {pv}")
+    if move is None:
+        send("bestmove (none)")
+    else:
+        send(f"bestmove {move.uci()}" + (f" ponder {ponder.uci()}" if ponder else ""))
+
+def main():
+    board = chess.Board()
+    stop = threading.Event()
+    worker = None
+    for line in sys.stdin:
+        parts = line.split()
+        if not parts:
+            continue
+        command = parts[0]
+        if command == "uci":
+            send("id name FakeUCI")
+            send("option name Skill Level type spin default 20 min 0 max 20")
+            send("option name Hash type spin default 16 min 1 max 1024")
+            send("option name Ponder type check default false")
+            send("uciok")
+        elif command == "isready":
+            send("readyok")
+        elif command == "position":
+            moves_at = parts.index("moves") if "moves" in parts else len(parts)
+            board = chess.Board() if parts[1] == "startpos" else chess.Board(" ".join(parts[2:moves_at]))
+            for move in parts[moves_at + 1:]:
+                board.push_uci(move)
+        elif command == "go":
+            seconds = 0.05
+            if "movetime" in parts:
+                seconds = int(parts[parts.index("movetime") + 1]) / 1000
+            if "infinite" in parts or "ponder" in parts:
+                seconds = float("inf")
+            stop = threading.Event()
+            worker = threading.Thread(target=search, args=(board.copy(), seconds, stop))
+            worker.start()
+        elif command in ("stop", "ponderhit", "quit"):
+            # ponderhit turns the ponder search into a normal one; stopping it is close enough here
+            stop.set()
+            if worker is not None:
+                worker.join()
+                worker = None
+            if command == "quit":
+                break
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Accuracy and fair-play analysis of finished games.
+
+Scores every move of every game: centipawn loss, accuracy and whether it
+was the engine's first choice. Positions are deduplicated across games
+(openings repeat a lot) and evaluated on a process pool of engines. Every
+evaluation is appended to a checkpoint, so an interrupted multi-hour run
+picks up where it stopped. Results go to a compressed columnar file that the
+query commands read a few columns at a time.
+
+    python game_analysis.py run --pgn 'games/*.pgn' --movetime 0.1 --workers 8
+    python game_analysis.py run --archive games/archive
+    python game_analysis.py players
+    python game_analysis.py anomalies --min-moves 20 --min-match 0.9
+    python game_analysis.py game <game key>
+
+The server runs the same pipeline as a background job through the engine
+scheduler's batch class (POST /api/admin/game-analysis).
+"""
+import argparse
+import array
+import bisect
+import glob
+import json
+import math
+import multiprocessing
+import multiprocessing.util
+import os
+import struct
+import sys
+import time
+import zlib
+from threading import Event, Thread
+
+import chess
+import chess.engine
+import chess.pgn
+import chess.polyglot
+
+from archive import Archive, encode_move, decode_move
+
+EVAL_RECORD = struct.Struct('<QhHB')  # position hash, White's score in cp, best move code (0 = none), depth
+COLUMNS_MAGIC = b'CCF1'
+COLUMNS_HEADER = struct.Struct('<4sI')  # magic, JSON directory length
+
+MATE_CP = 10000  # mates are scored as this, minus the distance to mate
+LOSS_CAP = 1000  # evaluations are clamped to +/- this before computing centipawn loss
+CHECKPOINT_FLUSH_INTERVAL = 1.0  # seconds between checkpoint flushes
+
+def load_pgn_games(patterns):
+    """Games from PGN files as {"key", "white", "black", "result", "moves"}"""
+    games = []
+    for path in sorted(path for pattern in patterns for path in glob.glob(pattern)):
+        with open(path, encoding='utf-8', errors='replace') as pgn:
+            index = 0
+            while True:
+                game = chess.pgn.read_game(pgn)
+                if game is None:
+                    break
+                if not game.errors:
+                    headers = game.headers
+                    games.append({
+                        "key": headers.get("GameId") or f"{os.path.basename(path)}#{index}",
+                        "white": headers.get("White", "?"),
+                        "black": headers.get("Black", "?"),
+                        "result": headers.get("Result", "*"),
+                        "moves": [move.uci() for move in game.mainline_moves()],
+                    })
+                index += 1
+    return games
+
+def archive_games(archive):
+    """Every game in an open Archive"""
+    games = []
+    for number in range(archive.game_count):
+        game = archive.get_game(number)
+        headers = game["headers"]
+        games.append({
+            "key": headers.get("GameId") or f"archive#{number}",
+            "white": headers.get("White", "?"),
+            "black": headers.get("Black", "?"),
+            "result": game["result"],
+            "moves": game["moves"],
+        })
+    return games
+
+def load_archive_games(path):
+    archive = Archive(path)
+    try:
+        return archive_games(archive)
+    finally:
+        archive.close()
+
+def positions(games):
+    """{position hash: FEN} over every position in `games`, each position once"""
+    unique = {}
+    for game in games:
+        board = chess.Board()
+        unique.setdefault(chess.polyglot.zobrist_hash(board), board.fen())
+        for move in game["moves"]:
+            board.push_uci(move)
+            unique.setdefault(chess.polyglot.zobrist_hash(board), board.fen())
+    return unique
+
+def terminal_eval(board):
+    """(White's score, best move code) for a position with no moves, else None"""
+    if board.is_checkmate():
+        return (-MATE_CP if board.turn == chess.WHITE else MATE_CP), 0
+    if board.is_stalemate() or board.is_insufficient_material():
+        return 0, 0
+    return None
+
+def eval_from_info(info):
+    """(White's score in cp, best move code, depth) from an engine InfoDict"""
+    score = info.get("score")
+    cp = score.white().score(mate_score=MATE_CP) if score else 0
+    pv = info.get("pv")
+    return max(-MATE_CP, min(MATE_CP, cp)), encode_move(pv[0]) if pv else 0, min(info.get("depth", 0), 255)
+
+class Checkpoint:
+    """Append-only file of position evaluations, reloaded on restart"""
+    def __init__(self, path):
+        self.path = path
+        self.evals = {}
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                data = f.read()
+            # A crash can leave a partial record at the end; ignore it
+            usable = len(data) // EVAL_RECORD.size * EVAL_RECORD.size
+            for key, cp, best, depth in EVAL_RECORD.iter_unpack(data[:usable]):
+                self.evals[key] = (cp, best, depth)
+            with open(path, 'r+b') as f:
+                f.truncate(usable)
+        self._file = open(path, 'ab')
+        self._last_flush = time.monotonic()
+
+    def add(self, key, cp, best, depth):
+        self.evals[key] = (cp, best, depth)
+        self._file.write(EVAL_RECORD.pack(key, cp, best, depth))
+        if time.monotonic() - self._last_flush >= CHECKPOINT_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+def win_percent(cp):
+    """Expected score in percent for a centipawn evaluation (Lichess's curve)"""
+    return 50 + 50 * (2 / (1 + math.exp(-0.00368208 * cp)) - 1)
+
+def move_accuracy(cp_before, cp_after):
+    """Accuracy of one move from the mover's evaluations before and after it, 0-100"""
+    drop = win_percent(cp_before) - win_percent(cp_after)
+    return max(0.0, min(100.0, 103.1668 * math.exp(-0.04354 * max(drop, 0)) - 3.1669))
+
+def score_games(games, evals):
+    """Per-move and per-game tables (dicts of columns) from the position evaluations"""
+    moves = {name: [] for name in ("game", "ply", "move", "best", "eval", "cp_loss", "accuracy")}
+    table = {name: [] for name in ("key", "white", "black", "result", "plies")}
+    for side in ("white", "black"):
+        for stat in ("moves", "acpl", "accuracy", "match"):
+            table[f"{side}_{stat}"] = []
+
+    for number, game in enumerate(games):
+        board = chess.Board()
+        before, best, _ = evals[chess.polyglot.zobrist_hash(board)]
+        totals = {color: [0, 0, 0.0, 0] for color in chess.COLORS}  # moves, cp loss, accuracy, matches
+        for ply, uci in enumerate(game["moves"]):
+            mover = board.turn
+            move = chess.Move.from_uci(uci)
+            board.push(move)
+            after, next_best, _ = evals[chess.polyglot.zobrist_hash(board)]
+            sign = 1 if mover == chess.WHITE else -1
+            mover_before = max(-LOSS_CAP, min(LOSS_CAP, sign * before))
+            mover_after = max(-LOSS_CAP, min(LOSS_CAP, sign * after))
+            cp_loss = max(0, mover_before - mover_after)
+            accuracy = move_accuracy(mover_before, mover_after)
+            code = encode_move(move)
+
+            moves["game"].append(number)
+            moves["ply"].append(ply)
+            moves["move"].append(code)
+            moves["best"].append(best)
+            moves["eval"].append(after)
+            moves["cp_loss"].append(cp_loss)
+            moves["accuracy"].append(round(accuracy * 100))
+            stats = totals[mover]
+            stats[0] += 1
+            stats[1] += cp_loss
+            stats[2] += accuracy
+            stats[3] += code == best
+            before, best = after, next_best
+
+        for name in ("key", "white", "black", "result"):
+            table[name].append(game[name])
+        table["plies"].append(len(game["moves"]))
+        for color, side in ((chess.WHITE, "white"), (chess.BLACK, "black")):
+            count, loss, accuracy, matches = totals[color]
+            table[f"{side}_moves"].append(count)
+            table[f"{side}_acpl"].append(loss / count if count else 0.0)
+            table[f"{side}_accuracy"].append(accuracy / count if count else 0.0)
+            table[f"{side}_match"].append(matches / count if count else 0.0)
+    return {"games": table, "moves": moves}
+
+# Column types: array typecodes, or 'str' for text
+COLUMN_TYPES = {
+    "games": {"key": 'str', "white": 'str', "black": 'str', "result": 'str', "plies": 'H',
+              "white_moves": 'H', "white_acpl": 'f', "white_accuracy": 'f', "white_match": 'f',
+              "black_moves": 'H', "black_acpl": 'f', "black_accuracy": 'f', "black_match": 'f'},
+    # eval is White's score after the move; accuracy is in hundredths of a percent
+    "moves": {"game": 'I', "ply": 'H', "move": 'H', "best": 'H', "eval": 'h', "cp_loss": 'H', "accuracy": 'H'},
+}
+
+def write_columns(path, tables):
+    """Write {table: {column: values}} as separately compressed columns, atomically"""
+    directory = {}
+    blobs = []
+    offset = 0
+    for table, columns in tables.items():
+        entry = directory[table] = {"rows": 0, "columns": {}}
+        for name, values in columns.items():
+            kind = COLUMN_TYPES[table][name]
+            raw = json.dumps(values).encode() if kind == 'str' else array.array(kind, values).tobytes()
+            blob = zlib.compress(raw, 6)
+            entry["rows"] = len(values)
+            entry["columns"][name] = {"type": kind, "offset": offset, "length": len(blob)}
+            blobs.append(blob)
+            offset += len(blob)
+    header = json.dumps(directory).encode()
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(COLUMNS_HEADER.pack(COLUMNS_MAGIC, len(header)))
+        f.write(header)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temp_path, path)
+
+def read_columns(path, table, names=None):
+    """{column: values} for `names` (default all) of `table`, reading only those columns"""
+    with open(path, 'rb') as f:
+        magic, header_length = COLUMNS_HEADER.unpack(f.read(COLUMNS_HEADER.size))
+        if magic != COLUMNS_MAGIC:
+            raise IOError(f"{path} is not an analysis file")
+        directory = json.loads(f.read(header_length))
+        base = COLUMNS_HEADER.size + header_length
+        columns = directory[table]["columns"]
+        result = {}
+        for name in names or columns:
+            column = columns[name]
+            f.seek(base + column["offset"])
+            raw = zlib.decompress(f.read(column["length"]))
+            if column["type"] == 'str':
+                result[name] = json.loads(raw)
+            else:
+                result[name] = array.array(column["type"])
+                result[name].frombytes(raw)
+        return result
+
+class Pipeline:
+    """Evaluate and score a set of games into `out_dir`.
+
+    `evaluate` maps an iterable of (hash, FEN) tasks to an iterable of
+    (hash, cp, best move code, depth) results in any order. Evaluations
+    already in the checkpoint are not redone.
+    """
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        os.makedirs(out_dir, exist_ok=True)
+        self.checkpoint_path = os.path.join(out_dir, 'evals.ckpt')
+        self.output_path = os.path.join(out_dir, 'analysis.col')
+        self.total = 0
+        self.done = 0
+        self.reused = 0
+
+    def run(self, games, evaluate, stop=None, progress=None):
+        """Returns the output path, or None if `stop` was set first"""
+        checkpoint = Checkpoint(self.checkpoint_path)
+        try:
+            unique = positions(games)
+            self.total = len(unique)
+            tasks = []
+            for key, fen in unique.items():
+                if key in checkpoint.evals:
+                    continue
+                terminal = terminal_eval(chess.Board(fen))
+                if terminal:
+                    checkpoint.add(key, *terminal, 0)
+                else:
+                    tasks.append((key, fen))
+            self.reused = self.done = self.total - len(tasks)
+
+            for key, cp, best, depth in evaluate(tasks):
+                checkpoint.add(key, cp, best, depth)
+                self.done += 1
+                if progress:
+                    progress(self.done, self.total)
+                if stop is not None and stop.is_set():
+                    return None
+            checkpoint.flush()
+            write_columns(self.output_path, score_games(games, checkpoint.evals))
+            return self.output_path
+        finally:
+            checkpoint.close()
+
+    def status(self):
+        return {"positions": self.total, "evaluated": self.done, "from_checkpoint": self.reused}
+
+class AnalysisJob:
+    """Pipeline run on a background thread, for the server's admin API.
+
+    `load` returns the games to score; it is called on the job's thread,
+    so reading a large archive doesn't hold up the request that starts it.
+    """
+    def __init__(self, load, out_dir, evaluate):
+        self.pipeline = Pipeline(out_dir)
+        self.load = load
+        self.games = None
+        self.evaluate = evaluate
+        self.state = 'running'
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self._stop = Event()
+        self._thread = Thread(target=self._run, name='game-analysis', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            self.games = self.load()
+            output = self.pipeline.run(self.games, self.evaluate, stop=self._stop)
+            self.state = 'finished' if output else 'cancelled'
+        except Exception as e:
+            self.state = 'failed'
+            self.error = str(e)
+        self.finished = time.time()
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def cancel(self):
+        self._stop.set()
+
+    def status(self):
+        return {
+            "state": self.state,
+            "games": len(self.games) if self.games is not None else None,  # None while loading
+            **self.pipeline.status(),
+            "started": self.started,
+            "finished": self.finished,
+            "output": self.pipeline.output_path,
+            "error": self.error,
+        }
+
+# Per-worker engine and search time for the CLI's process pool
+_engine = None
+_movetime = None
+
+def _init_worker(engine_path, movetime):
+    global _engine, _movetime
+    _engine = chess.engine.SimpleEngine.popen_uci(engine_path)
+    _movetime = movetime
+    multiprocessing.util.Finalize(None, _engine.quit, exitpriority=10)
+
+def _evaluate_task(task):
+    key, fen = task
+    info = _engine.analyse(chess.Board(fen), chess.engine.Limit(time=_movetime))
+    return (key, *eval_from_info(info))
+
+def pool_evaluator(engine_path, movetime, workers):
+    """An `evaluate` for Pipeline.run that spreads positions over a process pool"""
+    def evaluate(tasks):
+        if not tasks:
+            return
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(engine_path, movetime)) as pool:
+            yield from pool.imap_unordered(_evaluate_task, tasks, chunksize=4)
+    return evaluate
+
+def _player_rows(path):
+    columns = read_columns(path, 'games', ["white", "black", "white_moves", "black_moves", "white_acpl",
+                                           "black_acpl", "white_accuracy", "black_accuracy",
+                                           "white_match", "black_match"])
+    players = {}
+    for side in ("white", "black"):
+        for i, name in enumerate(columns[side]):
+            count = columns[f"{side}_moves"][i]
+            if not count:
+                continue
+            row = players.setdefault(name, [0, 0, 0.0, 0.0, 0.0])
+            row[0] += 1
+            row[1] += count
+            row[2] += columns[f"{side}_acpl"][i] * count
+            row[3] += columns[f"{side}_accuracy"][i] * count
+            row[4] += columns[f"{side}_match"][i] * count
+    return players
+
+def main():
+    parser = argparse.ArgumentParser(description="Move accuracy and engine-match analysis of finished games")
+    parser.add_argument('--out', default=os.environ.get('GAME_ANALYSIS_DIR') or os.path.join('games', 'analysis'),
+                        help="checkpoint and output directory (default games/analysis)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_command = commands.add_parser('run', help="analyse games, resuming from the checkpoint")
+    run_command.add_argument('--pgn', nargs='*', help="PGN files or globs (default games/*.pgn)")
+    run_command.add_argument('--archive', help="read games from this archive directory instead")
+    run_command.add_argument('--movetime', type=float, default=0.1, help="engine seconds per position (default 0.1)")
+    run_command.add_argument('--workers', type=int, default=os.cpu_count(), help="engine processes (default: all cores)")
+    run_command.add_argument('--engine', help="UCI engine (default: the server's Stockfish)")
+    commands.add_parser('players', help="accuracy, ACPL and engine-match rate per player")
+    anomalies_command = commands.add_parser('anomalies', help="sides of games that played like an engine")
+    anomalies_command.add_argument('--min-moves', type=int, default=20)
+    anomalies_command.add_argument('--min-match', type=float, default=0.9, help="engine-match rate (default 0.9)")
+    anomalies_command.add_argument('--max-acpl', type=float, default=15.0)
+    game_command = commands.add_parser('game', help="per-move breakdown of one game")
+    game_command.add_argument('key')
+    args = parser.parse_args()
+    output_path = os.path.join(args.out, 'analysis.col')
+
+    if args.command == 'run':
+        if args.archive:
+            games = load_archive_games(args.archive)
+        else:
+            games = load_pgn_games(args.pgn or [os.path.join('games', '*.pgn')])
+        engine_path = args.engine
+        if not engine_path:
+            import backend
+            engine_path = backend.STOCKFISH_PATH
+        pipeline = Pipeline(args.out)
+        started = time.monotonic()
+        step = [0]
+
+        def progress(done, total):
+            if done * 20 // total > step[0] or done == total:
+                step[0] = done * 20 // total
+                elapsed = time.monotonic() - started
+                print(f"   {done}/{total} positions, {(done - pipeline.reused) / elapsed:.1f}/s")
+
+        print(f"🔬 Analysing {len(games)} games with {engine_path}, {args.workers} worker(s), {args.movetime}s/position")
+        pipeline.run(games, pool_evaluator(engine_path, args.movetime, args.workers), progress=progress)
+        status = pipeline.status()
+        plies = sum(len(game["moves"]) + 1 for game in games)
+        print(f"✅ {status['positions']} unique positions out of {plies} ({status['from_checkpoint']} from the checkpoint) "
+              f"in {time.monotonic() - started:.1f}s")
+        print(f"📝 Results written to {pipeline.output_path}")
+    elif args.command == 'players':
+        players = _player_rows(output_path)
+        print(f"   {'player':<24}{'games':>7}{'moves':>7}{'ACPL':>7}{'accuracy':>10}{'match':>8}")
+        for name, (count, moves, acpl, accuracy, match) in sorted(players.items(), key=lambda item: -item[1][1]):
+            print(f"   {name:<24}{count:>7}{moves:>7}{acpl / moves:>7.1f}{accuracy / moves:>9.1f}%{match / moves:>8.0%}")
+    elif args.command == 'anomalies':
+        columns = read_columns(output_path, 'games')
+        flagged = []
+        for side in ("white", "black"):
+            for i in range(len(columns["key"])):
+                if (columns[f"{side}_moves"][i] >= args.min_moves and columns[f"{side}_match"][i] >= args.min_match
+                        and columns[f"{side}_acpl"][i] <= args.max_acpl):
+                    flagged.append((columns[f"{side}_match"][i], columns["key"][i], side, columns[side][i],
+                                    columns[f"{side}_moves"][i], columns[f"{side}_acpl"][i]))
+        print(f"🚩 {len(flagged)} side(s) with ≥{args.min_match:.0%} engine match, ACPL ≤ {args.max_acpl}")
+        for match, key, side, name, moves, acpl in sorted(flagged, reverse=True):
+            print(f"   {key:<40}{side:<6}{name:<20}{moves:>4} moves{acpl:>7.1f} ACPL{match:>6.0%} match")
+    elif args.command == 'game':
+        keys = read_columns(output_path, 'games', ["key"])["key"]
+        if args.key not in keys:
+            parser.error(f"no analysed game {args.key!r}")
+        number = keys.index(args.key)
+        moves = read_columns(output_path, 'moves')
+        # Rows are in game order, so one game's moves are a contiguous slice
+        first, last = bisect.bisect_left(moves["game"], number), bisect.bisect_right(moves["game"], number)
+        print(f"   {'ply':>4} {'move':<7}{'best':<7}{'eval':>7}{'loss':>6}{'accuracy':>10}")
+        for i in range(first, last):
+            best = decode_move(moves["best"][i]).uci() if moves["best"][i] else '-'
+            print(f"   {moves['ply'][i] + 1:>4} {decode_move(moves['move'][i]).uci():<7}{best:<7}"
+                  f"{moves['eval'][i]:>7}{moves['cp_loss'][i]:>6}{moves['accuracy'][i] / 100:>9.1f}%")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Aggregate statistics over finished games, updated as each game ends.
+
+Every finished game adds to a handful of counters keyed by game type, ELO
+band, result and opening prefix, so "win rate by ELO band against the
+computer", "most common openings" or "average game length" never replay
+stored games. The counters are snapshotted to a JSON file and reloaded on
+start, so they survive restarts.
+"""
+import heapq
+import json
+import os
+import time
+from threading import Lock
+
+RESULTS = ('1-0', '1/2-1/2', '0-1')
+
+class GameStats:
+    """Counters over finished games; record() is O(1), summary() is O(keys)"""
+    def __init__(self, elo_band=200, opening_plies=4, top_openings=20):
+        self.elo_band = elo_band
+        self.opening_plies = opening_plies
+        self.top_openings = top_openings
+        self._lock = Lock()
+        self._version = 0
+        self._saved_version = 0
+        self._summary = None
+        self._summary_version = -1
+        self.since = time.time()
+        self.games = {}  # (game type, ELO band or None, result) -> [games, plies]
+        self.openings = {}  # first plies as UCI -> [white wins, draws, black wins]
+        self.terminations = {}
+
+    def band(self, elo_rating):
+        low = elo_rating // self.elo_band * self.elo_band
+        return f"{low}-{low + self.elo_band - 1}"
+
+    def record(self, game_type, elo_rating, result, moves, termination):
+        """Count one finished game; `elo_rating` is None for games without a computer"""
+        if result not in RESULTS:
+            return
+        band = self.band(elo_rating) if elo_rating is not None else None
+        opening = ' '.join(moves[:self.opening_plies])
+        with self._lock:
+            counts = self.games.setdefault((game_type, band, result), [0, 0])
+            counts[0] += 1
+            counts[1] += len(moves)
+            if opening:
+                self.openings.setdefault(opening, [0, 0, 0])[RESULTS.index(result)] += 1
+            self.terminations[termination] = self.terminations.get(termination, 0) + 1
+            self._version += 1
+
+    def summary(self):
+        """Totals, per-type and per-band breakdowns and the most played openings; cached until the next game"""
+        with self._lock:
+            if self._summary_version == self._version:
+                return self._summary
+            version = self._version
+            games = {key: list(counts) for key, counts in self.games.items()}
+            openings = heapq.nlargest(self.top_openings, self.openings.items(), key=lambda item: sum(item[1]))
+            terminations = dict(self.terminations)
+
+        def bucket():
+            return {"games": 0, "plies": 0, "results": dict.fromkeys(RESULTS, 0)}
+
+        total = bucket()
+        by_type = {}
+        by_band = {}
+        for (game_type, band, result), (count, plies) in games.items():
+            buckets = [total, by_type.setdefault(game_type, bucket())]
+            if band is not None:
+                buckets.append(by_band.setdefault(band, bucket()))
+            for entry in buckets:
+                entry["games"] += count
+                entry["plies"] += plies
+                entry["results"][result] += count
+
+        def finish(entry):
+            games, results = entry["games"], entry["results"]
+            entry["average_plies"] = round(entry.pop("plies") / games, 1) if games else 0.0
+            # White's score: wins plus half the draws. vs_computer players are White
+            entry["white_score"] = round((results['1-0'] + results['1/2-1/2'] / 2) / games, 3) if games else 0.0
+            return entry
+
+        summary = {
+            "since": self.since,
+            **finish(total),
+            "terminations": terminations,
+            "by_type": {game_type: finish(entry) for game_type, entry in sorted(by_type.items())},
+            "vs_computer_by_elo": {band: finish(by_band[band])
+                                   for band in sorted(by_band, key=lambda band: int(band.split('-')[0]))},
+            "openings": [{"moves": moves, "games": sum(counts), **dict(zip(RESULTS, counts))}
+                         for moves, counts in openings],
+        }
+        with self._lock:
+            if version >= self._summary_version:
+                self._summary, self._summary_version = summary, version
+        return summary
+
+    @property
+    def dirty(self):
+        return self._version != self._saved_version
+
+    def save(self, path):
+        """Write the counters to `path` atomically"""
+        with self._lock:
+            version = self._version
+            data = {
+                "since": self.since,
+                "elo_band": self.elo_band,
+                "opening_plies": self.opening_plies,
+                "games": [[game_type, band, result, *counts] for (game_type, band, result), counts in self.games.items()],
+                "openings": self.openings,
+                "terminations": self.terminations,
+            }
+            data = json.dumps(data, separators=(',', ':'))
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._saved_version = version
+
+    def load(self, path):
+        """Add the counters saved at `path`; returns False if there is no snapshot or it doesn't fit this bucketing"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        if data["elo_band"] != self.elo_band or data["opening_plies"] != self.opening_plies:
+            return False
+        with self._lock:
+            self.since = min(self.since, data["since"])
+            for game_type, band, result, count, plies in data["games"]:
+                counts = self.games.setdefault((game_type, band, result), [0, 0])
+                counts[0] += count
+                counts[1] += plies
+            for opening, counts in data["openings"].items():
+                merged = self.openings.setdefault(opening, [0, 0, 0])
+                for index, count in enumerate(counts):
+                    merged[index] += count
+            for termination, count in data["terminations"].items():
+                self.terminations[termination] = self.terminations.get(termination, 0) + count
+            self._version += 1
+            self._saved_version = self._version
+        return True
@@ -0,0 +1,302 @@
+"""In-process chess engine for low-ELO computer opponents.
+
+A shallow alpha-beta search over material and piece-square tables, with
+score noise and occasional random moves scaled to a rating band. It mimics
+the parts of chess.engine.SimpleEngine that ChessGame uses, so a game can
+hold either engine.
+"""
+import random
+import time
+
+import chess
+import chess.engine
+
+MATE_SCORE = 100000
+
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 0,
+}
+
+# Piece-square tables from White's point of view, indexed by python-chess
+# square (a1=0 ... h8=63) - so the first row listed is rank 1
+PIECE_SQUARE_TABLES = {
+    chess.PAWN: [
+          0,   0,   0,   0,   0,   0,   0,   0,
+          5,  10,  10, -20, -20,  10,  10,   5,
+          5,  -5, -10,   0,   0, -10,  -5,   5,
+          0,   0,   0,  20,  20,   0,   0,   0,
+          5,   5,  10,  25,  25,  10,   5,   5,
+         10,  10,  20,  30,  30,  20,  10,  10,
+         50,  50,  50,  50,  50,  50,  50,  50,
+          0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    chess.KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20,   0,   5,   5,   0, -20, -40,
+        -30,   5,  10,  15,  15,  10,   5, -30,
+        -30,   0,  15,  20,  20,  15,   0, -30,
+        -30,   5,  15,  20,  20,  15,   5, -30,
+        -30,   0,  10,  15,  15,  10,   0, -30,
+        -40, -20,   0,   0,   0,   0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    chess.BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10,   5,   0,   0,   0,   0,   5, -10,
+        -10,  10,  10,  10,  10,  10,  10, -10,
+        -10,   0,  10,  10,  10,  10,   0, -10,
+        -10,   5,   5,  10,  10,   5,   5, -10,
+        -10,   0,   5,  10,  10,   5,   0, -10,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    chess.ROOK: [
+          0,   0,   0,   5,   5,   0,   0,   0,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+         -5,   0,   0,   0,   0,   0,   0,  -5,
+          5,  10,  10,  10,  10,  10,  10,   5,
+          0,   0,   0,   0,   0,   0,   0,   0,
+    ],
+    chess.QUEEN: [
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+        -10,   0,   5,   0,   0,   0,   0, -10,
+        -10,   5,   5,   5,   5,   5,   0, -10,
+          0,   0,   5,   5,   5,   5,   0,  -5,
+         -5,   0,   5,   5,   5,   5,   0,  -5,
+        -10,   0,   5,   5,   5,   5,   0, -10,
+        -10,   0,   0,   0,   0,   0,   0, -10,
+        -20, -10, -10,  -5,  -5, -10, -10, -20,
+    ],
+    chess.KING: [
+         20,  30,  10,   0,   0,  10,  30,  20,
+         20,  20,   0,   0,   0,   0,  20,  20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+    ],
+}
+
+# (highest ELO, search depth in plies, chance of a random move, score noise in centipawns)
+RATING_BANDS = [
+    (900, 1, 0.25, 120),
+    (1100, 2, 0.12, 60),
+    (1300, 2, 0.06, 30),
+    (1500, 3, 0.03, 15),
+]
+
+QUIESCENCE_DEPTH = 2  # capture plies searched past the nominal depth
+
+class SearchTimeout(Exception):
+    pass
+
+def _piece_score(piece_type, color, square):
+    """Material plus placement for one piece, positive for White"""
+    if color == chess.WHITE:
+        return PIECE_VALUES[piece_type] + PIECE_SQUARE_TABLES[piece_type][square]
+    return -PIECE_VALUES[piece_type] - PIECE_SQUARE_TABLES[piece_type][chess.square_mirror(square)]
+
+def evaluate(board):
+    """Static score in centipawns from White's point of view"""
+    score = 0
+    for piece_type in PIECE_VALUES:
+        for color in chess.COLORS:
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                score += _piece_score(piece_type, color, square)
+    return score
+
+def move_delta(board, move):
+    """Change in evaluate() that playing `move` on `board` causes.
+    
+    Lets the search update the score per move instead of rescanning the board.
+    """
+    color = board.turn
+    if board.is_castling(move):
+        rank = chess.square_rank(move.from_square)
+        kingside = board.is_kingside_castling(move)
+        # Chess960 castling is encoded as king-takes-rook, standard castling as the king's move
+        rook_from = move.to_square if board.chess960 else chess.square(7 if kingside else 0, rank)
+        king_to = chess.square(6 if kingside else 2, rank)
+        rook_to = chess.square(5 if kingside else 3, rank)
+        return (_piece_score(chess.KING, color, king_to) - _piece_score(chess.KING, color, move.from_square)
+                + _piece_score(chess.ROOK, color, rook_to) - _piece_score(chess.ROOK, color, rook_from))
+    
+    piece_type = board.piece_type_at(move.from_square)
+    delta = (_piece_score(move.promotion or piece_type, color, move.to_square)
+             - _piece_score(piece_type, color, move.from_square))
+    if board.is_en_passant(move):
+        captured_square = chess.square(chess.square_file(move.to_square), chess.square_rank(move.from_square))
+        delta -= _piece_score(chess.PAWN, not color, captured_square)
+    else:
+        captured = board.piece_type_at(move.to_square)
+        if captured:
+            delta -= _piece_score(captured, not color, move.to_square)
+    return delta
+
+def _ordered_moves(board, captures_only=False):
+    """Legal moves with captures first, most valuable victim / least valuable attacker"""
+    scored = []
+    for move in (board.generate_legal_captures() if captures_only else board.legal_moves):
+        if board.is_capture(move):
+            victim = board.piece_type_at(move.to_square) or chess.PAWN  # en passant
+            attacker = board.piece_type_at(move.from_square)
+            scored.append((PIECE_VALUES[victim] * 10 - PIECE_VALUES[attacker], move))
+        else:
+            scored.append((800 if move.promotion else -10000, move))
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return [move for _, move in scored]
+
+class LiteEngine:
+    """Alpha-beta engine playing at roughly `elo_rating` strength.
+    
+    Supports configure(), play() and quit() like SimpleEngine; there is no
+    analysis(), so games using it don't ponder.
+    """
+    def __init__(self, elo_rating, seed=None):
+        self.elo_rating = elo_rating
+        self.depth, self.blunder_chance, self.noise = self._band(elo_rating)
+        self.random = random.Random(seed)
+        self.nodes = 0
+        self._deadline = None
+    
+    @staticmethod
+    def _band(elo_rating):
+        for max_elo, depth, blunder_chance, noise in RATING_BANDS:
+            if elo_rating <= max_elo:
+                return depth, blunder_chance, noise
+        _, depth, blunder_chance, noise = RATING_BANDS[-1]
+        return depth, blunder_chance, noise
+    
+    def configure(self, options):
+        """Accepts {"UCI_Elo": n} to change the rating band; other options are ignored"""
+        if "UCI_Elo" in options:
+            self.elo_rating = int(options["UCI_Elo"])
+            self.depth, self.blunder_chance, self.noise = self._band(self.elo_rating)
+    
+    def play(self, board, limit, **kwargs):
+        """Pick a move for `board`, returned as a chess.engine.PlayResult.
+        
+        limit.depth caps the band's depth and limit.time bounds the search;
+        extra SimpleEngine keyword arguments (game=, ...) are ignored.
+        """
+        started = time.monotonic()
+        self.nodes = 0
+        board = board.copy()
+        depth = min(self.depth, limit.depth) if limit.depth else self.depth
+        self._deadline = started + limit.time if limit.time else None
+        
+        root_moves = _ordered_moves(board)
+        if not root_moves:
+            raise chess.engine.EngineError(f"no legal moves in {board.fen()}")
+        
+        scores = {move: 0 for move in root_moves}
+        completed = 0
+        try:
+            for current_depth in range(1, depth + 1):
+                iteration = self._search_root(board, root_moves, current_depth)
+                scores, completed = iteration, current_depth
+                root_moves.sort(key=lambda move: scores[move], reverse=True)
+        except SearchTimeout:
+            pass  # keep the last completed iteration
+        
+        if self.random.random() < self.blunder_chance:
+            move = self.random.choice(root_moves)
+        else:
+            move = max(root_moves, key=lambda move: scores[move] + self.random.gauss(0, self.noise))
+        info = {
+            "depth": completed,
+            "nodes": self.nodes,
+            "time": time.monotonic() - started,
+            "score": chess.engine.PovScore(chess.engine.Cp(scores[move]), board.turn),
+        }
+        return chess.engine.PlayResult(move, None, info)
+    
+    def quit(self):
+        pass
+    
+    def _search_root(self, board, root_moves, depth):
+        """Score every root move.
+        
+        Moves are searched with alpha trailing the best score by a few noise
+        widths: anything worse can never win the noisy pick, so it only gets
+        an upper bound and its subtree is cut early.
+        """
+        scores = {}
+        best = -MATE_SCORE - 1
+        score = evaluate(board)
+        for move in root_moves:
+            alpha = max(-MATE_SCORE - 1, best - 4 * self.noise - 1)
+            child_score = score + move_delta(board, move)
+            board.push(move)
+            try:
+                scores[move] = -self._negamax(board, child_score, depth - 1, -MATE_SCORE - 1, -alpha, 1)
+            finally:
+                board.pop()
+            best = max(best, scores[move])
+        return scores
+    
+    def _check_time(self):
+        self.nodes += 1
+        if self._deadline is not None and self.nodes % 256 == 0 and time.monotonic() > self._deadline:
+            raise SearchTimeout()
+    
+    def _negamax(self, board, score, depth, alpha, beta, ply):
+        """Negamax with alpha-beta; `score` is evaluate(board), kept up to date by move_delta()"""
+        self._check_time()
+        if depth <= 0:
+            return self._quiescence(board, score, alpha, beta, ply, QUIESCENCE_DEPTH)
+        if board.is_insufficient_material() or board.halfmove_clock >= 100 or board.is_repetition(2):
+            return 0
+        
+        moves = _ordered_moves(board)
+        if not moves:
+            return -MATE_SCORE + ply if board.is_check() else 0
+        for move in moves:
+            child_score = score + move_delta(board, move)
+            board.push(move)
+            try:
+                value = -self._negamax(board, child_score, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.pop()
+            if value >= beta:
+                return value
+            alpha = max(alpha, value)
+        return alpha
+    
+    def _quiescence(self, board, score, alpha, beta, ply, depth):
+        """Resolve captures so the static eval isn't taken mid-exchange"""
+        self._check_time()
+        stand_pat = score if board.turn == chess.WHITE else -score
+        if board.is_check():
+            # No standing pat in check - every evasion is searched, and none means mate
+            moves = _ordered_moves(board)
+            if not moves:
+                return -MATE_SCORE + ply
+            if depth == 0:
+                return stand_pat
+        else:
+            if depth == 0 or stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            moves = _ordered_moves(board, captures_only=True)
+        for move in moves:
+            child_score = score + move_delta(board, move)
+            board.push(move)
+            try:
+                value = -self._quiescence(board, child_score, -beta, -alpha, ply + 1, depth - 1)
+            finally:
+                board.pop()
+            if value >= beta:
+                return value
+            alpha = max(alpha, value)
+        return alpha
@@ -0,0 +1,175 @@
+"""
+Multiplexed game subscriptions: one socket follows many games.
+
+A socket subscribes to a list of game ids, a filter over games
+({"type": "vs_computer", "min_elo": 2000}), or both. Events aren't sent as
+they happen. publish() folds each one into a per-game entry for the current
+tick. Every tick, flush() builds one `game_batch` frame per subscribed
+socket holding every game that changed. A game with several events in a
+tick appears once, with its latest state, the moves played since the last
+frame and the ply count (not the whole move history). A socket following hundreds of games costs one frame per
+tick rather than one per event per game.
+"""
+from threading import Lock
+
+GAME_TYPES = ('multiplayer', 'vs_computer')
+
+class GameFilter:
+    """Which games a filter subscription follows, by type and rating"""
+    def __init__(self, game_type=None, min_elo=None, max_elo=None):
+        if game_type is not None and game_type not in GAME_TYPES:
+            raise ValueError(f"Unknown game type: {game_type}")
+        for bound in (min_elo, max_elo):
+            if bound is not None and not isinstance(bound, int):
+                raise ValueError("min_elo and max_elo must be integers")
+        self.game_type = game_type
+        self.min_elo = min_elo
+        self.max_elo = max_elo
+        self.key = (game_type, min_elo, max_elo)
+
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - {'type', 'min_elo', 'max_elo'}
+        if unknown:
+            raise ValueError(f"Unknown filter fields: {', '.join(sorted(unknown))}")
+        return cls(data.get('type'), data.get('min_elo'), data.get('max_elo'))
+
+    def to_dict(self):
+        return {"type": self.game_type, "min_elo": self.min_elo, "max_elo": self.max_elo}
+
+    def matches(self, tags):
+        """`tags` is {"type", "elo"}; games without a rating never match an ELO bound"""
+        if self.game_type is not None and tags["type"] != self.game_type:
+            return False
+        elo = tags["elo"]
+        if self.min_elo is not None and (elo is None or elo < self.min_elo):
+            return False
+        if self.max_elo is not None and (elo is None or elo > self.max_elo):
+            return False
+        return True
+
+class SubscriptionHub:
+    def __init__(self, max_games=1000):
+        self.max_games = max_games  # explicit game ids per socket
+        self._lock = Lock()
+        self._games = {}  # sid -> game ids
+        self._subscribers = {}  # game id -> sids
+        self._filters = {}  # sid -> GameFilter
+        self._filter_groups = {}  # filter key -> (GameFilter, sids), so each filter is evaluated once per game
+        self._pending = {}  # game id -> entry for the current tick
+        self.ticks = 0
+        self.frames = 0
+        self.events = 0
+
+    @property
+    def active(self):
+        return bool(self._games or self._filters)
+
+    def subscribe(self, sid, game_ids=(), game_filter=None):
+        """Add game ids and/or replace the socket's filter"""
+        with self._lock:
+            followed = self._games.get(sid, set())
+            added = set(game_ids) - followed
+            if len(followed) + len(added) > self.max_games:
+                raise ValueError(f"At most {self.max_games} games per socket")
+            if added:
+                self._games[sid] = followed | added
+                for game_id in added:
+                    self._subscribers.setdefault(game_id, set()).add(sid)
+            if game_filter is not None:
+                self._remove_filter(sid)
+                self._filters[sid] = game_filter
+                self._filter_groups.setdefault(game_filter.key, (game_filter, set()))[1].add(sid)
+
+    def unsubscribe(self, sid, game_ids=(), game_filter=False):
+        """Stop following `game_ids`, and the filter if `game_filter`"""
+        with self._lock:
+            followed = self._games.get(sid, set())
+            for game_id in set(game_ids) & followed:
+                followed.discard(game_id)
+                subscribers = self._subscribers[game_id]
+                subscribers.discard(sid)
+                if not subscribers:
+                    del self._subscribers[game_id]
+            if not followed:
+                self._games.pop(sid, None)
+            if game_filter:
+                self._remove_filter(sid)
+
+    def drop(self, sid):
+        """Forget a disconnected socket"""
+        with self._lock:
+            for game_id in self._games.pop(sid, ()):
+                subscribers = self._subscribers[game_id]
+                subscribers.discard(sid)
+                if not subscribers:
+                    del self._subscribers[game_id]
+            self._remove_filter(sid)
+
+    def _remove_filter(self, sid):
+        game_filter = self._filters.pop(sid, None)
+        if game_filter is not None:
+            sids = self._filter_groups[game_filter.key][1]
+            sids.discard(sid)
+            if not sids:
+                del self._filter_groups[game_filter.key]
+
+    def publish(self, game_id, event, payload, tags):
+        """Fold one numbered game event (payload carries `seq`) into this tick's entry for the game"""
+        with self._lock:
+            if game_id not in self._subscribers and not self._filter_groups:
+                return
+            self.events += 1
+            moves = payload.get("moves", ())
+            entry = self._pending.get(game_id)
+            if entry is None:
+                self._pending[game_id] = {"tags": tags, "event": event, "from_seq": payload["seq"],
+                                          "moves": list(moves), "state": payload,
+                                          "ply": len(payload.get("move_history", ()))}
+            else:
+                entry["event"] = event
+                entry["moves"].extend(moves)
+                entry["state"] = payload
+                entry["ply"] = len(payload.get("move_history", ()))
+
+    def flush(self):
+        """End the tick: [(sid, frame)] with one frame per socket that has something to see"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if not pending:
+                return []
+            self.ticks += 1
+            tick = self.ticks
+            updates = {}
+            for game_id, entry in pending.items():
+                # Like binary move_made events, updates carry the moves since the
+                # last frame and the ply count rather than the whole history
+                update = {key: value for key, value in entry["state"].items() if key != "move_history"}
+                update.update(game_id=game_id, event=entry["event"], from_seq=entry["from_seq"],
+                              moves=entry["moves"], ply=entry["ply"])
+                sids = set(self._subscribers.get(game_id, ()))
+                if entry["tags"] is not None:
+                    for game_filter, filter_sids in self._filter_groups.values():
+                        if game_filter.matches(entry["tags"]):
+                            sids |= filter_sids
+                for sid in sids:
+                    updates.setdefault(sid, []).append(update)
+            self.frames += len(updates)
+        return [(sid, {"tick": tick, "games": games}) for sid, games in updates.items()]
+
+    def subscription(self, sid):
+        """What a socket follows: {"games": count of game ids, "filter"}"""
+        with self._lock:
+            game_filter = self._filters.get(sid)
+            return {"games": len(self._games.get(sid, ())), "filter": game_filter.to_dict() if game_filter else None}
+
+    def status(self):
+        with self._lock:
+            return {
+                "sockets": len(set(self._games) | set(self._filters)),
+                "games": len(self._subscribers),
+                "filters": len(self._filter_groups),
+                "ticks": self.ticks,
+                "events": self.events,
+                "frames": self.frames,
+            }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Engine admission tests - in-process against fake_uci_engine.py, no server or Stockfish needed
+"""
+import os
+import sys
+import time
+from threading import Thread
+
+import backend
+
+FAKE_ENGINE = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_uci_engine.py')]
+
+def test_token_bucket():
+    print("\n1. Token buckets refill at their rate up to their capacity...")
+    bucket = backend.TokenBucket(rate=2, capacity=3)
+    now = bucket.updated
+    for _ in range(3):
+        assert bucket.wait_time(now) == 0
+        bucket.take()
+    assert bucket.wait_time(now) == 0.5
+    assert bucket.wait_time(now + 0.5) == 0
+    assert bucket.wait_time(now + 60) == 0 and bucket.tokens == 3
+    assert backend.TokenBucket(rate=0, capacity=0).wait_time(now) == float('inf')
+    print("✅ Refill, cap and wait time")
+
+def test_shedding():
+    print("\n2. Requests over the client rate or the queue limit are shed...")
+    admission = backend.EngineAdmission(max_concurrent=1, queue_limit=1)
+    for _ in range(backend.ENGINE_CLIENT_BURST):
+        admission.admit('greedy', 'g1').release()
+    try:
+        admission.admit('greedy', 'g1')
+        assert False, "client burst exceeded"
+    except backend.EngineBusy as e:
+        assert e.reason == 'rate_limited' and e.retry_after >= 1
+
+    ticket = admission.admit('polite', 'g2')
+    queued = Thread(target=lambda: admission.admit('patient', 'g3').release())
+    queued.start()
+    while admission.snapshot()["queue_depth"] < 1:
+        time.sleep(0.001)
+    try:
+        admission.admit('other', 'g4')
+        assert False, "queue is full"
+    except backend.EngineBusy as e:
+        assert e.reason == 'queue_full'
+    ticket.release()
+    queued.join()
+    batch = admission.admit('greedy', 'g1', 'batch')  # background jobs skip the rate limits
+    batch.release()
+    assert admission.snapshot()["shed_rate_limited"] == 1 and admission.snapshot()["shed_queue_full"] == 1
+    print("✅ rate_limited and queue_full, with Retry-After")
+
+def test_rejected_moves_are_free():
+    print("\n3. Illegal and out-of-turn moves never reach admission...")
+    original = backend.engine_pool, backend.engine_admission
+    backend.engine_pool = backend.EnginePool(path=FAKE_ENGINE, size=0)
+    backend.engine_admission = backend.EngineAdmission(max_concurrent=1)
+    game = backend.ChessGame('admission-game', 'vs_computer', 2000)
+    try:
+        assert game.uses_stockfish
+        game.add_player('alice', 'white')
+        with backend.games_lock:
+            backend.games[game.game_id] = game
+        for move in ['e2e5', 'e7e5', 'zz'] * 5:
+            result, status = backend.process_move(game.game_id, move, 'alice', 'alice')
+            assert status == 200 and not result["success"]
+        assert backend.engine_admission.snapshot()["admitted"] == 0
+        assert 'alice' not in backend.engine_admission._client_buckets
+
+        result, status = backend.process_move(game.game_id, 'e2e4', 'alice', 'alice')
+        assert result["success"] and backend.engine_admission.snapshot()["admitted"] == 1
+        assert game.move_history == ['e2e4', 'a7a5']  # the fake engine's reply
+    finally:
+        with backend.games_lock:
+            backend.games.pop(game.game_id, None)
+        game.cleanup()
+        backend.engine_pool, backend.engine_admission = original
+    print("✅ Only the legal move took a token")
+
+def test_computer_turn_guard():
+    print("\n4. Nobody moves for the computer while it is thinking...")
+    game = backend.ChessGame('guard-game', 'vs_computer', 800)
+    try:
+        game.add_player('alice', 'white')
+        assert game.make_move('e2e4', 'alice')["success"]
+        for player_id in ('alice', None, 'stranger'):
+            assert game.make_move('e7e5', player_id)["error"] == "Not your turn"
+        assert game.play_computer_move('e7e5')["success"]
+        assert game.play_computer_move('g1f3')["error"] == "Not the computer's turn"
+        game.resign('alice')
+        assert game.make_move('g1f3', 'alice')["error"] == "Game is over"
+    finally:
+        game.cleanup()
+    print("✅ Black's moves only come from the engine")
+
+def test_one_ticket_per_search():
+    print("\n5. Each engine search is admitted on its own, charged to the connection...")
+    original = backend.engine_pool, backend.engine_admission
+    backend.engine_pool = backend.EnginePool(path=FAKE_ENGINE, size=0)
+    backend.engine_admission = backend.EngineAdmission(max_concurrent=1)
+    game = backend.ChessGame('premove-replies', 'vs_computer', 2000)
+    try:
+        game.add_player('alice', 'white')
+        with backend.games_lock:
+            backend.games[game.game_id] = game
+        game.queue_premoves('alice', ['a2a3', 'b2b3'])
+        result, status = backend.process_move(game.game_id, 'e2e4', 'alice', 'alice')
+        assert status == 200 and result["success"]
+        # e4 a5, a3 (premove) a4, b3 (premove) axb3: three searches, three tickets
+        assert game.move_history == ['e2e4', 'a7a5', 'a2a3', 'a5a4', 'b2b3', 'a4b3']
+        snapshot = backend.engine_admission.snapshot()
+        assert snapshot["admitted"] == 3 and snapshot["active"] == 0
+
+        client = backend.app.test_client()
+        for player_id in ('alice', 'mallory', None):
+            client.post(f'/api/game/{game.game_id}/move', json={"move": 'c2c3', "player_id": player_id})
+        assert set(backend.engine_admission._client_buckets) == {'alice', '127.0.0.1'}
+    finally:
+        with backend.games_lock:
+            backend.games.pop(game.game_id, None)
+        game.cleanup()
+        backend.engine_pool, backend.engine_admission = original
+    print("✅ One ticket per reply; the REST bucket is the address, not the player_id")
+
+def run_all_tests():
+    test_token_bucket()
+    test_shedding()
+    test_rejected_moves_are_free()
+    test_computer_turn_guard()
+    test_one_ticket_per_search()
+    print("\n🎉 Admission tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Game archive tests - writes a throwaway archive, no server needed
+"""
+import tempfile
+import threading
+
+import chess
+
+from archive import Archive
+
+SCHOLARS_MATE = ['e2e4', 'e7e5', 'f1c4', 'b8c6', 'd1h5', 'g8f6', 'h5f7']
+ITALIAN_DRAW = ['e2e4', 'e7e5', 'g1f3', 'b8c6', 'f1c4', 'f8c5']
+QUEENS_PAWN = ['d2d4', 'd7d5', 'c2c4']
+FROM_FEN = ('4k3/8/8/8/8/8/4P3/4K3 w - - 0 1', ['e2e4', 'e8d7'])
+
+def fill(archive):
+    archive.append({"White": "alice", "Black": "bob"}, SCHOLARS_MATE, '1-0')
+    archive.append({"White": "carol", "Black": "dave"}, ITALIAN_DRAW, '1/2-1/2')
+    assert archive.flush() == 2
+    archive.append({"White": "erin", "Black": "frank"}, QUEENS_PAWN, '0-1')
+    archive.append({"FEN": FROM_FEN[0], "SetUp": "1"}, FROM_FEN[1], '*')
+    assert archive.flush() == 2
+
+def test_round_trip():
+    print("\n1. Games come back as they were appended, after a reopen too...")
+    with tempfile.TemporaryDirectory() as directory:
+        archive = Archive(directory)
+        fill(archive)
+        assert archive.game_count == 4 and archive.run_count == 2
+        game = archive.get_game(0)
+        assert game["headers"] == {"White": "alice", "Black": "bob"}
+        assert game["moves"] == SCHOLARS_MATE and game["result"] == '1-0'
+        archive.close()
+
+        reopened = Archive(directory)
+        assert reopened.game_count == 4 and reopened.run_count == 2
+        assert reopened.append({}, ['g1f3'], '*') == 4
+        reopened.flush()
+        assert reopened.get_game(2)["moves"] == QUEENS_PAWN
+        assert reopened.get_game(3)["moves"] == FROM_FEN[1]
+        assert reopened.get_game(4)["moves"] == ['g1f3']
+        try:
+            reopened.get_game(5)
+            assert False, "game 5 doesn't exist"
+        except KeyError:
+            pass
+        reopened.close()
+    print("✅ Round trip and reopen")
+
+def test_position_queries():
+    print("\n2. Position and opening queries, from the start position on...")
+    with tempfile.TemporaryDirectory() as directory:
+        archive = Archive(directory)
+        fill(archive)
+        assert archive.games_reaching(chess.STARTING_FEN) == [0, 1, 2]
+        start = archive.opening_stats(chess.Board())
+        assert start["games"] == 3
+        assert [(row["san"], row["games"], row["white"], row["draws"], row["black"]) for row in start["moves"]] == \
+            [('e4', 2, 1, 1, 0), ('d4', 1, 0, 0, 1)]
+
+        board = chess.Board()
+        for move in ['e2e4', 'e7e5']:
+            board.push_uci(move)
+        assert archive.games_reaching(board) == [0, 1]
+        assert {row["san"] for row in archive.opening_stats(board)["moves"]} == {'Bc4', 'Nf3'}
+
+        # A game set up from a FEN is indexed from its own initial position
+        assert archive.games_reaching(FROM_FEN[0]) == [3]
+        assert archive.opening_stats(FROM_FEN[0])["moves"][0]["san"] == 'e4'
+
+        # The final position is indexed with no next move
+        mate = chess.Board()
+        for move in SCHOLARS_MATE:
+            mate.push_uci(move)
+        assert archive.games_reaching(mate) == [0]
+        assert archive.opening_stats(mate) == {"games": 1, "moves": []}
+        archive.close()
+    print("✅ Start, middle and final positions")
+
+def test_compact():
+    print("\n3. Compaction merges runs without changing answers...")
+    with tempfile.TemporaryDirectory() as directory:
+        archive = Archive(directory)
+        fill(archive)
+        before = archive.opening_stats(chess.Board())
+        positions = archive.stats()["indexed_positions"]
+        assert archive.compact() == 2
+        assert archive.run_count == 1 and archive.compact() == 0
+        assert archive.opening_stats(chess.Board()) == before
+        assert archive.stats()["indexed_positions"] == positions
+        archive.close()
+        assert Archive(directory).games_reaching(chess.STARTING_FEN) == [0, 1, 2]
+    print("✅ One run, same postings")
+
+def test_append_during_flush():
+    print("\n4. Appending doesn't wait for a flush to finish writing...")
+    with tempfile.TemporaryDirectory() as directory:
+        archive = Archive(directory)
+        for _ in range(2000):
+            archive.append({}, ITALIAN_DRAW, '1/2-1/2')
+        writing, release = threading.Event(), threading.Event()
+        encode = archive._encode_game
+        def slow_encode(*game):
+            writing.set()
+            release.wait(5)
+            return encode(*game)
+        archive._encode_game = slow_encode
+        flusher = threading.Thread(target=archive.flush)
+        flusher.start()
+        # The flush has taken its batch and is busy encoding it
+        writing.wait(5)
+        assert archive.append({}, QUEENS_PAWN, '0-1') == 2000
+        assert archive.games_reaching(chess.STARTING_FEN) == [] and archive.game_count == 0
+        release.set()
+        flusher.join()
+        assert archive.game_count == 2000 and archive.pending == 1
+        archive.flush()
+        assert archive.get_game(2000)["moves"] == QUEENS_PAWN
+        archive.close()
+    print("✅ Numbers stay in append order")
+
+def run_all_tests():
+    test_round_trip()
+    test_position_queries()
+    test_compact()
+    test_append_during_flush()
+    print("\n🎉 Archive tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Arena pairing and standings tests - in-process with the Socket.IO test client, no server needed
+"""
+import time
+
+import backend
+from arena import Arena
+
+def test_pairing_by_rating():
+    print("\n1. Players are paired with the closest rating, never straight back into a rematch...")
+    arena = Arena('pairing', minutes=10)
+    for player_id, rating in [('a', 1200), ('b', 2000), ('c', 1250), ('d', 1950)]:
+        arena.join(player_id, rating)
+    pairings = arena.start()
+    assert sorted(sorted([p.white, p.black]) for p in pairings) == [['a', 'c'], ['b', 'd']]
+
+    first = next(p for p in pairings if 'a' in (p.white, p.black))
+    assert arena.game_finished(first.game_id, '1-0') == []  # a and c only have each other
+    assert arena.waiting == 2
+    second = next(p for p in pairings if 'b' in (p.white, p.black))
+    rematches = arena.game_finished(second.game_id, '1/2-1/2')
+    assert len(rematches) == 2 and all({p.white, p.black} not in ({'a', 'c'}, {'b', 'd'}) for p in rematches)
+    print(f"   Round 2: {[(p.white, p.black) for p in rematches]}")
+    print("✅ Closest rating, no immediate rematch")
+
+def test_standings():
+    print("\n2. Standings update with each result...")
+    arena = Arena('standings', minutes=10)
+    arena.join('a', 1500)
+    arena.join('b', 1500)
+    arena.start()
+    whites = []
+    for _ in range(4):
+        game_id, (white, black) = next(iter(arena.games.items()))
+        whites.append(white)
+        arena.game_finished(game_id, '1-0' if white == 'a' else '0-1')
+    assert whites in (['a', 'b', 'a', 'b'], ['b', 'a', 'b', 'a'])  # colors alternate
+    leader = arena.standings(1)[0]
+    # 2 + 2, then on fire: 4 + 4
+    assert leader["player_id"] == 'a' and leader["score"] == 12 and leader["on_fire"]
+    assert arena.rank('a') == 1 and arena.rank('b') == 2
+    arena.leave('b')
+    assert arena.games and arena.waiting == 0
+    print(f"   Leader: {leader['player_id']} with {leader['score']} points from {leader['wins']} wins")
+    print("✅ Win streaks double points, ranks are read straight off the leaderboard")
+
+def test_pairings_pushed():
+    print("\n3. Pairings arrive over Socket.IO and finished games are paired again...")
+    client = backend.app.test_client()
+    arena_id = client.post('/api/arena/create', json={"minutes": 5}).get_json()["arena"]["arena_id"]
+    sockets = {}
+    try:
+        for player_id, rating in [('p1', 1500), ('p2', 1540), ('p3', 1600), ('p4', 1580)]:
+            sockets[player_id] = backend.socketio.test_client(backend.app)
+            sockets[player_id].emit('arena_join', {"arena_id": arena_id, "player_id": player_id, "rating": rating})
+        deadline = time.time() + 5
+        notices = {}
+        while len(notices) < 4 and time.time() < deadline:
+            for player_id, socket in sockets.items():
+                for packet in socket.get_received():
+                    if packet["name"] == 'arena_pairing':
+                        notices[player_id] = packet["args"][0]
+            time.sleep(0.05)
+        assert len(notices) == 4
+        assert {notices['p1']["opponent"], notices['p3']["opponent"]} == {'p2', 'p4'}
+
+        game_id = notices['p1']["game_id"]
+        assert backend.games[game_id].players == {'p1': notices['p1']["color"], notices['p1']["opponent"]:
+                                                  notices[notices['p1']["opponent"]]["color"]}
+        client.post(f'/api/game/{game_id}/resign', json={"player_id": 'p1'})
+        state = client.get(f'/api/arena/{arena_id}?player_id={notices["p1"]["opponent"]}').get_json()
+        assert state["arena"]["games_played"] == 1 and state["player"]["score"] == 2 and state["player"]["rank"] == 1
+        print(f"   {state['arena']['players']} players, {state['arena']['playing']} playing, "
+              f"{state['arena']['waiting']} waiting")
+    finally:
+        for socket in sockets.values():
+            socket.disconnect()
+        with backend.games_lock:
+            arena = backend.arenas.pop(arena_id)
+            for game_id in arena.games:
+                backend.games.pop(game_id, None)
+                backend.arena_games.pop(game_id, None)
+    print("✅ Bulk start, pushed pairings, standings over REST")
+
+def test_finished_arenas_evicted():
+    print("\n4. Finished arenas are dropped once their last game is over...")
+    original = backend.ARENA_KEEP_FINISHED
+    backend.ARENA_KEEP_FINISHED = 0
+    arena = Arena('evicted-arena', minutes=5)
+    try:
+        with backend.games_lock:
+            backend.arenas[arena.arena_id] = arena
+            arena.join('p1', 1500)
+            arena.join('p2', 1500)
+            [pairing] = backend.open_arena_games(arena, arena.start())
+        arena.ends_at = time.time()
+        backend.end_arena(arena.arena_id)
+        time.sleep(0.2)  # the expiry timer fires, but a game is still being played
+        assert arena.arena_id in backend.arenas
+
+        with backend.games_lock:
+            backend.games[pairing.game_id].resign(pairing.white)
+        assert arena.arena_id not in backend.arenas and pairing.game_id not in backend.arena_games
+        assert arena.games_played == 1 and arena.games == {}
+    finally:
+        backend.ARENA_KEEP_FINISHED = original
+        with backend.games_lock:
+            backend.arenas.pop(arena.arena_id, None)
+            backend.games.pop(pairing.game_id, None)
+    print("✅ Kept while a game runs, gone after it")
+
+def test_finished_games_evicted():
+    print("\n5. Finished arena games leave games and the replay buffer once their keep time is up...")
+    original = backend.ARENA_GAME_KEEP, backend.request_timings.enabled
+    backend.ARENA_GAME_KEEP = 0
+    backend._finished_arena_games.clear()  # earlier tests' games, queued with the default keep time
+    arena = Arena('game-eviction', minutes=5)
+    pairings = []
+    try:
+        with backend.games_lock:
+            backend.arenas[arena.arena_id] = arena
+            for player_id in ('p1', 'p2', 'p3', 'p4'):
+                arena.join(player_id, 1500)
+            pairings = backend.open_arena_games(arena, arena.start())
+            first, second = pairings
+            backend.games[first.game_id].resign(first.white)
+        backend.emit_game_event('game_update', backend.games[first.game_id].get_board_state(), first.game_id)
+        assert backend.event_replay.last_seq(first.game_id) == 1  # kept until the next arena game ends
+
+        with backend.games_lock:
+            backend.games[second.game_id].resign(second.black)
+            assert first.game_id not in backend.games and second.game_id in backend.games
+        assert backend.event_replay.last_seq(first.game_id) == 0
+        assert arena.games_played == 2 and len(arena.games) == 2  # both pairs playing again
+
+        backend.request_timings.enabled = True
+        backend.request_timings.reset()
+        backend.app.test_client().get(f'/api/arena/{arena.arena_id}')
+        assert 'arena_standings' in backend.request_timings.snapshot()
+    finally:
+        backend.ARENA_GAME_KEEP, backend.request_timings.enabled = original
+        with backend.games_lock:
+            backend.arenas.pop(arena.arena_id, None)
+            for game_id in [pairing.game_id for pairing in pairings] + list(arena.games):
+                backend.games.pop(game_id, None)
+                backend.arena_games.pop(game_id, None)
+                backend.event_replay.drop(game_id)
+            backend._finished_arena_games.clear()
+    print("✅ The first game dropped when the next one ended; routes are instrumented")
+
+def run_all_tests():
+    test_pairing_by_rating()
+    test_standings()
+    test_pairings_pushed()
+    test_finished_arenas_evicted()
+    test_finished_games_evicted()
+    print("\n🎉 Arena tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+ChessGame rules tests - in-process, no server or Stockfish needed
+"""
+import os
+import random
+import sys
+import time
+
+import chess
+import chess.engine
+
+import backend
+
+FAKE_ENGINE = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_uci_engine.py')]
+
+def new_game(game_id, game_type='multiplayer', elo_rating=1500):
+    game = backend.ChessGame(game_id, game_type, elo_rating)
+    game.add_player('alice', 'white')
+    if game_type == 'multiplayer':
+        game.add_player('bob', 'black')
+    return game
+
+def play(game, moves):
+    for move in moves:
+        player = 'alice' if game.current_turn == 'white' else 'bob'
+        assert game.make_move(move, player)["success"], move
+
+def decode_legal_moves(legal_map):
+    """{from_square: hex mask} -> set of (from, to) square names"""
+    return {(from_square, chess.square_name(square))
+            for from_square, mask in legal_map.items()
+            for square in chess.scan_forward(int(mask, 16))}
+
+def test_legal_move_map():
+    print("\n1. The legal-move map matches the board and is cached per ply...")
+    game = new_game('legal-map')
+    legal_map = game.legal_move_map()
+    assert decode_legal_moves(legal_map) == {(chess.square_name(move.from_square), chess.square_name(move.to_square))
+                                             for move in game.board.legal_moves}
+    assert legal_map['e2'] == format(chess.BB_E3 | chess.BB_E4, '016x')
+    assert game.legal_move_map() is legal_map  # nothing played, nothing recomputed
+
+    play(game, ['f2f3', 'e7e5'])
+    assert game.legal_move_map() is not legal_map
+    assert game.get_board_state()["legal_moves"] is game.legal_move_map()
+
+    promotions = backend.ChessGame('promotion', 'multiplayer')
+    promotions.board = chess.Board('8/4P3/8/8/8/8/k7/4K3 w - - 0 1')
+    assert promotions.legal_move_map()['e7'] == format(chess.BB_E8, '016x')  # four promotions, one target bit
+
+    result = game.make_move('g2g4', 'alice')
+    assert result["legal_moves"] == game.legal_move_map()
+    play(game, ['d8h4'])
+    assert game.game_result == '0-1' and game.legal_move_map() == {}
+    print("✅ Same moves as python-chess, recomputed only after a move or the end of the game")
+
+def test_checkpoints():
+    print("\n2. Seeking to any ply replays at most one checkpoint interval...")
+    game = new_game('checkpoints')
+    rng = random.Random(7)
+    reference = chess.Board()
+    boards = [reference.fen()]
+    while len(game.move_history) < 3 * backend.CHECKPOINT_INTERVAL + 5 and game.game_result == '*':
+        move = rng.choice(sorted(game.board.legal_moves, key=lambda move: move.uci())).uci()
+        play(game, [move])
+        reference.push_uci(move)
+        boards.append(reference.fen())
+    plies = len(game.move_history)
+    assert len(game.checkpoints) == plies // backend.CHECKPOINT_INTERVAL + 1
+    assert [game.position_at(ply).fen() for ply in range(plies + 1)] == boards
+
+    position = game.get_position(backend.CHECKPOINT_INTERVAL + 1)
+    assert position["board"] == boards[backend.CHECKPOINT_INTERVAL + 1]
+    assert position["move"] == game.move_history[backend.CHECKPOINT_INTERVAL]
+    assert position["total_plies"] == plies and game.get_position(0)["move"] is None
+    for ply in (-1, plies + 1):
+        try:
+            game.position_at(ply)
+            assert False, f"ply {ply} is out of range"
+        except ValueError:
+            pass
+    print(f"✅ {plies + 1} positions from {len(game.checkpoints)} checkpoints")
+
+def test_pondering():
+    print("\n3. The computer ponders on the expected reply: hits answer at once, misses search...")
+    original = backend.engine_pool, backend.ponder_budget
+    backend.engine_pool = backend.EnginePool(path=FAKE_ENGINE, size=0)
+    backend.ponder_budget = backend.PonderBudget(max_concurrent=1, max_time=5.0)
+    game = backend.ChessGame('pondering', 'vs_computer', 2000, ponder=True)
+    limit = chess.engine.Limit(time=0.1)
+    try:
+        game.add_player('alice', 'white')
+        with backend.games_lock:
+            backend.games[game.game_id] = game
+        play(game, ['e2e4'])
+        assert backend.play_computer_reply(game, limit)["move"] == 'a7a5'  # the fake engine's first legal move
+        assert game._ponder is not None and game._ponder[0] == 'a2a3'  # ...and its expected reply
+        time.sleep(0.2)
+
+        play(game, ['a2a3'])
+        started = time.monotonic()
+        reply = backend.play_computer_reply(game, limit)
+        assert reply["move"] == 'a5a4' and time.monotonic() - started < limit.time
+        assert backend.ponder_budget.snapshot()["hits"] == 1
+
+        assert game._ponder[0] != 'h2h3'
+        play(game, ['h2h3'])
+        assert backend.play_computer_reply(game, limit)["move"] == 'a8a5'
+        snapshot = backend.ponder_budget.snapshot()
+        assert snapshot["misses"] == 1 and snapshot["active"] == 1  # pondering again
+    finally:
+        with backend.games_lock:
+            backend.games.pop(game.game_id, None)
+        game.cleanup()
+        assert backend.ponder_budget.snapshot()["active"] == 0
+        backend.engine_pool, backend.ponder_budget = original
+    print("✅ One hit answered from the ponder search, one miss searched afresh")
+
+def test_premoves():
+    print("\n4. Queued premoves are played as soon as they are legal and their condition holds...")
+    game = new_game('premoves')
+    assert game.queue_premoves('mallory', ['e7e5'])["error"] == "Player not in game"
+    assert not game.queue_premoves('bob', 'e7e5')["success"]
+    assert not game.queue_premoves('bob', [{"move": "e7"}])["success"]
+    assert not game.queue_premoves('bob', ['a7a6'] * (backend.PREMOVE_MAX_QUEUE + 1))["success"]
+
+    queued = game.queue_premoves('bob', [{"move": 'e7e5', "if": 'e2e4'}, 'g8f6'])
+    assert queued["color"] == 'black' and queued["premoves"][1] == {"move": 'g8f6', "if": None}
+    result = game.make_move('e2e4', 'alice')
+    assert result["moves"] == ['e2e4', 'e7e5'] and result["premoves_applied"] == ['e7e5']
+    assert result["current_turn"] == 'white' and result["move"] == 'e7e5'
+    assert game.premoves['black'] == [{"move": 'g8f6', "if": None}]
+
+    # An unmet condition or an illegal premove drops the player's whole queue
+    game.queue_premoves('bob', [{"move": 'd7d5', "if": 'c2c4'}, 'b8c6'])
+    assert game.make_move('d2d4', 'alice')["premoves_applied"] == [] and game.premoves['black'] == []
+    game.queue_premoves('alice', ['d4d5'])
+    game.queue_premoves('alice', ['e1e2', 'a2a3'], replace=False)
+    assert len(game.premoves['white']) == 3
+    assert game.make_move('e5d4', 'bob')["premoves_applied"] == []  # the d4 pawn is gone
+    assert game.premoves['white'] == []
+
+    # Premoves stop at the end of the game
+    mate = new_game('premove-mate')
+    play(mate, ['f2f3', 'e7e5'])
+    mate.queue_premoves('bob', ['d8h4', 'a7a6'])
+    result = mate.make_move('g2g4', 'alice')
+    assert result["premoves_applied"] == ['d8h4'] and mate.game_result == '0-1'
+    print("✅ Conditions, legality, queue limits and checkmate")
+
+class QueenTables:
+    """Stand-in for chess.syzygy.Tablebase: whoever has a queen wins, faster the closer the kings"""
+    def __init__(self):
+        self.wdl = {'KQvK': None}
+        self.lru = []
+
+    def probe_wdl(self, board):
+        if board.pieces(chess.ROOK, chess.WHITE) or board.pieces(chess.ROOK, chess.BLACK):
+            raise KeyError("KRvK missing")
+        if board.pieces(chess.QUEEN, board.turn):
+            return 2
+        return -2 if board.pieces(chess.QUEEN, not board.turn) else 0
+
+    def probe_dtz(self, board):
+        white, black = board.king(chess.WHITE), board.king(chess.BLACK)
+        distance = (abs(chess.square_file(white) - chess.square_file(black))
+                    + abs(chess.square_rank(white) - chess.square_rank(black)))
+        return self.probe_wdl(board) and distance
+
+def tablebase_with(tables):
+    tablebase = backend.EndgameTablebase(paths='')
+    tablebase._tablebase, tablebase.max_pieces = tables, 3
+    return tablebase
+
+def test_tablebase():
+    print("\n5. Covered endgames are adjudicated and played from the tables...")
+    tablebase = tablebase_with(QueenTables())
+    assert tablebase.adjudicate(chess.Board('8/8/8/4k3/8/8/8/KQ6 b - - 0 1')) == '1-0'
+    assert tablebase.adjudicate(chess.Board('8/8/8/4k3/8/8/8/KQ6 w - - 0 1')) == '1-0'
+    assert tablebase.adjudicate(chess.Board('8/8/8/4k3/8/8/8/K7 w - - 0 1')) == '1/2-1/2'
+    assert tablebase.adjudicate(chess.Board('8/8/8/4k3/8/8/8/KR6 w - - 0 1')) is None  # missing table
+    assert tablebase.adjudicate(chess.Board()) is None  # too many pieces
+    assert not tablebase.covers(chess.Board('4k3/8/8/8/8/8/8/R3K3 w Q - 0 1'))  # castling rights
+    assert tablebase.best_move(chess.Board('7k/8/6K1/8/8/8/8/1Q6 w - - 0 1')) == 'b1b8'  # mate
+    assert tablebase.best_move(chess.Board('8/8/8/4k3/8/8/8/KQ6 b - - 0 1')) == 'e5f6'  # losing: hold out longest
+    assert tablebase.status()["misses"] == 1 and tablebase.status()["adjudications"] == 3
+
+    original = backend.endgame_tablebase, backend.SYZYGY_ADJUDICATE
+    backend.endgame_tablebase, backend.SYZYGY_ADJUDICATE = tablebase, True
+    try:
+        game = backend.ChessGame('tablebase', 'vs_computer', 800)
+        game.add_player('alice', 'white')
+        game.board = chess.Board('8/8/8/4k3/8/8/8/KQ6 b - - 0 1')
+        assert game.get_computer_move() == 'e5f6'  # from the tables, no search
+        game.board = chess.Board('7k/8/6K1/8/8/8/8/1Q6 w - - 0 1')
+        assert game.make_move('b1c1', 'alice')["success"]
+        assert game.game_result == '1-0' and game.adjudication == 'syzygy'
+        assert game.pgn_headers()["Termination"] == 'adjudication'
+    finally:
+        backend.endgame_tablebase, backend.SYZYGY_ADJUDICATE = original
+    print("✅ Results, missing tables, table moves and adjudicated games")
+
+def test_result_is_final():
+    print("\n6. A finished game keeps its result and finishes only once...")
+    finished = []
+    hooks = list(backend.game_finished_hooks)
+    backend.game_finished_hooks[:] = [lambda game: finished.append(game.game_result)]
+    try:
+        mated = new_game('result-final')
+        play(mated, ['f2f3', 'e7e5', 'g2g4', 'd8h4'])
+        assert mated.resign('bob') == {"success": False, "error": "Game is over"}
+        assert mated.resign('alice')["error"] == "Game is over"
+        mated._finish('1/2-1/2')
+        assert mated.game_result == '0-1' and finished == ['0-1']
+
+        resigned = new_game('resigned-twice')
+        assert resigned.resign('alice')["game_result"] == '0-1'
+        assert not resigned.resign('bob')["success"] and resigned.game_result == '0-1'
+        assert finished == ['0-1', '0-1']
+    finally:
+        backend.game_finished_hooks[:] = hooks
+    print("✅ Resigning after the end is refused, hooks ran once per game")
+
+def run_all_tests():
+    test_legal_move_map()
+    test_checkpoints()
+    test_pondering()
+    test_premoves()
+    test_tablebase()
+    test_result_is_final()
+    print("\n🎉 ChessGame tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
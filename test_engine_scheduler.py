@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Engine scheduler tests - runs in-process against fake_uci_engine.py, no server or Stockfish needed
+"""
+import os
+import sys
+import time
+import threading
+from threading import Thread
+
+import chess
+import chess.engine
+
+import backend
+from uci_driver import UciDriver
+
+FAKE_ENGINE = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_uci_engine.py')]
+
+def grant_order(admission, requests):
+    """Queue (client, game, class) requests behind a held slot and return the order they are granted"""
+    blocker = admission.admit('blocker', 'blocker-game')
+    order = []
+    threads = []
+    for client_id, game_id, work_class in requests:
+        def run(client_id=client_id, game_id=game_id, work_class=work_class):
+            ticket = admission.admit(client_id, game_id, work_class, deadline=5.0)
+            order.append((game_id, work_class))
+            time.sleep(0.01)
+            ticket.release()
+        thread = Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        while admission.snapshot()["queue_depth"] < len(threads):
+            time.sleep(0.001)
+    blocker.release()
+    for thread in threads:
+        thread.join()
+    return order
+
+def test_priority_classes():
+    print("\n1. Interactive replies are served before analysis and batch work...")
+    admission = backend.EngineAdmission(max_concurrent=1)
+    order = grant_order(admission, [
+        ('c1', 'g1', 'batch'),
+        ('c2', 'g2', 'analysis'),
+        ('c3', 'g3', 'interactive'),
+    ])
+    print(f"   Grant order: {[work_class for _, work_class in order]}")
+    assert [work_class for _, work_class in order] == ['interactive', 'analysis', 'batch']
+    print("✅ Classes granted in priority order")
+
+def test_per_game_fairness():
+    print("\n2. Games in the same class share slots round-robin...")
+    admission = backend.EngineAdmission(max_concurrent=1)
+    order = grant_order(admission, [
+        ('c1', 'busy-game', 'analysis'),
+        ('c2', 'busy-game', 'analysis'),
+        ('c3', 'busy-game', 'analysis'),
+        ('c4', 'quiet-game', 'analysis'),
+    ])
+    print(f"   Grant order: {[game_id for game_id, _ in order]}")
+    assert [game_id for game_id, _ in order] == ['busy-game', 'quiet-game', 'busy-game', 'busy-game']
+    print("✅ A busy game doesn't starve a quiet one")
+
+def test_preemption_with_fake_engine():
+    print("\n3. An interactive reply preempts a running analysis slice...")
+    admission = backend.EngineAdmission(max_concurrent=1)
+    pool = backend.EnginePool(path=FAKE_ENGINE, size=0)
+    original = backend.engine_admission, backend.engine_pool, backend.ENGINE_SLICE_TIME
+    backend.engine_admission, backend.engine_pool = admission, pool
+    backend.ENGINE_SLICE_TIME = 5.0
+
+    result = {}
+    def analyse():
+        result["info"] = backend.analyse_position(chess.Board(), 1.0, 'analyst', 'analysis-game')
+    analysis_thread = Thread(target=analyse)
+    try:
+        analysis_thread.start()
+        while admission.snapshot()["active"] == 0:
+            time.sleep(0.01)
+        time.sleep(0.2)
+
+        started = time.monotonic()
+        ticket = admission.admit('player', 'player-game')
+        waited = time.monotonic() - started
+        ticket.release()
+        analysis_thread.join()
+    finally:
+        backend.engine_admission, backend.engine_pool, backend.ENGINE_SLICE_TIME = original
+
+    snapshot = admission.snapshot()
+    print(f"   Interactive wait: {waited * 1000:.0f}ms, preemptions: {snapshot['preempted']}")
+    print(f"   Analysis best move: {result['info']['pv'][0].uci()}")
+    assert waited < 1.0 and snapshot["preempted"] >= 1
+    assert result["info"]["pv"]
+    print("✅ Analysis yielded its slot and resumed afterwards")
+
+    histogram = snapshot["classes"]["interactive"]["wait_histogram"]
+    print(f"   Interactive wait histogram: {histogram['counts']}")
+    assert histogram["count"] == 1 and sum(histogram["counts"]) == 1
+    print("✅ Wait times recorded per class")
+
+def test_shared_driver_threads():
+    print("\n4. Engines on the shared driver don't each add a thread...")
+    driver = UciDriver()
+    threads_before = threading.active_count()
+    engines = [driver.popen_uci(FAKE_ENGINE) for _ in range(5)]
+    try:
+        threads = threading.active_count() - threads_before
+        futures = [driver.submit(engine.protocol.play(chess.Board(), chess.engine.Limit(time=0.05)))
+                   for engine in engines]
+        moves = [future.result(timeout=5).move.uci() for future in futures]
+    finally:
+        for engine in engines:
+            engine.quit()
+    print(f"   Threads added for {len(engines)} engines: {threads}, moves: {moves}")
+    assert threads <= 1 and moves == ['a2a3'] * len(engines)
+    print("✅ One driver thread serves every engine")
+
+def test_pooled_engines_reset_and_reused():
+    print("\n5. Released engines go back at full strength; a batch job holds one engine...")
+    pool = backend.EnginePool(path=FAKE_ENGINE, size=1)
+    spawned = []
+    spawn = pool._spawn
+    pool._spawn = lambda: spawned.append(1) or spawn()
+    original = backend.engine_pool, backend.engine_admission
+    backend.engine_pool, backend.engine_admission = pool, backend.EngineAdmission(max_concurrent=1)
+    try:
+        engine = pool.acquire()
+        engine.configure({"Skill Level": 3})
+        pool.release(engine)
+        assert pool.acquire() is engine and engine.protocol.config["Skill Level"] == 20
+
+        pool.release(engine)
+        tasks = [(index, board.fen()) for index, board in enumerate([chess.Board(), chess.Board(
+            'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'), chess.Board(
+            'rnbqkbnr/pppp1ppp/8/4p3/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2')])]
+        results = list(backend.batch_evaluator(0.05)(tasks))
+        assert [key for key, *_ in results] == [0, 1, 2] and all(best for _, _, best, _ in results)
+        assert len(spawned) == 1 and pool.status()["warm_engines"] == 1
+    finally:
+        backend.engine_pool, backend.engine_admission = original
+        for idle in pool._idle:
+            idle.quit()
+    print(f"   Engines started for 3 positions: {len(spawned)}")
+    print("✅ No skill level carried over, no process churn")
+
+def run_all_tests():
+    test_priority_classes()
+    test_per_game_fairness()
+    test_preemption_with_fake_engine()
+    test_shared_driver_threads()
+    test_pooled_engines_reset_and_reused()
+    print("\n🎉 Engine scheduler tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
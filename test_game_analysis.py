@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Game analysis pipeline tests - a material-count evaluator stands in for the engine
+"""
+import os
+import subprocess
+import sys
+import tempfile
+from threading import Event, Thread, current_thread
+
+import chess
+
+import game_analysis
+from archive import encode_move
+
+GAMES = [
+    {"key": "g1", "white": "alice", "black": "bob", "result": "1-0",
+     "moves": ['e2e4', 'd7d5', 'e4d5', 'd8d5', 'b1c3', 'd5a5']},
+    {"key": "g2", "white": "bob", "black": "alice", "result": "0-1",
+     "moves": ['e2e4', 'e7e5', 'd1h5', 'b8c6', 'f1c4', 'g8f6', 'h5f7']},
+]
+
+def material(board):
+    values = {chess.PAWN: 100, chess.KNIGHT: 300, chess.BISHOP: 300, chess.ROOK: 500, chess.QUEEN: 900}
+    return sum(value * (len(board.pieces(piece, chess.WHITE)) - len(board.pieces(piece, chess.BLACK)))
+               for piece, value in values.items())
+
+def material_evaluator(seen):
+    """Scores by material; the best move is the first legal one. Records the positions asked for"""
+    def evaluate(tasks):
+        for key, fen in tasks:
+            seen.append(key)
+            board = chess.Board(fen)
+            yield key, material(board), encode_move(next(iter(board.legal_moves))), 1
+    return evaluate
+
+def test_checkpoint_resume():
+    print("\n1. An interrupted run resumes from the checkpoint...")
+    with tempfile.TemporaryDirectory() as out_dir:
+        stop = Event()
+        first = []
+        def progress(done, total):
+            if done >= total // 2:
+                stop.set()
+        assert game_analysis.Pipeline(out_dir).run(GAMES, material_evaluator(first), stop, progress) is None
+
+        # A crash mid-write leaves half a record behind
+        with open(os.path.join(out_dir, 'evals.ckpt'), 'ab') as f:
+            f.write(b'\x01\x02\x03')
+
+        second = []
+        pipeline = game_analysis.Pipeline(out_dir)
+        output = pipeline.run(GAMES, material_evaluator(second))
+        assert output and not set(first) & set(second)
+        assert pipeline.status()["positions"] == len(game_analysis.positions(GAMES))
+        print(f"   {len(first)} positions before the stop, {len(second)} after, none twice")
+    print("✅ Checkpointed evaluations are not redone")
+
+def test_columns():
+    print("\n2. Scores read back column by column...")
+    with tempfile.TemporaryDirectory() as out_dir:
+        output = game_analysis.Pipeline(out_dir).run(GAMES, material_evaluator([]))
+        games = game_analysis.read_columns(output, "games", ["key", "white_acpl", "black_acpl"])
+        assert games["key"] == ["g1", "g2"]
+        moves = game_analysis.read_columns(output, "moves")
+        assert len(moves["move"]) == sum(len(game["moves"]) for game in GAMES)
+        # g1: 2.exd5 wins a pawn, 2...Qxd5 wins it back
+        assert list(moves["eval"][2:4]) == [100, 0] and moves["cp_loss"][3] == 0
+        # g2 ends in mate, scored without asking the evaluator
+        assert moves["eval"][-1] == game_analysis.MATE_CP
+        print(f"   ACPL g1 {games['white_acpl'][0]:.0f}/{games['black_acpl'][0]:.0f}, "
+              f"g2 {games['white_acpl'][1]:.0f}/{games['black_acpl'][1]:.0f}")
+    print("✅ Per-game and per-move columns")
+
+def test_accuracy_curve():
+    print("\n3. Accuracy follows the win-percentage drop...")
+    assert game_analysis.move_accuracy(50, 50) > 99.9
+    assert game_analysis.move_accuracy(0, -300) < game_analysis.move_accuracy(0, -100) < 100
+    assert game_analysis.move_accuracy(-1000, -1000) > 99.9
+    assert game_analysis.terminal_eval(chess.Board()) is None
+    board = chess.Board("7k/6Q1/6K1/8/8/8/8/8 b - - 0 1")
+    assert game_analysis.terminal_eval(board) == (game_analysis.MATE_CP, 0)
+    print("✅ Best moves score 100%, blunders much less")
+
+def test_job_loads_in_background():
+    print("\n4. The background job loads its games on its own thread...")
+    with tempfile.TemporaryDirectory() as out_dir:
+        loading, release = Event(), Event()
+        loaded_on = []
+        def load():
+            loaded_on.append(current_thread().name)
+            loading.set()
+            release.wait(5)
+            return GAMES
+        job = game_analysis.AnalysisJob(load, out_dir, material_evaluator([]))
+        loading.wait(5)
+        assert job.running and job.status()["games"] is None
+        release.set()
+        job._thread.join(5)
+        assert loaded_on == ['game-analysis'] and job.state == 'finished'
+        assert job.status()["games"] == len(GAMES) and job.status()["output"]
+    print("✅ Started at once, games counted once loaded")
+
+def test_server_loads_on_demand():
+    print("\n5. The server imports the pipeline only for a job, and drains the archive queue safely...")
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', "import sys, backend; print('game_analysis' in sys.modules, 'chess.pgn' in sys.modules)"],
+        cwd=here, capture_output=True, text=True, timeout=60, check=True).stdout
+    assert output.split()[-2:] == ['False', 'False'], output
+
+    import backend
+    from archive import Archive
+    with tempfile.TemporaryDirectory() as directory:
+        original = backend.game_archive
+        backend.game_archive = Archive(directory)
+        try:
+            for index in range(2000):
+                backend._archive_queue.append(({"Round": str(index)}, GAMES[0]["moves"], '1-0'))
+            errors = []
+            def drain():
+                try:
+                    backend.flush_archive()
+                except Exception as e:
+                    errors.append(e)
+            drainers = [Thread(target=drain) for _ in range(4)]
+            for drainer in drainers:
+                drainer.start()
+            for drainer in drainers:
+                drainer.join()
+            assert errors == [] and backend.game_archive.game_count == 2000
+            assert backend.game_archive.get_game(1999)["headers"]["Round"] == '1999'
+        finally:
+            backend.game_archive.close()
+            backend.game_archive = original
+    print("✅ No chess.pgn at startup, four drains at once archive every game in order")
+
+def run_all_tests():
+    test_checkpoint_resume()
+    test_columns()
+    test_accuracy_curve()
+    test_job_loads_in_background()
+    test_server_loads_on_demand()
+    print("\n🎉 Game analysis tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
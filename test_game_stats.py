@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Aggregate game statistics tests - in-process, no server needed
+"""
+import os
+import tempfile
+
+import backend
+from game_stats import GameStats
+
+def play(game, moves):
+    for move in moves:
+        player = 'alice' if game.current_turn == 'white' else 'bob'
+        assert game.make_move(move, player)["success"], move
+
+def test_finished_games_counted():
+    print("\n1. Games are counted as they end...")
+    original = backend.game_stats
+    backend.game_stats = GameStats(elo_band=200, opening_plies=2)
+    try:
+        mated = backend.ChessGame('stats-1', 'multiplayer')
+        mated.add_player('alice', 'white')
+        mated.add_player('bob', 'black')
+        play(mated, ['f2f3', 'e7e5', 'g2g4', 'd8h4'])
+
+        resigned = backend.ChessGame('stats-2', 'multiplayer')
+        resigned.add_player('alice', 'white')
+        resigned.add_player('bob', 'black')
+        play(resigned, ['f2f3', 'e7e5'])
+        resigned.resign('bob')
+        resigned.resign('bob')  # already over, not counted twice
+
+        summary = backend.game_stats.summary()
+        assert summary["games"] == 2 and summary["average_plies"] == 3.0
+        assert summary["results"] == {'1-0': 1, '1/2-1/2': 0, '0-1': 1}
+        assert summary["terminations"] == {'checkmate': 1, 'resignation': 1}
+        assert summary["openings"] == [{"moves": "f2f3 e7e5", "games": 2, '1-0': 1, '1/2-1/2': 0, '0-1': 1}]
+        assert summary["by_type"]["multiplayer"]["white_score"] == 0.5
+        assert backend.game_stats.summary() is summary  # nothing new, nothing rebuilt
+    finally:
+        backend.game_stats = original
+    print("✅ Results, length, terminations and openings")
+
+def test_snapshot_round_trip():
+    print("\n2. Snapshots reload into a fresh process...")
+    stats = GameStats()
+    for elo, result in [(1850, '1-0'), (1990, '0-1'), (2410, '1/2-1/2')]:
+        stats.record('vs_computer', elo, result, ['e2e4', 'c7c5', 'g1f3'], 'resignation')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'stats.json')
+        stats.save(path)
+        assert not stats.dirty
+        reloaded = GameStats()
+        assert reloaded.load(path)
+        assert not GameStats(elo_band=100).load(path)
+        assert not GameStats().load(os.path.join(directory, 'missing.json'))
+    bands = reloaded.summary()["vs_computer_by_elo"]
+    assert list(bands) == ['1800-1999', '2400-2599']
+    assert bands['1800-1999']["games"] == 2 and bands['1800-1999']["white_score"] == 0.5
+    assert reloaded.summary() == {**stats.summary(), "since": reloaded.since}
+    print("   Bands: " + ", ".join(f"{band} ({entry['games']})" for band, entry in bands.items()))
+    print("✅ Same summary after a save and load")
+
+def run_all_tests():
+    test_finished_games_counted()
+    test_snapshot_round_trip()
+    print("\n🎉 Game stats tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Built-in engine tests - pure python-chess, no server or Stockfish needed
+"""
+import random
+import time
+
+import chess
+import chess.engine
+
+from lite_engine import LiteEngine, RATING_BANDS, evaluate, move_delta
+
+SPECIAL_POSITIONS = [
+    chess.Board('r3k2r/pppq1ppp/2n2n2/3pp3/3PP3/2N2N2/PPPQ1PPP/R3K2R w KQkq - 0 1'),  # castling both ways
+    chess.Board('rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3'),  # en passant
+    chess.Board('2r3k1/1P3ppp/8/8/8/8/5PPP/6K1 w - - 0 1'),  # promotions, with and without a capture
+    chess.Board('r3k2r/8/8/8/8/8/8/1R2K1R1 w GBkq - 0 1', chess960=True),  # king takes rook castling
+]
+
+def test_move_delta():
+    print("\n1. move_delta() matches a full re-evaluation for every move...")
+    boards = list(SPECIAL_POSITIONS)
+    rng = random.Random(3)
+    board = chess.Board()
+    while len(boards) < 200:
+        moves = list(board.legal_moves)
+        if not moves:
+            board = chess.Board()
+            continue
+        board.push(rng.choice(moves))
+        boards.append(board.copy(stack=False))
+    checked = 0
+    for board in boards:
+        before = evaluate(board)
+        for move in board.legal_moves:
+            expected = -before
+            board.push(move)
+            expected += evaluate(board)
+            board.pop()
+            assert move_delta(board, move) == expected, (board.fen(), move.uci())
+            checked += 1
+    print(f"✅ {checked} moves in {len(boards)} positions, castling, en passant and promotion included")
+
+def strongest(seed=1):
+    engine = LiteEngine(RATING_BANDS[-1][0], seed=seed)
+    engine.blunder_chance, engine.noise = 0, 0
+    return engine
+
+def test_move_choice():
+    print("\n2. Without noise the engine takes material and finds mates...")
+    engine = strongest()
+    hanging_queen = chess.Board('rnb1kbnr/pppp1ppp/8/4p1q1/4P3/3P4/PPP2PPP/RNBQKBNR w KQkq - 0 1')
+    assert engine.play(hanging_queen, chess.engine.Limit(time=2)).move.uci() == 'c1g5'
+    mate_in_one = chess.Board('6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1')
+    result = engine.play(mate_in_one, chess.engine.Limit(time=2))
+    assert result.move.uci() == 'd1d8' and result.info["score"].white().score() > 90000
+    try:
+        engine.play(chess.Board('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1'), chess.engine.Limit(time=1))
+        assert False, "stalemate has no moves"
+    except chess.engine.EngineError:
+        pass
+    print("✅ Bxg5 and Rd8#")
+
+def test_rating_bands():
+    print("\n3. Ratings map to depth and noise; searches stop on time...")
+    weakest = LiteEngine(800)
+    assert (weakest.depth, weakest.blunder_chance, weakest.noise) == RATING_BANDS[0][1:]
+    weakest.configure({"UCI_Elo": 1500, "Skill Level": 3})
+    assert weakest.depth == RATING_BANDS[-1][1] and LiteEngine(5000).depth == RATING_BANDS[-1][1]
+
+    # Same seed, same moves
+    board = chess.Board()
+    assert (LiteEngine(1000, seed=5).play(board, chess.engine.Limit(time=2)).move
+            == LiteEngine(1000, seed=5).play(board, chess.engine.Limit(time=2)).move)
+
+    engine = strongest()
+    engine.depth = 8
+    started = time.monotonic()
+    result = engine.play(chess.Board(), chess.engine.Limit(time=0.2))
+    elapsed = time.monotonic() - started
+    print(f"   Depth {result.info['depth']} in {elapsed * 1000:.0f}ms")
+    assert elapsed < 1.0 and result.move in chess.Board().legal_moves
+    assert engine.play(chess.Board(), chess.engine.Limit(time=2, depth=1)).info["depth"] == 1
+    print("✅ Bands, reproducible seeds and time limits")
+
+def run_all_tests():
+    test_move_delta()
+    test_move_choice()
+    test_rating_bands()
+    print("\n🎉 Built-in engine tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Multiplexed subscription tests - in-process with the Socket.IO test client, no server needed
+"""
+import time
+
+import backend
+from subscriptions import GameFilter, SubscriptionHub
+
+def payload(seq, moves, history):
+    return {"seq": seq, "moves": moves, "move_history": history, "game_result": '*'}
+
+def test_coalescing():
+    print("\n1. Events in one tick become one update per game, one frame per socket...")
+    hub = SubscriptionHub()
+    hub.subscribe('bot', ['g1', 'g2'])
+    hub.subscribe('dashboard', game_filter=GameFilter(min_elo=2000))
+    strong = {"type": 'vs_computer', "elo": 2400}
+    hub.publish('g1', 'move_made', payload(1, ['e2e4'], ['e2e4']), strong)
+    hub.publish('g1', 'move_made', payload(2, ['e7e5', 'g1f3'], ['e2e4', 'e7e5', 'g1f3']), strong)
+    live_history = ['d2d4']
+    hub.publish('g2', 'move_made', payload(1, ['d2d4'], live_history), {"type": 'multiplayer', "elo": None})
+    live_history.append('d7d5')  # a later move, not yet published
+    hub.publish('g3', 'game_update', payload(4, [], ['c2c4'] * 4), strong)
+
+    frames = dict(hub.flush())
+    assert sorted(frames) == ['bot', 'dashboard']
+    bot = {update["game_id"]: update for update in frames['bot']["games"]}
+    assert sorted(bot) == ['g1', 'g2']
+    assert bot['g1']["moves"] == ['e2e4', 'e7e5', 'g1f3'] and bot['g1']["from_seq"] == 1 and bot['g1']["seq"] == 2
+    assert bot['g1']["ply"] == 3 and "move_history" not in bot['g1'] and bot['g2']["ply"] == 1
+    assert [update["game_id"] for update in frames['dashboard']["games"]] == ['g1', 'g3']
+    assert hub.flush() == []
+
+    hub.unsubscribe('bot', ['g1'])
+    hub.drop('dashboard')
+    hub.publish('g1', 'move_made', payload(3, ['b8c6'], ['e2e4', 'e7e5', 'g1f3', 'b8c6']), strong)
+    assert hub.flush() == [] and hub.status()["sockets"] == 1
+    print(f"   {hub.status()['events']} events, {hub.status()['frames']} frames")
+    print("✅ Moves merged, filters matched once per game, unsubscribed sockets skipped")
+
+def test_subscribe_socket():
+    print("\n2. A socket subscribes with a filter and gets batched frames...")
+    client = backend.app.test_client()
+    strong = client.post('/api/game/create', json={"type": "vs_computer", "elo_rating": 2200}).get_json()["game_id"]
+    weak = client.post('/api/game/create', json={"type": "vs_computer", "elo_rating": 900}).get_json()["game_id"]
+    socket = backend.socketio.test_client(backend.app)
+    try:
+        socket.emit('subscribe', {"filter": {"type": "vs_computer", "min_elo": 2000}})
+        received = socket.get_received()
+        assert received[0]["name"] == 'subscribed' and received[0]["args"][0]["filter"]["min_elo"] == 2000
+        snapshot = received[1]["args"][0]["games"]
+        assert strong in [game["game_id"] for game in snapshot] and weak not in [game["game_id"] for game in snapshot]
+
+        socket.emit('subscribe', {"filter": {"min_rating": 2000}})
+        assert socket.get_received()[0]["name"] == 'error'
+
+        for game_id in (strong, weak):
+            client.post(f'/api/game/{game_id}/join', json={"player_id": "p", "color": "white"})
+            client.post(f'/api/game/{game_id}/resign', json={"player_id": "p"})
+        deadline = time.time() + 5
+        updates = []
+        while not updates and time.time() < deadline:
+            updates = [game for packet in socket.get_received() if packet["name"] == 'game_batch'
+                       for game in packet["args"][0]["games"]]
+            time.sleep(0.05)
+        assert [update["game_id"] for update in updates] == [strong]
+        assert updates[0]["game_result"] == '0-1' and updates[0]["resigned_by"] == 'white'
+        print(f"   Frame: {[(update['event'], update['seq']) for update in updates]}")
+    finally:
+        socket.disconnect()
+        for game_id in (strong, weak):
+            client.delete(f'/api/game/{game_id}')
+    assert not backend.subscriptions.active
+    print("✅ Snapshot of matching live games, then batched updates; dropped on disconnect")
+
+def run_all_tests():
+    test_coalescing()
+    test_subscribe_socket()
+    print("\n🎉 Subscription tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
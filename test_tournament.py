@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Self-play tournament tests - built-in engine only, no server or Stockfish needed
+"""
+import math
+import os
+import subprocess
+import sys
+
+import backend
+import tournament
+from tournament import PlayerSpec, estimate_ratings, play_game, schedule
+
+def test_schedule():
+    print("\n1. Every pairing plays each opening twice, colors reversed...")
+    players = [PlayerSpec(spec, 0.05) for spec in ('lite:800', 'lite:1000', 'elo:1400@0.1')]
+    tasks = schedule(players, 4, 4, seed=11)
+    assert tasks == schedule(players, 4, 4, seed=11) and tasks != schedule(players, 4, 4, seed=12)
+    assert len(tasks) == 3 * 4 and sorted(task[0] for task in tasks) == list(range(12))
+    by_opening = {}
+    for _, white, black, opening, _ in tasks:
+        assert len(opening) == 4
+        by_opening.setdefault(tuple(opening), []).append((white.spec, black.spec))
+    assert all(len(colors) == 2 and colors[0] == colors[1][::-1] for colors in by_opening.values())
+    assert players[0].resolve() == ('lite', 800) and players[2].movetime == 0.1
+    assert players[2].resolve() == ('stockfish', backend.ChessGame._elo_to_skill_level(1400))
+    print(f"✅ {len(tasks)} games, {len(by_opening)} openings, same seed same schedule")
+
+def tables(names, results):
+    """scores and games tables from (white, black, white's points) results"""
+    scores = {a: {b: 0.0 for b in names} for a in names}
+    games = {a: {b: 0 for b in names} for a in names}
+    for white, black, points in results:
+        scores[white][black] += points
+        scores[black][white] += 1 - points
+        games[white][black] += 1
+        games[black][white] += 1
+    return scores, games
+
+def test_estimate_ratings():
+    print("\n2. Bradley-Terry ratings and confidence intervals...")
+    players = [PlayerSpec(spec, 0.05) for spec in ('lite:1200', 'lite:800', 'lite:1000')]
+    strong, weak, absent = (p.spec for p in players)
+    scores, games = tables([strong, weak, absent],
+                           [(strong, weak, 1), (weak, strong, 0), (strong, weak, 0), (weak, strong, 0)])
+    # With one virtual draw: 3.5 points of 5, so a 70% expected score
+    estimates = estimate_ratings(players, scores, games)
+    gap = estimates[strong]["rating"] - estimates[weak]["rating"]
+    assert estimates[strong]["rating"] == 1200 and math.isclose(gap, 400 * math.log10(7 / 3))
+    assert math.isclose(estimates[strong]["ci95"], 1.96 * 400 / math.log(10) / math.sqrt(5 * 0.7 * 0.3))
+    assert estimates[absent]["ci95"] == float('inf')  # never played, no information
+    anchored = estimate_ratings(players, scores, games, anchor=(weak, 1000))
+    assert math.isclose(anchored[weak]["rating"], 1000) and math.isclose(anchored[strong]["rating"], 1000 + gap)
+    print(f"✅ {gap:.1f} points apart, ±{estimates[strong]['ci95']:.0f}")
+
+def test_play_game():
+    print("\n3. A worker plays a whole game without touching the server's hooks...")
+    finished = []
+    hooks = list(backend.game_finished_hooks)
+    backend.game_finished_hooks[:] = [finished.append]
+    try:
+        tournament._init_worker()
+        white, black = PlayerSpec('lite:800', 0.01), PlayerSpec('lite:900', 0.01)
+        index, white_spec, black_spec, result, plies, _, pgn = play_game((7, white, black, ['e2e4', 'e7e5'], '1'))
+    finally:
+        backend.game_finished_hooks[:] = hooks
+        tournament._close_engines()
+    assert (index, white_spec, black_spec) == (7, 'lite:800', 'lite:900')
+    assert result in ('1-0', '0-1', '1/2-1/2') and 2 < plies <= tournament.MAX_PLIES
+    assert '[White "lite:800"]' in pgn and '[WhiteElo "800"]' in pgn and pgn.split()[-1] == result
+    assert finished == []
+    print(f"✅ {result} in {plies} plies")
+
+def test_import_starts_no_threads():
+    print("\n4. Importing the runner (and backend) starts no threads...")
+    here = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', "import threading, tournament; print(threading.active_count())"],
+        cwd=here, capture_output=True, text=True, timeout=60, check=True).stdout
+    assert output.split()[-1] == '1', output
+    print("✅ Only the main thread")
+
+def run_all_tests():
+    test_schedule()
+    test_estimate_ratings()
+    test_play_game()
+    test_import_starts_no_threads()
+    print("\n🎉 Tournament tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
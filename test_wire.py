@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Binary wire format and event replay tests - in-process with the Socket.IO test client, no server needed
+"""
+import chess
+
+import backend
+import wire
+from archive import encode_move
+
+def play(game, moves):
+    results = []
+    for move in moves:
+        player = 'alice' if game.current_turn == 'white' else 'bob'
+        result = game.make_move(move, player)
+        assert result["success"], (move, result)
+        results.append(result)
+    return results
+
+def new_game():
+    game = backend.ChessGame('wire-test', 'multiplayer')
+    game.add_player('alice', 'white')
+    game.add_player('bob', 'black')
+    return game
+
+def test_round_trip():
+    print("\n1. Events decode back to the JSON payload...")
+    game = new_game()
+    results = play(game, ['e2e4', 'd7d5', 'e4d5', 'g8f6', 'f1b5', 'c7c6', 'd5c6', 'd8d6', 'c6b7', 'c8d7', 'b7a8q'])
+    for result in results:
+        event, payload = wire.decode_event(wire.encode_event('move_made', result))
+        assert event == 'move_made' and payload["ply"] == len(result["move_history"])
+        assert {key: value for key, value in result.items() if key in payload} == \
+            {key: value for key, value in payload.items() if key in result}
+    print(f"   Last move {payload['move']}: {len(wire.encode_event('move_made', result))} bytes")
+
+    game.resign('bob')
+    state = {**game.get_board_state(), "resigned_by": "black"}
+    event, payload = wire.decode_event(wire.encode_event('game_update', state, include_fen=False))
+    assert event == 'game_update' and "board" not in payload
+    assert payload["move_history"] == state["move_history"] and payload["players"] == state["players"]
+    assert payload["game_result"] == '1-0' and payload["resigned_by"] == 'black'
+    print("✅ move_made and game_update round-trip, FEN optional")
+
+def test_move_codes_match_archive():
+    print("\n2. Move codes match the archive's 16-bit encoding...")
+    for uci in ['e2e4', 'b7a8q', 'a2a1n', 'h7h8r', 'g2g1b', 'e1g1']:
+        assert wire._move_code(uci) == encode_move(chess.Move.from_uci(uci))
+        assert wire._move_uci(wire._move_code(uci)) == uci
+    print("✅ Same codes as archive.encode_move")
+
+def test_binary_room():
+    print("\n3. Sockets get the encoding they negotiated at join_game...")
+    game = new_game()
+    with backend.games_lock:
+        backend.games[game.game_id] = game
+    json_client = backend.socketio.test_client(backend.app)
+    binary_client = backend.socketio.test_client(backend.app)
+    try:
+        json_client.emit('join_game', {"game_id": game.game_id})
+        binary_client.emit('join_game', {"game_id": game.game_id, "encoding": "binary"})
+        snapshot = binary_client.get_received()[0]["args"][0]
+        assert isinstance(snapshot, bytes) and wire.decode_event(snapshot)[0] == 'game_update'
+        json_client.get_received()
+
+        backend.process_move(game.game_id, 'e2e4', 'alice', 'alice')
+        json_event = json_client.get_received()[0]["args"][0]
+        binary_event = binary_client.get_received()[0]["args"][0]
+        _, decoded = wire.decode_event(binary_event)
+        print(f"   move_made: {len(backend.json.dumps(json_event))} bytes JSON, {len(binary_event)} binary")
+        assert decoded["board"] == json_event["board"] and decoded["legal_moves"] == json_event["legal_moves"]
+    finally:
+        json_client.disconnect()
+        binary_client.disconnect()
+        with backend.games_lock:
+            backend.games.pop(game.game_id, None)
+    print("✅ One game, both encodings")
+
+def test_reconnect_replay():
+    print("\n4. A reconnecting socket gets only the events it missed...")
+    game = new_game()
+    with backend.games_lock:
+        backend.games[game.game_id] = game
+    original = backend.event_replay
+    backend.event_replay = backend.EventReplay(size=4)
+    clients = []
+    try:
+        client = backend.socketio.test_client(backend.app)
+        clients.append(client)
+        client.emit('join_game', {"game_id": game.game_id, "encoding": "binary"})
+        client.get_received()
+        backend.process_move(game.game_id, 'e2e4', 'alice', 'alice')
+        last_seq = wire.decode_event(client.get_received()[0]["args"][0])[1]["seq"]
+        client.disconnect()
+
+        for move, player in [('e7e5', 'bob'), ('g1f3', 'alice')]:
+            backend.process_move(game.game_id, move, player, player)
+        client = backend.socketio.test_client(backend.app)
+        clients.append(client)
+        client.emit('join_game', {"game_id": game.game_id, "encoding": "binary", "last_seq": last_seq})
+        replayed = [wire.decode_event(packet["args"][0])[1] for packet in client.get_received()]
+        print(f"   Replayed after seq {last_seq}: {[(event['seq'], event['move']) for event in replayed]}")
+        assert [event["move"] for event in replayed] == ['e7e5', 'g1f3']
+        assert [event["seq"] for event in replayed] == [last_seq + 1, last_seq + 2]
+        assert [event["ply"] for event in replayed] == [2, 3]  # as played, not the game's current ply
+
+        # JSON replays carry each event's own history too
+        json_client = backend.socketio.test_client(backend.app)
+        clients.append(json_client)
+        json_client.emit('join_game', {"game_id": game.game_id, "last_seq": 0})
+        histories = [packet["args"][0]["move_history"] for packet in json_client.get_received()
+                     if packet["name"] == 'move_made']
+        assert histories == [['e2e4'], ['e2e4', 'e7e5'], ['e2e4', 'e7e5', 'g1f3']]
+
+        for move, player in [('b8c6', 'bob'), ('f1b5', 'alice'), ('a7a6', 'bob'), ('b5a4', 'alice')]:
+            backend.process_move(game.game_id, move, player, player)
+        client.get_received()
+        client.emit('join_game', {"game_id": game.game_id, "encoding": "binary", "last_seq": last_seq})
+        (snapshot,) = [wire.decode_event(packet["args"][0])[1] for packet in client.get_received()]
+        assert snapshot["snapshot"] and snapshot["seq"] == last_seq + 6
+        assert snapshot["move_history"] == game.move_history
+        print(f"   Buffer rolled over: snapshot at seq {snapshot['seq']}")
+    finally:
+        for client in clients:
+            if client.is_connected():
+                client.disconnect()
+        backend.event_replay = original
+        with backend.games_lock:
+            backend.games.pop(game.game_id, None)
+    print("✅ Missed events replayed, snapshot only once the buffer has rolled over")
+
+def test_player_id_limit():
+    print("\n5. Player ids too long for the wire format are refused at join...")
+    game = backend.ChessGame('wire-long-id', 'multiplayer')
+    with backend.games_lock:
+        backend.games[game.game_id] = game
+    client = backend.app.test_client()
+    try:
+        too_long = 'é' * (backend.PLAYER_ID_MAX_BYTES // 2 + 1)  # few characters, too many bytes
+        for player_id in (too_long, '', 42):
+            response = client.post(f'/api/game/{game.game_id}/join', json={"player_id": player_id})
+            assert response.status_code == 400 and "player_id" in response.get_json()["error"]
+        assert game.players == {}
+        longest = 'p' * backend.PLAYER_ID_MAX_BYTES
+        assert client.post(f'/api/game/{game.game_id}/join', json={"player_id": longest}).get_json()["success"]
+        state = game.get_board_state()
+        assert wire.decode_event(wire.encode_event('game_update', state))[1]["players"] == state["players"]
+        assert backend.join_arena_pool('no-such-arena', too_long, 1500)[1].startswith("player_id")
+    finally:
+        with backend.games_lock:
+            backend.games.pop(game.game_id, None)
+    print(f"✅ Up to {backend.PLAYER_ID_MAX_BYTES} bytes, and those encode")
+
+def run_all_tests():
+    test_round_trip()
+    test_move_codes_match_archive()
+    test_binary_room()
+    test_reconnect_replay()
+    test_player_id_limit()
+    print("\n🎉 Wire format tests passed")
+
+if __name__ == "__main__":
+    run_all_tests()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Engine self-play tournaments for calibrating the computer's ELO mapping.
+
+Plays a round robin between engine configurations across a process pool,
+streams every game to a PGN file, and estimates each configuration's
+rating with a 95% confidence interval.
+
+    python tournament.py elo:800 elo:1200 elo:1600 elo:2000 --games 200 --movetime 0.05
+    python tournament.py lite:1000 stockfish:0 stockfish:5@0.1 --anchor stockfish:0=1000
+
+Player specs:
+    elo:N        whatever ChessGame would use for an ELO N opponent
+    lite:N       the built-in engine at rating N
+    stockfish:N  Stockfish at Skill Level N
+A trailing @SECONDS overrides --movetime for that player.
+"""
+import argparse
+import math
+import multiprocessing
+import multiprocessing.util
+import os
+import random
+import sys
+import time
+from itertools import combinations
+
+import chess
+import chess.engine
+
+import backend
+from lite_engine import LiteEngine
+
+MAX_PLIES = 400  # longer games are adjudicated as draws
+
+class PlayerSpec:
+    def __init__(self, spec, default_movetime):
+        self.spec = spec
+        body, _, movetime = spec.partition('@')
+        self.movetime = float(movetime) if movetime else default_movetime
+        self.kind, _, level = body.partition(':')
+        if self.kind not in ('elo', 'lite', 'stockfish') or not level.isdigit():
+            raise ValueError(f"Invalid player spec: {spec!r}")
+        self.level = int(level)
+        # Nominal rating, what the game UI would call this opponent
+        self.nominal_elo = self.level if self.kind in ('elo', 'lite') else None
+
+    def resolve(self):
+        """(engine kind, level) after mapping elo: specs the way ChessGame does"""
+        if self.kind != 'elo':
+            return self.kind, self.level
+        if self.level <= backend.LITE_ENGINE_MAX_ELO:
+            return 'lite', self.level
+        return 'stockfish', backend.ChessGame._elo_to_skill_level(self.level)
+
+# Per-worker engines, started on first use and reused for every game
+_engines = {}
+
+def _worker_engine(spec):
+    kind, level = spec.resolve()
+    key = (kind, level)
+    if key not in _engines:
+        if kind == 'lite':
+            _engines[key] = LiteEngine(level)
+        else:
+            engine = chess.engine.SimpleEngine.popen_uci(backend.STOCKFISH_PATH)
+            engine.configure({"Skill Level": level})
+            _engines[key] = engine
+    return _engines[key]
+
+def _close_engines():
+    for engine in _engines.values():
+        try:
+            engine.quit()
+        except Exception:
+            pass
+    _engines.clear()
+
+def _init_worker():
+    # Importing backend starts no threads (the engine pool, archive, stats and
+    # notifier threads start with the server), but it does register
+    # finished-game hooks, and calibration games must not feed the server's stats or arenas
+    backend.game_finished_hooks.clear()
+    multiprocessing.util.Finalize(None, _close_engines, exitpriority=10)
+
+def play_game(task):
+    """Play one game in a worker; returns (index, white, black, result, plies, seconds, pgn)"""
+    index, white, black, opening, round_name = task
+    started = time.monotonic()
+    game = backend.ChessGame(f"tournament-{index}", game_type='self_play')
+    for move in opening:
+        game.make_move(move)
+    engines = {chess.WHITE: _worker_engine(white), chess.BLACK: _worker_engine(black)}
+    specs = {chess.WHITE: white, chess.BLACK: black}
+
+    while game.game_result == '*':
+        board = game.board
+        if board.is_fifty_moves() or board.is_repetition(3):
+            game.game_result = '1/2-1/2'
+            game.end_time = backend.datetime.now()
+            break
+        if len(board.move_stack) >= MAX_PLIES:
+            game.game_result = '1/2-1/2'
+            game.adjudication = 'max_plies'
+            game.end_time = backend.datetime.now()
+            break
+        spec = specs[board.turn]
+        result = engines[board.turn].play(board, chess.engine.Limit(time=spec.movetime), game=game.game_id)
+        if result.move is None or not game.make_move(result.move.uci())["success"]:
+            # An engine that can't move loses
+            game.game_result = '0-1' if board.turn == chess.WHITE else '1-0'
+            game.end_time = backend.datetime.now()
+
+    pgn = game.generate_pgn({
+        "Event": "Engine calibration",
+        "Site": "tournament.py",
+        "Round": round_name,
+        "White": white.spec,
+        "Black": black.spec,
+        **({"WhiteElo": str(white.nominal_elo)} if white.nominal_elo else {}),
+        **({"BlackElo": str(black.nominal_elo)} if black.nominal_elo else {}),
+    })
+    return index, white.spec, black.spec, game.game_result, len(game.move_history), time.monotonic() - started, pgn
+
+def schedule(players, games_per_pair, opening_plies, seed):
+    """Round-robin tasks; each opening is played twice with colors reversed"""
+    rng = random.Random(seed)
+    tasks = []
+    for a, b in combinations(players, 2):
+        for pair_game in range(games_per_pair):
+            if pair_game % 2 == 0:
+                board = chess.Board()
+                for _ in range(opening_plies):
+                    moves = list(board.legal_moves)
+                    if not moves:
+                        break
+                    board.push(rng.choice(moves))
+                opening = [move.uci() for move in board.move_stack]
+            white, black = (a, b) if pair_game % 2 == 0 else (b, a)
+            tasks.append((len(tasks), white, black, opening, f"{pair_game + 1}"))
+    rng.shuffle(tasks)  # spread slow pairings over the run
+    return tasks
+
+def estimate_ratings(players, scores, games, anchor=None):
+    """Bradley-Terry maximum-likelihood ratings with 95% confidence intervals.
+
+    `scores[a][b]` is a's points against b and `games[a][b]` the games they
+    played. One virtual draw per pairing keeps all-win or all-loss records
+    finite. Ratings are shifted so `anchor` (name, rating) holds, else so the
+    first player sits at its nominal rating (or 0).
+    """
+    names = [p.spec for p in players]
+    gamma = {name: 1.0 for name in names}
+    for _ in range(1000):
+        updated = {}
+        for a in names:
+            points = sum(scores[a][b] + 0.5 for b in names if games[a][b])
+            denominator = sum((games[a][b] + 1) / (gamma[a] + gamma[b]) for b in names if games[a][b])
+            updated[a] = points / denominator if denominator else gamma[a]
+        # Normalise to geometric mean 1 so the iteration doesn't drift
+        mean = math.exp(sum(math.log(g) for g in updated.values()) / len(updated))
+        updated = {name: g / mean for name, g in updated.items()}
+        converged = max(abs(math.log(updated[n] / gamma[n])) for n in names) < 1e-9
+        gamma = updated
+        if converged:
+            break
+
+    scale = 400 / math.log(10)
+    ratings = {name: scale * math.log(gamma[name]) for name in names}
+    if anchor:
+        anchor_name, anchor_rating = anchor
+    else:
+        anchor_name, anchor_rating = names[0], players[0].nominal_elo or 0
+    shift = anchor_rating - ratings[anchor_name]
+
+    estimates = {}
+    for a in names:
+        # Fisher information of a's rating given the others
+        information = sum(
+            (games[a][b] + 1) * p * (1 - p)
+            for b in names if games[a][b]
+            for p in [gamma[a] / (gamma[a] + gamma[b])]
+        )
+        error = 1.96 * scale / math.sqrt(information) if information else float('inf')
+        estimates[a] = {"rating": ratings[a] + shift, "ci95": error}
+    return estimates
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine self-play tournament for ELO calibration")
+    parser.add_argument('players', nargs='+', help="player specs, e.g. elo:1500 lite:900 stockfish:10@0.1")
+    parser.add_argument('--games', type=int, default=20, help="games per pairing (default 20)")
+    parser.add_argument('--movetime', type=float, default=0.05, help="seconds per move (default 0.05)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument('--opening-plies', type=int, default=4, help="random plies before the engines take over")
+    parser.add_argument('--seed', type=int, default=1, help="seed for the random openings")
+    parser.add_argument('--anchor', help="fix one player's rating, e.g. stockfish:0=1000")
+    parser.add_argument('--pgn', default=os.path.join(backend.GAMES_DIR, 'tournament.pgn'),
+                        help="PGN output file (default games/tournament.pgn)")
+    args = parser.parse_args()
+
+    try:
+        players = [PlayerSpec(spec, args.movetime) for spec in args.players]
+    except ValueError as e:
+        parser.error(str(e))
+    if len(players) < 2 or len({p.spec for p in players}) != len(players):
+        parser.error("need at least two distinct players")
+    anchor = None
+    if args.anchor:
+        name, _, rating = args.anchor.rpartition('=')
+        if name not in {p.spec for p in players}:
+            parser.error(f"anchor {name!r} is not one of the players")
+        anchor = (name, float(rating))
+
+    tasks = schedule(players, args.games, args.opening_plies, args.seed)
+    names = [p.spec for p in players]
+    scores = {a: {b: 0.0 for b in names} for a in names}
+    games = {a: {b: 0 for b in names} for a in names}
+    tally = {"1-0": 0, "0-1": 0, "1/2-1/2": 0}
+    plies = 0
+
+    print(f"🏆 {len(tasks)} games, {len(players)} players, {args.workers} worker(s), engine {backend.STOCKFISH_PATH}")
+    started = time.monotonic()
+    with open(args.pgn, 'w') as pgn_file, \
+            multiprocessing.Pool(args.workers, initializer=_init_worker) as pool:
+        for done, (_, white, black, result, game_plies, _, pgn) in enumerate(
+                pool.imap_unordered(play_game, tasks), 1):
+            pgn_file.write(pgn + "\n\n")
+            pgn_file.flush()
+            white_points = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+            scores[white][black] += white_points
+            scores[black][white] += 1 - white_points
+            games[white][black] += 1
+            games[black][white] += 1
+            tally[result] = tally.get(result, 0) + 1
+            plies += game_plies
+            if done % max(1, len(tasks) // 20) == 0 or done == len(tasks):
+                elapsed = time.monotonic() - started
+                print(f"   {done}/{len(tasks)} games, {done / elapsed:.2f} games/s")
+    elapsed = time.monotonic() - started
+
+    estimates = estimate_ratings(players, scores, games, anchor)
+    print(f"\n📊 Ratings (95% CI) from {len(tasks)} games, +{tally['1-0']} ={tally['1/2-1/2']} -{tally['0-1']} for White")
+    print(f"   {'player':<24}{'nominal':>8}{'estimate':>10}{'±':>7}{'score':>9}")
+    for player in sorted(players, key=lambda p: -estimates[p.spec]["rating"]):
+        estimate = estimates[player.spec]
+        played = sum(games[player.spec].values())
+        score = sum(scores[player.spec].values()) / played if played else 0
+        nominal = str(player.nominal_elo) if player.nominal_elo else '-'
+        print(f"   {player.spec:<24}{nominal:>8}{estimate['rating']:>10.0f}{estimate['ci95']:>7.0f}{score:>9.1%}")
+
+    games_per_second = len(tasks) / elapsed
+    cores = min(args.workers, os.cpu_count() or 1)  # each worker keeps at most one engine searching
+    print(f"\n⏱️  {elapsed:.1f}s, {games_per_second:.2f} games/s, "
+          f"{games_per_second / cores:.3f} games/s/core on {cores} core(s), {plies / len(tasks):.0f} plies/game")
+    print(f"📝 PGNs written to {args.pgn}")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""One asyncio event loop driving every UCI engine process.
+
+chess.engine.SimpleEngine.popen_uci() starts a private event-loop thread per
+engine, so hundreds of vs_computer games mean hundreds of Python threads
+contending for the GIL. UciDriver runs all engine protocols on a single
+loop thread instead. popen_uci() still returns a SimpleEngine - bound to
+the shared loop - so games keep the blocking play()/analysis()/quit() API.
+"""
+import asyncio
+import os
+import sys
+from threading import Lock, Thread
+
+import chess.engine
+
+class _DriverChildWatcher(getattr(asyncio, 'AbstractChildWatcher', object)):
+    """Child watcher (Python < 3.12) that watches processes started on driver
+    loops with pidfds, and hands every other loop's to the watcher asyncio had"""
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self._watchers = {}  # driver loop -> PidfdChildWatcher
+
+    def add_loop(self, loop):
+        watcher = asyncio.PidfdChildWatcher()
+        watcher.attach_loop(loop)
+        self._watchers[loop] = watcher
+
+    def _watcher(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        return self._watchers.get(loop, self.fallback)
+
+    def add_child_handler(self, pid, callback, *args):
+        self._watcher().add_child_handler(pid, callback, *args)
+
+    def remove_child_handler(self, pid):
+        return self._watcher().remove_child_handler(pid)
+
+    def attach_loop(self, loop):
+        self.fallback.attach_loop(loop)
+
+    def is_active(self):
+        return self._watcher().is_active()
+
+    def close(self):
+        self.fallback.close()
+        for watcher in self._watchers.values():
+            watcher.close()
+
+    def __enter__(self):
+        self._watcher().__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._watcher().__exit__(*exc_info)
+
+def _use_pidfd_child_watcher(loop):
+    """Watch engine processes started on `loop` with pidfds.
+
+    Before Python 3.12 asyncio's default child watcher parks a waitpid()
+    thread per subprocess, which would put one thread per engine right back.
+    Child watchers are process-wide there, so the installed one only routes
+    `loop`'s processes to pidfds; other loops keep the watcher they had.
+    Newer Pythons already use pidfds when the kernel has them.
+    """
+    if sys.version_info >= (3, 12) or not hasattr(os, 'pidfd_open'):
+        return
+    try:
+        os.close(os.pidfd_open(os.getpid()))  # needs Linux 5.3+
+    except OSError:
+        return
+    watcher = asyncio.get_child_watcher()
+    if not isinstance(watcher, _DriverChildWatcher):
+        watcher = _DriverChildWatcher(watcher)
+        asyncio.set_child_watcher(watcher)
+    watcher.add_loop(loop)
+
+class UciDriver:
+    """Shared event loop for UCI engines, started on first use"""
+    def __init__(self, timeout=10.0):
+        self.timeout = timeout
+        self.engines_started = 0
+        self._loop = None
+        self._thread = None
+        self._lock = Lock()
+
+    @property
+    def loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                _use_pidfd_child_watcher(self._loop)
+                self._thread = Thread(target=self._loop.run_forever, name='uci-driver', daemon=True)
+                self._thread.start()
+            return self._loop
+
+    def submit(self, coro):
+        """Schedule a coroutine on the driver loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def popen_uci(self, command):
+        """Start a UCI engine on the shared loop, returned as a SimpleEngine"""
+        return self.submit(self._popen_uci(command)).result()
+
+    async def _popen_uci(self, command):
+        transport, protocol = await chess.engine.UciProtocol.popen(command)
+        try:
+            await asyncio.wait_for(protocol.initialize(), self.timeout)
+        except BaseException:
+            transport.close()
+            raise
+        engine = chess.engine.SimpleEngine(transport, protocol, timeout=self.timeout)
+        self.engines_started += 1
+        asyncio.get_running_loop().create_task(self._watch(engine))
+        return engine
+
+    @staticmethod
+    async def _watch(engine):
+        """Mark the SimpleEngine closed once its process exits, as SimpleEngine.popen does"""
+        try:
+            engine.returncode.set_result(await engine.protocol.returncode)
+        finally:
+            engine.close()
+
+    def status(self):
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "engines_started": self.engines_started,
+        }
@@ -0,0 +1,179 @@
+"""
+Compact binary encoding of the `move_made` and `game_update` socket events.
+
+Clients opt in at `join_game` with {"encoding": "binary"} (and "fen": false
+to drop the FEN). Each event is encoded once per room, not per client, and
+decodes back to the keys of the JSON payload. chess-client.js has the
+matching decoder. Little-endian layout:
+
+    header     kind u8, flags u8, status u8, ply u16, seq u32 (room event number)
+    moves      count u16, then a 16-bit code per move (as archive.encode_move).
+               move_made: the moves this event played, ending at `ply`;
+               game_update: the whole move history
+    fen        [FLAG_FEN] length u8 + ASCII
+    adjudicate [FLAG_ADJUDICATION] length u8 + ASCII
+    legal      [FLAG_LEGAL] count u8, then from | to << 6 per (from, to) pair
+    players    game_update only: count u8, then per player color u8 (0 white,
+               1 black), id length u8 + UTF-8
+
+`status` is the result code (archive.RESULTS) in bits 0-1 and who resigned
+(0 nobody, 1 white, 2 black) in bits 2-3.
+"""
+import struct
+
+import chess
+
+from archive import RESULTS, RESULT_CODES
+
+HEADER = struct.Struct('<BBBHI')  # kind, flags, status, ply, seq
+COUNT = struct.Struct('<H')
+CODE = struct.Struct('<H')  # move code, or from | to << 6 for legal moves
+
+KINDS = {'move_made': 1, 'game_update': 2}
+EVENTS = {kind: event for event, kind in KINDS.items()}
+
+FLAG_CHECK = 1
+FLAG_CHECKMATE = 2
+FLAG_STALEMATE = 4
+FLAG_BLACK_TO_MOVE = 8
+FLAG_FEN = 16
+FLAG_ADJUDICATION = 32
+FLAG_LEGAL = 64
+FLAG_SNAPSHOT = 128  # a join_game snapshot rather than a live event
+
+COLORS = ('white', 'black')
+
+# Straight from UCI text to a move code and back, skipping chess.Move (the same
+# codes as archive.encode_move / decode_move)
+SQUARE_INDEX = {name: square for square, name in enumerate(chess.SQUARE_NAMES)}
+PROMOTION_CODES = {'n': 1 << 12, 'b': 2 << 12, 'r': 3 << 12, 'q': 4 << 12}
+PROMOTION_SUFFIXES = ['', 'n', 'b', 'r', 'q']
+
+def _move_code(uci):
+    code = SQUARE_INDEX[uci[0:2]] | SQUARE_INDEX[uci[2:4]] << 6
+    return code | PROMOTION_CODES[uci[4]] if len(uci) > 4 else code
+
+def _move_uci(code):
+    return chess.SQUARE_NAMES[code & 0x3f] + chess.SQUARE_NAMES[(code >> 6) & 0x3f] + PROMOTION_SUFFIXES[code >> 12]
+
+def _short_string(value):
+    data = value.encode()
+    if len(data) > 255:
+        raise ValueError(f"string too long for the wire format: {value!r}")
+    return bytes([len(data)]) + data
+
+def encode_event(event, payload, include_fen=True):
+    """Pack a move_made or game_update payload (as emitted to JSON clients) into bytes"""
+    kind = KINDS[event]
+    history = payload["move_history"]
+    moves = payload.get("moves", []) if kind == KINDS['move_made'] else history
+
+    flags = 0
+    if payload.get("is_check"):
+        flags |= FLAG_CHECK
+    if payload.get("is_checkmate"):
+        flags |= FLAG_CHECKMATE
+    if payload.get("is_stalemate"):
+        flags |= FLAG_STALEMATE
+    if payload.get("current_turn") == 'black':
+        flags |= FLAG_BLACK_TO_MOVE
+    if include_fen:
+        flags |= FLAG_FEN
+    if payload.get("snapshot"):
+        flags |= FLAG_SNAPSHOT
+    if payload.get("adjudication"):
+        flags |= FLAG_ADJUDICATION
+    legal_moves = payload.get("legal_moves")
+    if legal_moves is not None:
+        flags |= FLAG_LEGAL
+    status = RESULT_CODES[payload.get("game_result", '*')]
+    if payload.get("resigned_by"):
+        status |= (COLORS.index(payload["resigned_by"]) + 1) << 2
+
+    parts = [HEADER.pack(kind, flags, status, len(history), payload.get("seq", 0)),
+             struct.pack(f'<H{len(moves)}H', len(moves), *map(_move_code, moves))]
+    if include_fen:
+        parts.append(_short_string(payload["board"]))
+    if flags & FLAG_ADJUDICATION:
+        parts.append(_short_string(payload["adjudication"]))
+    if legal_moves is not None:
+        pairs = [SQUARE_INDEX[from_square] | to_square << 6
+                 for from_square, mask in legal_moves.items()
+                 for to_square in chess.scan_forward(int(mask, 16))]
+        parts.append(struct.pack(f'<B{len(pairs)}H', len(pairs), *pairs))
+    if kind == KINDS['game_update']:
+        players = payload.get("players", {})
+        parts.append(bytes([len(players)]))
+        for player_id, color in players.items():
+            parts.append(bytes([COLORS.index(color)]) + _short_string(player_id))
+    return b''.join(parts)
+
+def decode_event(data):
+    """Unpack encode_event() output into (event, payload).
+
+    move_made payloads carry `ply` (moves played so far) instead of the
+    whole `move_history`; a client keeps the history by appending `moves`.
+    """
+    kind, flags, status, ply, seq = HEADER.unpack_from(data, 0)
+    offset = HEADER.size
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    moves = [_move_uci(code) for code in struct.unpack_from(f'<{count}H', data, offset)]
+    offset += count * CODE.size
+
+    def short_string():
+        nonlocal offset
+        length = data[offset]
+        value = bytes(data[offset + 1:offset + 1 + length]).decode()
+        offset += 1 + length
+        return value
+
+    payload = {
+        "seq": seq,
+        "current_turn": 'black' if flags & FLAG_BLACK_TO_MOVE else 'white',
+        "is_check": bool(flags & FLAG_CHECK),
+        "is_checkmate": bool(flags & FLAG_CHECKMATE),
+        "is_stalemate": bool(flags & FLAG_STALEMATE),
+        "game_result": RESULTS[status & 3],
+        "adjudication": None,
+    }
+    if flags & FLAG_SNAPSHOT:
+        payload["snapshot"] = True
+    if flags & FLAG_FEN:
+        payload["board"] = short_string()
+    if flags & FLAG_ADJUDICATION:
+        payload["adjudication"] = short_string()
+    if flags & FLAG_LEGAL:
+        count = data[offset]
+        offset += 1
+        masks = {}
+        for pair in struct.unpack_from(f'<{count}H', data, offset):
+            masks[pair & 0x3f] = masks.get(pair & 0x3f, 0) | 1 << (pair >> 6)
+        offset += count * CODE.size
+        payload["legal_moves"] = {chess.SQUARE_NAMES[square]: format(mask, '016x') for square, mask in masks.items()}
+    if status >> 2:
+        payload["resigned_by"] = COLORS[(status >> 2) - 1]
+        payload["message"] = f"{payload['resigned_by'].title()} player has resigned"
+
+    event = EVENTS[kind]
+    if event == 'move_made':
+        payload.update({
+            "success": True,
+            "move": moves[-1],
+            "moves": moves,
+            "premoves_applied": moves[1:],
+            "from_square": moves[-1][0:2],
+            "to_square": moves[-1][2:4],
+            "ply": ply,
+        })
+    else:
+        payload["move_history"] = moves
+        players = {}
+        count = data[offset]
+        offset += 1
+        for _ in range(count):
+            color = COLORS[data[offset]]
+            offset += 1
+            players[short_string()] = color
+        payload["players"] = players
+    return event, payload